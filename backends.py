@@ -0,0 +1,266 @@
+import importlib
+from abc import ABC, abstractmethod
+import tracing
+
+# Read-only queries run by every backend, in order
+QUERY_NAMES = [
+	'negative_filter', 'optional_match', 'collect_unwind', 'reduce',
+	'with_filter_aggregate', 'predicate_function', 'post_union_processing'
+]
+
+class Backend(ABC):
+	'''
+	Database the queries run on: connection, import of the dataset, read-only
+	queries by name, execution plans and profiles. Caching (ResultCache),
+	tracing, output sinks, load generation and recording apply to every
+	backend through this interface, whose abstract methods every backend
+	implements.
+	'''
+
+	name = None
+
+	@abstractmethod
+	def connect(self):
+		'''
+		Opens the connection to the database.
+		'''
+
+	@abstractmethod
+	def load(self, datafile: str, force: bool = False, delta: bool = False) -> bool:
+		'''
+		Imports the dataset, unless the one in the database has the same
+		fingerprint. Returns True if the data has been imported.
+		'''
+
+	@abstractmethod
+	def queries(self) -> dict:
+		'''
+		(query, params) of each read-only query, by name.
+		'''
+
+	@abstractmethod
+	def run(self, name: str) -> list:
+		'''
+		Rows of a read-only query, from the result cache if any.
+		'''
+
+	def batches(self, name: str):
+		'''
+		Generates (columns, rows) batches of a read-only query, where columns may
+		be None if unknown.
+		'''
+
+		yield None, self.run(name)
+
+	@abstractmethod
+	def explain(self, name: str) -> str:
+		'''
+		Execution plan of a read-only query.
+		'''
+
+	@abstractmethod
+	def profile(self, name: str) -> dict:
+		'''
+		Server-side measures of a run of a read-only query.
+		'''
+
+	@abstractmethod
+	def load_client(self) -> tuple:
+		'''
+		Function opening a new connection and the name of its method running a
+		query, for load generation (see loadgen.LoadGenerator).
+		'''
+
+	def close(self):
+		pass
+
+class Neo4jBackend(Backend):
+	'''
+	Neo4j database, through Neo4jDB and the queries of the graph model.
+	'''
+
+	name = 'neo4j'
+
+	def __init__(self, user: str, password: str, uri: str = 'bolt://localhost:7687',
+							 model: str = 'relationships', cache = None,
+							 strong_against = None, connect = None, streaming: bool = False,
+							 indexes: str = 'default'):
+		'''
+		Args:
+			user, password, uri: connection to the database.
+			model: graph model used at import.
+			cache: ResultCache in front of read-only queries, if any.
+			strong_against: STRONG_AGAINST edges computed in process, if any.
+			connect: function creating a driver (default: GraphDatabase.driver).
+			streaming: whether compare queries stream their results.
+			indexes: index profile (see INDEX_PROFILES); in the prefix profile,
+				queries filtering names by prefix run their rewrites seeking names
+				first.
+		'''
+
+		self.module = importlib.import_module('neo4j-queries')
+		self.user = user
+		self.password = password
+		self.uri = uri
+		self.model = model
+		self.cache = cache
+		self.strong_against = strong_against
+		self.driver_factory = connect or self.module.GraphDatabase.driver
+		self.streaming = streaming
+		self.indexes = indexes
+		self.db = None
+		self.nrq = None
+
+	def connect(self):
+		self.db = self.module.Neo4jDB(
+			self.uri, self.user, self.password, self.model, self.driver_factory,
+			self.indexes
+		)
+		self.nrq = self.module.QUERIES[self.model](
+			self.db.driver, self.cache, self.strong_against, self.streaming
+		)
+
+	def load(self, datafile: str, force: bool = False, delta: bool = False) -> bool:
+		loaded = self.db.load(datafile, force, delta)
+		if loaded and self.cache is not None:
+			res = self.nrq.session.run('MATCH (d:Dataset) RETURN d.fingerprint').single()
+			self.cache.set_version(res[0] if res else None)
+		return loaded
+
+	def template(self, name: str) -> str:
+		'''
+		Name of the template run for a query: its prefix rewrite, if any, in the
+		prefix index profile.
+		'''
+
+		rewrite = f'{name}_prefix'
+		if self.indexes == 'prefix' and hasattr(self.nrq, rewrite + '_request'):
+			return rewrite
+		return name
+
+	def queries(self) -> dict:
+		templates = self.nrq.templates()
+		return {name: templates[self.template(name)] for name in QUERY_NAMES}
+
+	def run(self, name: str) -> list:
+		query, params = self.nrq.templates()[self.template(name)]
+		return self.nrq.fetch(query, **params)
+
+	def explain(self, name: str) -> str:
+		return self.nrq.explain(self.template(name))
+
+	def profile(self, name: str) -> dict:
+		return {'db_hits': self.nrq.db_hits(self.template(name))}
+
+	def load_client(self) -> tuple:
+		return self.db.driver.session, 'run'
+
+	def close(self):
+		if self.nrq is not None: self.nrq.session.close()
+		if self.db is not None: self.db.close()
+
+class PostgresBackend(Backend):
+	'''
+	Postgres database, through PostgresQueries and the Neo4j equivalents.
+	'''
+
+	name = 'postgres'
+
+	def __init__(self, user: str, password: str, database: str = 'bdspe_ng_ss',
+							 host: str = 'localhost', cache = None, connect = None,
+							 streaming: bool = False, itersize: int = None,
+							 layout: str = 'plain', indexes: str = 'default'):
+		'''
+		Args:
+			user, password, database, host: connection to the database.
+			cache: ResultCache in front of read-only queries, if any.
+			connect: function creating a connection (default: psycopg.connect).
+			streaming: whether rows are streamed instead of fetched all at once.
+			itersize: if given, rows are streamed through a server-side cursor,
+				itersize rows per round trip.
+			layout: layout of the Pokemon-keyed tables (see LAYOUTS).
+			indexes: index profile (see INDEX_PROFILES); in the prefix profile,
+				predicate_function runs its rewrite (see PrefixQueries).
+		'''
+
+		self.module = importlib.import_module('postgres-queries')
+		self.user = user
+		self.password = password
+		self.database = database
+		self.host = host
+		self.cache = cache
+		self.connection_factory = connect or self.module.psycopg.connect
+		self.streaming = streaming
+		self.itersize = itersize
+		self.layout = layout
+		self.indexes = indexes
+		self.psql = None
+
+	def connect(self):
+		self.psql = self.module.PostgresQueries(
+			self.user, self.password, self.database, self.host, None,
+			cache = self.cache, connect = self.connection_factory, layout = self.layout,
+			indexes = self.indexes
+		)
+
+	def load(self, datafile: str, force: bool = False, delta: bool = False) -> bool:
+		return self.psql.load(datafile, force, delta)
+
+	def queries(self) -> dict:
+		equivalents = self.module.EQUIVALENTS[self.layout]
+		queries = {name: (getattr(equivalents, name)(), None) for name in QUERY_NAMES}
+		if self.indexes == 'prefix':
+			queries['predicate_function'] = (
+				self.module.PrefixQueries.predicate_function(equivalents), None
+			)
+		return queries
+
+	def run(self, name: str) -> list:
+		return self.psql.fetch(self.queries()[name][0])
+
+	def batches(self, name: str):
+		if not (self.streaming or self.itersize):
+			yield from super().batches(name)
+			return
+		yield from self.psql.batches(self.queries()[name][0], itersize = self.itersize)
+
+	def explain(self, name: str) -> str:
+		return self.psql.explain(self.queries()[name][0])
+
+	def profile(self, name: str) -> dict:
+		return self.psql.profile(self.queries()[name][0])
+
+	def load_client(self) -> tuple:
+		connect = lambda: self.connection_factory(
+			host = self.host, user = self.user, password = self.password,
+			dbname = self.database, autocommit = True
+		)
+		return connect, 'execute'
+
+	def close(self):
+		if self.psql is not None: self.psql.close()
+
+# Backends by name
+BACKENDS = {'neo4j': Neo4jBackend, 'postgres': PostgresBackend}
+
+def run_query(backend: Backend, name: str, sink) -> int:
+	'''
+	Runs a read-only query of a backend in a span, and writes its rows to a
+	sink. Returns the number of rows.
+	'''
+
+	rows, elapsed = sink.rows, sink.elapsed
+	with tracing.span(f'{backend.name} {name}') as span:
+		started = False
+		for columns, batch in backend.batches(name):
+			if not batch: continue
+			if not started:
+				columns = columns or [f'column{i + 1}' for i in range(len(batch[0]))]
+				sink.start(name, columns)
+				started = True
+			sink.write(batch)
+		if not started: sink.start(name, [])
+		sink.end()
+		span.set_rows(sink.rows - rows)
+		span.add_counters({'output_ms': (sink.elapsed - elapsed) / 1e6})
+	return sink.rows - rows
@@ -0,0 +1,305 @@
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from sys import argv
+import dataset
+from snapshot import write_snapshot
+from sinks import NullSink
+
+# Bump whenever metrics are measured differently, so that results are not
+# compared with baselines they cannot be compared with.
+BENCHMARK_VERSION = 1
+
+BASELINE_DIR = 'baselines'
+
+# Metadata that must be the same for results to be compared with a baseline
+COMPARABLE_METADATA = ['benchmark_version', 'scales', 'runs', 'host']
+
+# Metrics where higher is better; for all others, lower is better
+HIGHER_IS_BETTER = ['rows_per_s']
+
+def percentile(values: list, p: float) -> float:
+	'''
+	Nearest-rank percentile.
+	'''
+
+	values = sorted(values)
+	return values[max(0, int(-(-len(values) * p // 100)) - 1)]
+
+def measure(f, runs: int) -> dict:
+	'''
+	Median and 95th percentile latency (ms) of runs calls of f, after a first
+	call warming up caches, and the peak of client memory they allocated
+	(KiB). Anything f prints is discarded.
+	'''
+
+	times = []
+	peak = 0
+	with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+		f()
+		for _ in range(runs):
+			current = tracemalloc.get_traced_memory()[0]
+			tracemalloc.reset_peak()
+			start = time.perf_counter()
+			f()
+			times.append((time.perf_counter() - start) * 1000)
+			peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+	return {
+		'median_ms': statistics.median(times),
+		'p95_ms': percentile(times, 95),
+		'peak_kib': peak / 1024
+	}
+
+def measure_import(f, rows: int) -> tuple:
+	'''
+	Result of a call of f importing rows, and its import throughput (rows/s)
+	and peak client memory (KiB).
+	'''
+
+	current = tracemalloc.get_traced_memory()[0]
+	tracemalloc.reset_peak()
+	start = time.perf_counter()
+	with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+		res = f()
+	elapsed = time.perf_counter() - start
+	peak = tracemalloc.get_traced_memory()[1] - current
+	return res, {'rows_per_s': rows / elapsed, 'peak_kib': peak / 1024}
+
+def benchmark_neo4j(snapshots: dict, user: str, password: str, runs: int,
+										model: str = 'relationships', run_topo: bool = False,
+										analysis: bool = False) -> dict:
+	'''
+	Metrics of the Neo4j import, of every query of functions_dict, and of the
+	analysis queries if asked, at each scale.
+
+	Args:
+		snapshots: snapshot path and number of rows of each scale.
+		user, password: credentials of the local database.
+		runs: number of measured runs of each query.
+		model: graph model imported.
+		run_topo: whether query 8 is run (can be very long).
+		analysis: whether the analysis queries are run.
+	'''
+
+	neo4j_queries = importlib.import_module('neo4j-queries')
+	ndb = neo4j_queries.Neo4jDB('bolt://localhost:7687', user, password, model)
+	res = {}
+	try:
+		for scale, (path, rows) in snapshots.items():
+			_, res[f'neo4j/{scale}/import'] = measure_import(
+				lambda: ndb.load(path, force = True), rows
+			)
+			nrq = neo4j_queries.QUERIES[model](ndb.driver)
+			for key, f in nrq.functions_dict().items():
+				if key == '8' and not run_topo: continue
+				res[f'neo4j/{scale}/query {key}'] = measure(f, runs)
+			if analysis:
+				nra = neo4j_queries.Neo4jAnalysis(ndb.session)
+				for f in [nra.louvain, nra.leiden, nra.shortest_path, nra.dijkstra]:
+					res[f'neo4j/{scale}/{f.__name__}'] = measure(f, runs)
+			nrq.session.close()
+	finally:
+		ndb.close()
+	return res
+
+def benchmark_postgres(snapshots: dict, user: str, password: str,
+											 database: str, host: str, runs: int) -> dict:
+	'''
+	Metrics of the Postgres import and of every Neo4j equivalent, at each
+	scale.
+	'''
+
+	postgres_queries = importlib.import_module('postgres-queries')
+	equivalents = postgres_queries.Neo4jEquivalents
+	names = [
+		'negative_filter', 'optional_match', 'collect_unwind', 'reduce',
+		'with_filter_aggregate', 'predicate_function', 'post_union_processing'
+	]
+	res = {}
+	for scale, (path, rows) in snapshots.items():
+		psql, res[f'postgres/{scale}/import'] = measure_import(
+			lambda: postgres_queries.PostgresQueries(
+				user, password, database, host, path, force = True
+			), rows
+		)
+		try:
+			for name in names:
+				query = getattr(equivalents, name)()
+				res[f'postgres/{scale}/{name}'] = measure(
+					lambda: postgres_queries.run_query(
+						psql, query, name = name, sink = NullSink()
+					), runs
+				)
+		finally:
+			psql.close()
+	return res
+
+def metadata(scales: list, runs: int) -> dict:
+	try:
+		revision = subprocess.run(
+			['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True
+		).stdout.strip() or None
+	except OSError:
+		revision = None
+	return {
+		'benchmark_version': BENCHMARK_VERSION,
+		'revision': revision,
+		'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'python': platform.python_version(),
+		'host': platform.node(),
+		'scales': scales,
+		'runs': runs
+	}
+
+def mismatches(results: dict, baseline: dict) -> list:
+	'''
+	Metadata of results and of a baseline preventing their comparison, as
+	(key, baseline value, value) tuples.
+	'''
+
+	return [
+		(key, baseline['metadata'].get(key), results['metadata'].get(key))
+		for key in COMPARABLE_METADATA
+		if baseline['metadata'].get(key) != results['metadata'].get(key)
+	]
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+	'''
+	Regressions of results against a baseline, as (benchmark, metric, baseline
+	value, value) tuples: metrics worse than the baseline by more than
+	tolerance (a fraction of the baseline value). Results measured differently
+	from the baseline (see mismatches) are not compared.
+	'''
+
+	if mismatches(results, baseline):
+		raise Exception('Results and baseline were not measured the same way')
+	regressions = []
+	for name, metrics in results['metrics'].items():
+		for metric, value in metrics.items():
+			base = baseline['metrics'].get(name, {}).get(metric)
+			if base is None: continue
+			if metric in HIGHER_IS_BETTER:
+				worse = value < base * (1 - tolerance)
+			else:
+				worse = value > base * (1 + tolerance)
+			if worse: regressions.append((name, metric, base, value))
+	return regressions
+
+def print_results(results: dict, baseline: dict = None):
+	print(f'{"Benchmark":<48}{"Metric":<14}{"Value":<14}Baseline')
+	for name, metrics in results['metrics'].items():
+		for metric, value in metrics.items():
+			base = (baseline or {'metrics': {}})['metrics'].get(name, {}).get(metric)
+			base = '' if base is None else f'{base:.2f}'
+			print(f'{name:<48}{metric:<14}{value:<14.2f}{base}')
+
+def baseline_path(name: str) -> str:
+	return os.path.join(BASELINE_DIR, f'{name}.json')
+
+def print_usage():
+	print('Usage: python benchmark.py [OPTIONS]')
+	print('	OPTIONS:')
+	print('	-f [datafile]: dataset scaled up (default: pokemon.csv)')
+	print('	-x [scales]: comma-separated scale factors of the dataset (default: 1,2,4)')
+	print('	-n [runs]: measured runs of each query (default: 10)')
+	print('	-B [backends]: comma-separated backends (default: neo4j,postgres)')
+	print('	-N [user:password]: Neo4j credentials (default: neo4j:password)')
+	print('	-P [user:password@host/database]: Postgres connection')
+	print('		(default: postgres:password@localhost/bdspe_ng_ss)')
+	print('	-m [model]: Neo4j graph model (default: relationships)')
+	print('	-t: also run query 8 (can be very long to run)')
+	print('	-a: also run the Neo4j analysis queries')
+	print('	-b [name]: baseline compared with (default: latest, if any)')
+	print('	-s [name]: save results as a baseline, and as latest if there are no')
+	print('		regressions')
+	print('	-A: with -s, also save results with regressions as latest')
+	print('	-e [tolerance]: allowed regression, as a fraction (default: 0.2)')
+
+if __name__ == '__main__':
+	if '-h' in argv:
+		print_usage()
+		exit(0)
+	datafile = argv[argv.index('-f') + 1] if '-f' in argv else 'pokemon.csv'
+	scales = [int(s) for s in (
+		argv[argv.index('-x') + 1] if '-x' in argv else '1,2,4'
+	).split(',')]
+	runs = int(argv[argv.index('-n') + 1]) if '-n' in argv else 10
+	backends = (
+		argv[argv.index('-B') + 1] if '-B' in argv else 'neo4j,postgres'
+	).split(',')
+	neo4j_user, _, neo4j_password = (
+		argv[argv.index('-N') + 1] if '-N' in argv else 'neo4j:password'
+	).partition(':')
+	credentials, _, location = (
+		argv[argv.index('-P') + 1] if '-P' in argv
+		else 'postgres:password@localhost/bdspe_ng_ss'
+	).partition('@')
+	postgres_user, _, postgres_password = credentials.partition(':')
+	host, _, database = location.partition('/')
+	model = argv[argv.index('-m') + 1] if '-m' in argv else 'relationships'
+	baseline_name = argv[argv.index('-b') + 1] if '-b' in argv else 'latest'
+	save_name = argv[argv.index('-s') + 1] if '-s' in argv else None
+	tolerance = float(argv[argv.index('-e') + 1]) if '-e' in argv else 0.2
+
+	tracemalloc.start()
+	rows = dataset.read_rows(datafile)
+	results = {'metadata': metadata(scales, runs), 'metrics': {}}
+	with tempfile.TemporaryDirectory() as tmp:
+		# scaled datasets are imported from snapshots, sent by the client
+		snapshots = {}
+		for scale in scales:
+			path = os.path.join(tmp, f'scale{scale}.snap')
+			scaled = dataset.scale_rows(rows, scale)
+			write_snapshot(scaled, path)
+			snapshots[f'x{scale}'] = (path, len(scaled))
+		if 'neo4j' in backends:
+			results['metrics'].update(benchmark_neo4j(
+				snapshots, neo4j_user, neo4j_password, runs, model,
+				'-t' in argv, '-a' in argv
+			))
+		if 'postgres' in backends:
+			results['metrics'].update(benchmark_postgres(
+				snapshots, postgres_user, postgres_password, database, host, runs
+			))
+
+	baseline = None
+	if os.path.exists(baseline_path(baseline_name)):
+		with open(baseline_path(baseline_name)) as f:
+			baseline = json.load(f)
+		for key, base, value in mismatches(results, baseline):
+			print(f'Baseline {baseline_name} has {key} {base}, not {value}:'
+						+ ' not compared')
+		if mismatches(results, baseline): baseline = None
+	print_results(results, baseline)
+
+	regressions = []
+	if baseline is not None:
+		regressions = compare(results, baseline, tolerance)
+		print()
+		print(f'Compared with baseline {baseline_name}'
+					+ f' ({baseline["metadata"]["revision"]},'
+					+ f' {baseline["metadata"]["created"]}):'
+					+ f' {len(regressions)} regressions beyond {tolerance:.0%}')
+		for name, metric, base, value in regressions:
+			print(f'  {name} {metric}: {base:.2f} -> {value:.2f}')
+
+	if save_name is not None:
+		# latest is the default baseline: regressions would no longer be reported
+		# if it was replaced by regressed results
+		names = {save_name, 'latest'}
+		if regressions and '-A' not in argv: names.discard('latest')
+		os.makedirs(BASELINE_DIR, exist_ok = True)
+		for name in names:
+			with open(baseline_path(name), 'w') as f:
+				json.dump(results, f, indent = 2)
+		if names: print(f'Results saved as baseline {", ".join(sorted(names))}')
+		if 'latest' not in names:
+			print('Baseline latest not replaced because of regressions (-A to accept them)')
+	if regressions: exit(1)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+
+class ResultCache:
+	'''
+	LRU cache of query results, keyed by the normalized query text, its
+	parameters and the version of the dataset the query ran on.
+	Entries are kept in memory and, if a path is given, persisted on disk so
+	that following runs on the same dataset can reuse them. The cache file is
+	unpickled, so it should only be shared between trusted runs.
+	'''
+
+	def __init__(self, path: str = None, max_rows: int = 100000):
+		'''
+		Args:
+			path: file where entries are persisted, if any.
+			max_rows: maximum number of rows held by all entries together; least
+				recently used entries are evicted above it.
+		'''
+
+		self.path = path
+		self.max_rows = max_rows
+		self.version = None
+		self.entries = OrderedDict()
+		self.rows = 0
+		self.hits = 0
+		self.misses = 0
+		if path is not None and os.path.exists(path):
+			with open(path, 'rb') as f:
+				self.version, entries = pickle.load(f)
+			for key, value in entries:
+				self.__store(key, value)
+
+	def key(self, query: str, params: dict = None) -> str:
+		'''
+		Key of a query: whitespace is normalized so that formatting changes do
+		not defeat the cache.
+		'''
+
+		data = json.dumps(
+			[' '.join(query.split()), params or {}, self.version],
+			sort_keys = True,
+			default = str
+		)
+		return hashlib.sha256(data.encode()).hexdigest()
+
+	def fetch(self, query: str, params: dict, run) -> list:
+		'''
+		Returns the rows of a query, calling run() to compute them on a miss.
+
+		Args:
+			query: text of the query.
+			params: parameters of the query, if any.
+			run: function returning the rows of the query as a list.
+		'''
+
+		key = self.key(query, params)
+		if key in self.entries:
+			self.hits += 1
+			self.entries.move_to_end(key)
+			return self.entries[key]
+		self.misses += 1
+		rows = run()
+		self.__store(key, rows)
+		return rows
+
+	def __store(self, key: str, rows: list):
+		if len(rows) > self.max_rows: return
+		self.entries[key] = rows
+		self.rows += len(rows)
+		while self.rows > self.max_rows:
+			_, evicted = self.entries.popitem(last = False)
+			self.rows -= len(evicted)
+
+	def set_version(self, version: str):
+		'''
+		Sets the version of the dataset queries run on. Entries of any other
+		version are dropped.
+		'''
+
+		if version != self.version:
+			self.invalidate()
+			self.version = version
+
+	def invalidate(self):
+		'''
+		Drops all entries, to be called whenever the database is modified.
+		'''
+
+		self.entries.clear()
+		self.rows = 0
+
+	def save(self):
+		'''
+		Persists entries on disk, if the cache has a path.
+		'''
+
+		if self.path is None: return
+		tmp = self.path + '.tmp'
+		with open(tmp, 'wb') as f:
+			pickle.dump((self.version, list(self.entries.items())), f)
+		os.replace(tmp, self.path)
+
+	def stats(self) -> str:
+		total = self.hits + self.misses
+		ratio = self.hits / total if total else 0
+		return (f'Result cache: {self.hits} hits, {self.misses} misses'
+						+ f' ({ratio:.0%} hit ratio), {len(self.entries)} entries,'
+						+ f' {self.rows} rows')
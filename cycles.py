@@ -0,0 +1,160 @@
+import numpy as np
+import time
+from itertools import islice
+from multiprocessing import Pool
+from sys import argv
+import dataset
+from engine import PokemonEngine
+from strong_against import StrongAgainst
+
+# Graph searched by pool workers, set by the pool initializer
+_finder = None
+
+class CycleFinder:
+	'''
+	In-process enumeration of the paths of query 8 (data_and_topo): paths p1 ->
+	... -> p2 of 3 or 4 STRONG_AGAINST hops, where no Pokemon but the last is
+	strong against p1, p2 is strong against p1 and p1 is not strong against p2.
+
+	Paths follow the semantics of the Cypher quantified path pattern: a
+	relationship is traversed at most once, while Pokemon may repeat.
+	'''
+
+	def __init__(self, strong: StrongAgainst, names: list, hops: tuple = (3, 4)):
+		'''
+		Args:
+			strong: STRONG_AGAINST edges.
+			names: name of each Pokemon.
+			hops: minimum and maximum number of hops of a path.
+		'''
+
+		self.strong = strong
+		self.names = list(names)
+		self.hops = hops
+		self.indptr, self.indices = strong.csr()
+
+	@classmethod
+	def from_engine(cls, engine: PokemonEngine, values: tuple = (0.25, 0.5)):
+		return cls(StrongAgainst.from_engine(engine, values), engine.names)
+
+	def targets(self, p: int) -> np.ndarray:
+		return self.indices[self.indptr[p]:self.indptr[p + 1]]
+
+	def start_paths(self, p1: int):
+		'''
+		Generates the paths starting from p1, as lists of indices, with a depth
+		first search bounded by the maximum number of hops.
+		'''
+
+		low, high = self.hops
+		n = len(self.names)
+		# Pokemon strong against p1 can only end a path, as long as p1 is not
+		# strong against them; any other Pokemon can only be inside a path
+		attackers = np.zeros(n, dtype = bool)
+		attackers[self.strong.sources(p1)] = True
+		ends = attackers.copy()
+		ends[self.targets(p1)] = False
+		inner = ~attackers
+		path = [p1]
+		edges = set()
+		# stack of iterators over the candidates of each depth
+		stack = [iter(self.targets(p1)[inner[self.targets(p1)]].tolist())]
+		while stack:
+			depth = len(stack)
+			q = next(stack[-1], None)
+			if q is None:
+				stack.pop()
+				p = path.pop()
+				if stack: edges.discard((path[-1], p))
+				continue
+			edge = (path[-1], q)
+			if edge in edges: continue
+			if depth + 1 >= low:
+				# last hop, towards a Pokemon strong against p1
+				targets = self.targets(q)
+				for end in targets[ends[targets]].tolist():
+					if (q, end) not in edges and (q, end) != edge:
+						yield path + [q, end]
+			if depth + 1 < high:
+				edges.add(edge)
+				path.append(q)
+				targets = self.targets(q)
+				stack.append(iter(targets[inner[targets]].tolist()))
+		return
+
+	def paths(self, starts = None, limit: int = None, processes: int = 1):
+		'''
+		Generates paths as lists of names.
+
+		Args:
+			starts: indices of the Pokemon paths start from (default: all).
+			limit: maximum number of paths, if any.
+			processes: number of worker processes searching from distinct starts.
+		'''
+
+		starts = range(len(self.names)) if starts is None else starts
+		if processes <= 1:
+			found = (p for p1 in starts for p in self.start_paths(p1))
+		else:
+			found = self.__parallel_paths(starts, limit, processes)
+		for path in islice(found, limit):
+			yield [self.names[p] for p in path]
+
+	def __parallel_paths(self, starts, limit: int, processes: int):
+		with Pool(processes, _init_worker, (self,)) as pool:
+			for res in pool.imap(_start_paths, [(p1, limit) for p1 in starts]):
+				yield from res
+
+	def is_path(self, names: list) -> bool:
+		'''
+		Whether a path given as names, e.g. returned by a database, is one of the
+		paths this finder enumerates.
+		'''
+
+		index = {name: i for i, name in enumerate(self.names)}
+		path = [index[name] for name in names]
+		edges = list(zip(path, path[1:]))
+		strong = lambda a, b: b in self.targets(a)
+		p1, p2 = path[0], path[-1]
+		return (
+			self.hops[0] <= len(edges) <= self.hops[1]
+			and len(set(edges)) == len(edges)
+			and all(strong(a, b) for a, b in edges)
+			and not any(strong(p, p1) for p in path[:-1])
+			and strong(p2, p1)
+			and not strong(p1, p2)
+		)
+
+def _init_worker(finder: CycleFinder):
+	global _finder
+	_finder = finder
+
+def _start_paths(args: tuple) -> list:
+	p1, limit = args
+	return list(islice(_finder.start_paths(p1), limit))
+
+def benchmark(finder: CycleFinder, limit: int, processes: int) -> tuple:
+	'''
+	Time to the first path and to limit paths, in ms, and the number of paths.
+	'''
+
+	start = time.perf_counter()
+	first = None
+	count = 0
+	for _ in finder.paths(limit = limit, processes = processes):
+		if first is None: first = (time.perf_counter() - start) * 1000
+		count += 1
+	return first, (time.perf_counter() - start) * 1000, count
+
+if __name__ == '__main__':
+	datafile = argv[1] if len(argv) > 1 else 'pokemon.csv'
+	limit = int(argv[2]) if len(argv) > 2 else 30
+	processes = int(argv[3]) if len(argv) > 3 else 1
+	start = time.perf_counter()
+	finder = CycleFinder.from_engine(PokemonEngine(dataset.read_rows(datafile)))
+	elapsed = (time.perf_counter() - start) * 1000
+	print(f'Adjacency of {len(finder.indices)} edges built in {elapsed:.2f} ms')
+	for path in finder.paths(limit = limit, processes = processes):
+		print(path)
+	first, total, count = benchmark(finder, limit, processes)
+	print(f'{count} paths in {total:.2f} ms (first after {first:.2f} ms)')
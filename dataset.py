@@ -0,0 +1,123 @@
+import csv
+import hashlib
+import json
+
+TYPES = [
+	'bug', 'dark', 'dragon', 'electric', 'fairy', 'fighting', 'fire',
+	'flying', 'ghost', 'grass', 'ground', 'ice', 'normal', 'poison',
+	'psychic', 'rock', 'steel', 'water'
+]
+
+INT_COLUMNS = [
+	'attack', 'base_egg_steps', 'base_happiness', 'base_total', 'capture_rate',
+	'defense', 'experience_growth', 'hp', 'pokedex_number', 'sp_attack',
+	'sp_defense', 'speed', 'generation', 'is_legendary'
+]
+
+FLOAT_COLUMNS = [
+	'height_m', 'percentage_male', 'weight_kg'
+] + [f'against_{"fight" if t == "fighting" else t}' for t in TYPES]
+
+def fingerprint(datafile: str, version) -> str:
+	'''
+	Content hash of a csv file combined with the version of the code importing
+	it. Two imports with the same fingerprint produce the same database.
+
+	Args:
+		datafile: path to the csv file to be imported.
+		version: version of the import code, to be bumped whenever the schema or
+			the import queries change, along with any import option changing the
+			resulting database.
+	'''
+
+	h = hashlib.sha256(f'{version}\n'.encode())
+	with open(datafile, 'rb') as f:
+		while chunk := f.read(1 << 16):
+			h.update(chunk)
+	return h.hexdigest()
+
+def clean_abilities(abilities: str) -> list:
+	'''
+	Turns the python-like list of abilities of the csv file into a list of
+	names, the same way both importers do.
+	'''
+
+	return [
+		a.strip().replace(']', '').replace('[', '').replace("'", '')
+		for a in abilities.split(',')
+	]
+
+def parse_row(row: dict) -> dict:
+	'''
+	Typed copy of a row read from the csv file: empty fields become None,
+	numbers are converted and abilities are cleaned.
+	'''
+
+	res = {}
+	for key, value in row.items():
+		if value == '': res[key] = None
+		elif key == 'abilities': res[key] = clean_abilities(value)
+		elif key in INT_COLUMNS: res[key] = int(value)
+		elif key in FLOAT_COLUMNS: res[key] = float(value)
+		else: res[key] = value
+	return res
+
+def read_rows(datafile: str) -> list:
+	'''
+	Reads and parses all rows of a csv file, or of a snapshot of it (see
+	snapshot.py) without any parsing.
+	'''
+
+	# imported here, as snapshot.py imports this module
+	from snapshot import Snapshot, is_snapshot
+	if is_snapshot(datafile):
+		with Snapshot(datafile) as s:
+			return s.read_rows()
+	with open(datafile, 'r') as f:
+		return [parse_row(row) for row in csv.DictReader(f)]
+
+def row_hash(row: dict) -> str:
+	'''
+	Hash of a parsed row, used to detect which Pokemon changed between two
+	versions of the dataset.
+	'''
+
+	data = json.dumps(row, sort_keys = True, ensure_ascii = False)
+	return hashlib.sha1(data.encode()).hexdigest()
+
+def diff(rows: list, stored: dict) -> tuple:
+	'''
+	Compares parsed rows with the state stored in a database.
+	Returns the rows to insert or replace, and the pokedex numbers to delete.
+
+	Args:
+		rows: parsed rows of the new dataset.
+		stored: row hashes currently in database, keyed by pokedex number.
+	'''
+
+	upserts = []
+	seen = set()
+	for row in rows:
+		number = row['pokedex_number']
+		seen.add(number)
+		if stored.get(number) != row_hash(row):
+			upserts.append(row)
+	removed = [number for number in stored if number not in seen]
+	return upserts, removed
+
+def scale_rows(rows: list, factor: int) -> list:
+	'''
+	Synthetic dataset made of factor copies of rows, for benchmarks at scale.
+	Copies keep all values but get unique names and pokedex numbers.
+	'''
+
+	if factor <= 1: return rows
+	step = 10 ** len(str(max(row['pokedex_number'] for row in rows)))
+	return rows + [
+		dict(
+			row,
+			name = f"{row['name']} #{k}",
+			pokedex_number = row['pokedex_number'] + k * step
+		)
+		for k in range(1, factor) for row in rows
+	]
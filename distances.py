@@ -0,0 +1,238 @@
+import numpy as np
+import time
+from multiprocessing import Pool
+from sys import argv
+import dataset
+from engine import PokemonEngine
+from strong_against import StrongAgainst
+
+# Number of set bits of each byte
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype = np.int64)
+
+# Engine used by pool workers, set by the pool initializer
+_engine = None
+
+def popcount(bits: np.ndarray) -> int:
+	return int(POPCOUNT[bits.view(np.uint8)].sum())
+
+class DistanceEngine:
+	'''
+	Unweighted shortest path distances over STRONG_AGAINST, with breadth-first
+	searches from batches of sources at once: the frontier of each Pokemon is a
+	bitset of the sources that reached it, and a level ORs the frontiers of its
+	in-neighbours over the CSR adjacency. Only the sums and the longest
+	distances are kept, so the n² pairs are never materialized.
+	'''
+
+	def __init__(self, indptr: np.ndarray, indices: np.ndarray, names: list,
+							 batch_size: int = 256):
+		'''
+		Args:
+			indptr, indices: CSR adjacency, from source to target.
+			names: name of each Pokemon.
+			batch_size: number of sources searched at once, a multiple of 64.
+		'''
+
+		self.n = len(names)
+		self.names = list(names)
+		self.words = max(1, batch_size // 64)
+		# in-neighbours of each Pokemon, for ORing their frontiers
+		sources = np.repeat(np.arange(self.n), np.diff(indptr))
+		order = np.argsort(indices, kind = 'stable')
+		self.in_sources = sources[order]
+		self.in_indptr = np.searchsorted(indices[order], np.arange(self.n + 1))
+		self.has_in = np.diff(self.in_indptr) > 0
+		self.rank = np.empty(self.n, dtype = np.int64)
+		self.rank[np.argsort(np.array(self.names, dtype = str), kind = 'stable')] = (
+			np.arange(self.n)
+		)
+
+	@classmethod
+	def from_strong_against(cls, strong: StrongAgainst, names: list, **kwargs):
+		indptr, indices = strong.csr()
+		return cls(indptr, indices, names, **kwargs)
+
+	@classmethod
+	def from_neo4j(cls, session, **kwargs):
+		'''
+		Exports the STRONG_AGAINST relationships of a Neo4j database.
+		'''
+
+		names = [r[0] for r in session.run(
+			'MATCH (p:Pokemon) RETURN p.name ORDER BY p.pokedex_number'
+		)]
+		index = {name: i for i, name in enumerate(names)}
+		edges = np.array([
+			(index[a], index[b]) for a, b in session.run(
+				'MATCH (a:Pokemon)-[:STRONG_AGAINST]->(b:Pokemon) RETURN a.name, b.name'
+			)
+		], dtype = np.int64).reshape(-1, 2)
+		edges = edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+		indptr = np.searchsorted(edges[:, 0], np.arange(len(names) + 1))
+		return cls(indptr, edges[:, 1], names, **kwargs)
+
+	def batches(self) -> list:
+		size = self.words * 64
+		return [
+			np.arange(i, min(i + size, self.n)) for i in range(0, self.n, size)
+		]
+
+	def bits(self, mask: np.ndarray) -> np.ndarray:
+		'''
+		Bitset rows of a Pokemon x source mask of the current batch.
+		'''
+
+		padded = np.zeros((self.n, self.words * 64), dtype = bool)
+		padded[:, :mask.shape[1]] = mask
+		return np.packbits(padded, axis = 1, bitorder = 'little').view('<u8')
+
+	def levels(self, sources: np.ndarray):
+		'''
+		Generates, for each distance d >= 1, the bitset rows of the sources
+		reaching each Pokemon at exactly d hops.
+		'''
+
+		frontier = self.bits(np.arange(self.n)[:, None] == sources[None, :])
+		visited = frontier.copy()
+		while frontier.any():
+			reached = np.zeros_like(frontier)
+			reached[self.has_in] = np.bitwise_or.reduceat(
+				frontier[self.in_sources], self.in_indptr[:-1][self.has_in], axis = 0
+			)
+			frontier = reached & ~visited
+			visited |= frontier
+			if frontier.any(): yield frontier
+
+	def summarize(self, sources: np.ndarray, k: int = 10) -> dict:
+		'''
+		Distance statistics of the pairs starting from sources: number and sum of
+		finite distances between distinct Pokemon, the same for pairs ordered by
+		name, and the k longest distances.
+		'''
+
+		# sources with a smaller name than each target
+		before = self.bits(self.rank[sources][None, :] < self.rank[:, None])
+		res = {'pairs': 0, 'total': 0, 'named_pairs': 0, 'named_total': 0}
+		levels = []
+		for d, reached in enumerate(self.levels(sources), 1):
+			count = popcount(reached)
+			named = popcount(reached & before)
+			res['pairs'] += count
+			res['total'] += d * count
+			res['named_pairs'] += named
+			res['named_total'] += d * named
+			levels.append((d, reached))
+		longest = []
+		for d, reached in reversed(levels):
+			if len(longest) >= k: break
+			mask = np.unpackbits(
+				reached.view(np.uint8), axis = 1, bitorder = 'little'
+			)[:, :len(sources)]
+			targets, batch = np.nonzero(mask)
+			longest += [
+				(d, s, t) for s, t in zip(sources[batch].tolist(), targets.tolist())
+			]
+		res['longest'] = self.top(longest, k)
+		return res
+
+	def top(self, pairs: list, k: int) -> list:
+		'''
+		k longest pairs, by decreasing distance then source and target names.
+		'''
+
+		return sorted(
+			pairs, key = lambda p: (-p[0], self.rank[p[1]], self.rank[p[2]])
+		)[:k]
+
+	def all_pairs(self, k: int = 10, processes: int = 1) -> dict:
+		'''
+		Distance statistics of all pairs, merged over batches of sources,
+		searched by a pool of processes if processes > 1.
+
+		Args:
+			k: number of longest distances kept.
+			processes: number of worker processes.
+		'''
+
+		batches = self.batches()
+		if processes > 1:
+			with Pool(processes, _init_worker, (self,)) as pool:
+				results = pool.map(_summarize, [(sources, k) for sources in batches])
+		else:
+			results = [self.summarize(sources, k) for sources in batches]
+		res = {
+			key: sum(r[key] for r in results)
+			for key in ['pairs', 'total', 'named_pairs', 'named_total']
+		}
+		res['longest'] = self.top([p for r in results for p in r['longest']], k)
+		return res
+
+	def distance(self, source: int, target: int) -> float:
+		if source == target: return 0
+		for d, reached in enumerate(self.levels(np.array([source])), 1):
+			if reached[target, 0] & 1: return d
+		return float('inf')
+
+	def verify(self, paths: list) -> list:
+		'''
+		Returns the (source, target, distance) rows, e.g. computed by GDS, whose
+		distance differs from the local one.
+		'''
+
+		index = {name: i for i, name in enumerate(self.names)}
+		return [
+			(source, target, distance) for source, target, distance in paths
+			if self.distance(index[source], index[target]) != distance
+		]
+
+def _init_worker(engine: DistanceEngine):
+	global _engine
+	_engine = engine
+
+def _summarize(args: tuple) -> dict:
+	sources, k = args
+	return _engine.summarize(sources, k)
+
+def average(res: dict) -> float:
+	'''
+	Average distance of the pairs ordered by name, as computed with dijkstra.
+	'''
+
+	return res['named_total'] / res['named_pairs'] if res['named_pairs'] else None
+
+def print_longest(pairs: list):
+	'''
+	Prints the longest distances, given as (source name, target name,
+	distance) rows.
+	'''
+
+	print('Shortest paths between Pokemon:')
+	for s, t, d in pairs:
+		print(f'Shortest path between {s} and {t}: {d}')
+
+def print_average(value: float):
+	print('Average length of the shortest path between all pairs of Pokemon: '
+				+ str(value))
+
+def print_summary(res: dict, names: list):
+	'''
+	Prints the longest distances and the average distance of all_pairs, as
+	the shortest path analysis queries do (see Neo4jAnalysis.shortest_path and
+	dijkstra).
+	'''
+
+	print_longest([(names[s], names[t], float(d)) for d, s, t in res['longest']])
+	print_average(average(res))
+
+if __name__ == '__main__':
+	datafile = argv[1] if len(argv) > 1 else 'pokemon.csv'
+	processes = int(argv[2]) if len(argv) > 2 else 1
+	engine = PokemonEngine(dataset.read_rows(datafile))
+	distances = DistanceEngine.from_strong_against(
+		StrongAgainst.from_engine(engine), engine.names
+	)
+	start = time.perf_counter()
+	res = distances.all_pairs(processes = processes)
+	elapsed = (time.perf_counter() - start) * 1000
+	print_summary(res, distances.names)
+	print(f'{res["pairs"]} reachable pairs in {elapsed:.2f} ms')
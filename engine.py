@@ -0,0 +1,275 @@
+import numpy as np
+import time
+from sys import argv
+import dataset
+import resultdiff
+from snapshot import is_snapshot
+from typestats import CLASSES
+
+class PokemonEngine:
+	'''
+	In-process engine answering the general queries (1 to 7) of Neo4jQueries
+	with vectorized operations over column arrays, without any database.
+	Methods have the same names and parameters as the query templates of
+	Neo4jQueries, and return the same rows as the database would.
+	'''
+
+	def __init__(self, rows: list):
+		'''
+		Args:
+			rows: parsed rows of the dataset (see dataset.read_rows).
+		'''
+
+		self.names = np.array([row['name'] for row in rows], dtype = object)
+		self.pokedex = np.array([row['pokedex_number'] for row in rows])
+		self.attack = np.array([row['attack'] for row in rows])
+		self.weight = np.array(
+			[np.nan if row['weight_kg'] is None else row['weight_kg'] for row in rows]
+		)
+		self.types = list(dataset.TYPES)
+		type_index = {t: i for i, t in enumerate(self.types)}
+		# effectiveness matrix: Pokemon x type
+		self.against = np.array([
+			[row[f"against_{'fight' if t == 'fighting' else t}"] for t in self.types]
+			for row in rows
+		])
+		self.type1 = np.array([type_index[row['type1']] for row in rows])
+		self.type2 = np.array(
+			[-1 if row['type2'] is None else type_index[row['type2']] for row in rows]
+		)
+		# type membership matrix: Pokemon x type
+		self.has_type = np.zeros((len(rows), len(self.types)), dtype = bool)
+		self.has_type[np.arange(len(rows)), self.type1] = True
+		second = self.type2 >= 0
+		self.has_type[np.nonzero(second)[0], self.type2[second]] = True
+		# ability membership matrix: Pokemon x ability
+		self.abilities = sorted({a for row in rows for a in row['abilities']})
+		ability_index = {a: i for i, a in enumerate(self.abilities)}
+		self.has_ability = np.zeros(
+			(len(rows), len(self.abilities)), dtype = bool
+		)
+		# PairIndex answering predicate_function, built on first use
+		self.pair_index = None
+		for i, row in enumerate(rows):
+			self.has_ability[i, [ability_index[a] for a in row['abilities']]] = True
+
+	@classmethod
+	def from_csv(cls, datafile: str):
+		if is_snapshot(datafile): return cls.from_snapshot(datafile)
+		return cls(dataset.read_rows(datafile))
+
+	@classmethod
+	def from_snapshot(cls, path: str):
+		'''
+		Builds the engine from the columns of a snapshot, without going through
+		rows.
+		'''
+
+		from snapshot import Snapshot
+		engine = cls.__new__(cls)
+		engine.types = list(dataset.TYPES)
+		with Snapshot(path) as s:
+			n = s.rows
+			engine.names = np.array(s.values('name'), dtype = object)
+			engine.pokedex = s.column('pokedex_number').astype(np.int64)
+			engine.attack = s.column('attack').astype(np.int64)
+			engine.weight = s.column('weight_kg').astype(np.float64)
+			engine.against = np.stack([
+				s.column(f"against_{'fight' if t == 'fighting' else t}")
+				for t in engine.types
+			], axis = 1).astype(np.float64)
+			# dictionary codes are translated into type indices, -1 staying -1
+			for column in ['type1', 'type2']:
+				lookup = np.array(
+					[engine.types.index(t) for t in s.dictionary(column)] + [-1]
+				)
+				setattr(engine, column, lookup[s.column(column)])
+			engine.has_type = np.zeros((n, len(engine.types)), dtype = bool)
+			engine.has_type[np.arange(n), engine.type1] = True
+			second = engine.type2 >= 0
+			engine.has_type[np.nonzero(second)[0], engine.type2[second]] = True
+			# snapshot dictionaries are sorted, as engine abilities
+			engine.abilities = list(s.dictionary('abilities'))
+			counts = np.diff(s.offsets('abilities'))
+			engine.has_ability = np.zeros((n, len(engine.abilities)), dtype = bool)
+			engine.has_ability[
+				np.repeat(np.arange(n), counts), s.column('abilities')
+			] = True
+		engine.pair_index = None
+		return engine
+
+	def type_columns(self, types) -> list:
+		return [self.types.index(t) for t in types if t in self.types]
+
+	def starts_with(self, prefixes) -> np.ndarray:
+		'''
+		Mask of Pokemon whose name starts with any of the prefixes.
+		'''
+
+		return np.array(
+			[name.startswith(tuple(prefixes)) for name in self.names], dtype = bool
+		)
+
+	def negative_filter(self, weak_against: str = 'fire',
+											strong_against: str = 'water') -> list:
+		weak = self.against[:, self.types.index(weak_against)] == 2
+		strong = self.against[:, self.types.index(strong_against)] == 0.5
+		return [(int(np.count_nonzero(~weak & ~strong)),)]
+
+	def optional_match(self, type: str = 'psychic',
+										 excluded: tuple = ('psychic', 'fighting'),
+										 values: tuple = (0.5, 0.25)) -> list:
+		columns = [i for i, t in enumerate(self.types) if t not in excluded]
+		res = []
+		for p in np.nonzero(self.type1 == self.types.index(type))[0]:
+			matches = [
+				(self.names[p], self.types[i], float(self.against[p, i]))
+				for i in columns if self.against[p, i] in values
+			]
+			res += matches or [(self.names[p], None, None)]
+		return res
+
+	def collect_unwind(self, type: str = 'psychic',
+										 values: tuple = (2, 4)) -> list:
+		weak = np.isin(self.against[:, self.types.index(type)], values)
+		counts = self.has_ability[weak].sum(axis = 0)
+		return [
+			(self.abilities[i], int(counts[i])) for i in np.nonzero(counts)[0]
+		]
+
+	collect_unwind_variant = collect_unwind
+
+	def collect_unwind_stats(self, type: str = 'psychic') -> list:
+		return self.collect_unwind(type, CLASSES['weak'])
+
+	def reduce(self, prefix: str = 'A',
+						 types: tuple = ('fire', 'water', 'grass'),
+						 values: tuple = (2, 4)) -> list:
+		weak = np.isin(self.against[:, self.type_columns(types)], values).any(axis = 1)
+		selected = weak & self.starts_with([prefix])
+		res = []
+		for i, ability in enumerate(self.abilities):
+			pokemon = np.nonzero(selected & self.has_ability[:, i])[0]
+			if len(pokemon):
+				res.append((
+					ability,
+					int(self.attack[pokemon].sum()),
+					list(self.names[pokemon])
+				))
+		return res
+
+	reduce_prefix = reduce
+
+	def with_filter_aggregate(self, value: float = 0, more_than: int = 1) -> list:
+		counts = (self.against == value).sum(axis = 1)
+		selected = np.nonzero(counts > more_than)[0]
+		return sorted(
+			(self.names[p], int(counts[p])) for p in selected
+		)
+
+	def predicate_function(self, prefixes: tuple = ('f', 'g', 'F', 'G')) -> list:
+		'''
+		Pairs of query 6, ordered as the database returns them, from the bitsets
+		of a PairIndex built once for the engine.
+		'''
+
+		if self.pair_index is None:
+			# imported here, as pair_index.py imports this module
+			from pair_index import PairIndex
+			self.pair_index = PairIndex(self)
+		return self.pair_index.predicate_function(prefixes)
+
+	def predicate_function_scan(self, prefixes: tuple = ('f', 'g', 'F', 'G')) -> list:
+		'''
+		Same as predicate_function, scanning the members of each type instead of
+		using the PairIndex.
+		'''
+
+		immune = (self.against == 0).any(axis = 1)
+		starts = self.starts_with(prefixes)
+		res = set()
+		for t, type_name in enumerate(self.types):
+			members = np.nonzero(self.has_type[:, t] & immune)[0]
+			if type_name.startswith(tuple(prefixes)):
+				# the type is the single node starting with a prefix
+				first = second = members[~starts[members]]
+			else:
+				first = members[starts[members]]
+				second = members[~starts[members]]
+			p1, p2 = np.meshgrid(first, second, indexing = 'ij')
+			p1, p2 = p1.ravel(), p2.ravel()
+			# pairs are ordered by pokedex number, whichever starts with a prefix
+			p1, p2 = (
+				np.where(self.pokedex[p1] < self.pokedex[p2], p1, p2),
+				np.where(self.pokedex[p1] < self.pokedex[p2], p2, p1)
+			)
+			keep = self.pokedex[p1] < self.pokedex[p2]
+			res.update(
+				(self.names[a], self.names[b], type_name)
+				for a, b in zip(p1[keep], p2[keep])
+			)
+		return sorted(res)
+
+	predicate_function_prefix = predicate_function
+
+	def post_union_processing(self, limit: int = 10) -> list:
+		known = np.nonzero(~np.isnan(self.weight))[0]
+		# ties are broken by name, as the ORDER BY clauses of the databases do
+		names = self.names[known].astype(str)
+		light = known[np.lexsort((names, self.weight[known]))]
+		heavy = known[np.lexsort((names, -self.weight[known]))]
+		selected = set(light[:limit]) | set(heavy[:limit])
+		res = [
+			(
+				self.names[p],
+				float(self.weight[p]),
+				[self.types[t] for t in (self.type1[p], self.type2[p]) if t >= 0]
+			)
+			for p in selected
+		]
+		return sorted(res, key = lambda row: (row[1], row[0]))
+
+	post_union_processing_variant = post_union_processing
+
+	def type_stats(self) -> list:
+		return [
+			(t, *(
+				int(np.isin(self.against[:, i], values).sum())
+				for values in CLASSES.values()
+			)) for i, t in enumerate(self.types)
+		]
+
+def verify(nrq, engine: PokemonEngine) -> list:
+	'''
+	Compares the results of each query template of nrq with those of the
+	engine, whatever their order. Returns the names of the templates whose
+	results differ.
+
+	Args:
+		nrq: Neo4jQueries (or any of its variants) connected to a database.
+		engine: engine loaded with the same dataset as the database.
+	'''
+
+	differ = []
+	for name, (query, params) in nrq.templates().items():
+		expected = getattr(engine, name)(**params)
+		res = resultdiff.hashed(nrq.fetch(query, **params), expected, buckets = 1)
+		if not res.equal:
+			differ.append(name)
+	return differ
+
+if __name__ == '__main__':
+	datafile = argv[1] if len(argv) > 1 else 'pokemon.csv'
+	start = time.perf_counter()
+	engine = PokemonEngine.from_csv(datafile)
+	print(f'Loaded {datafile} in {(time.perf_counter() - start) * 1000:.2f} ms')
+	for name in [
+		'negative_filter', 'optional_match', 'collect_unwind', 'reduce',
+		'with_filter_aggregate', 'predicate_function', 'post_union_processing'
+	]:
+		start = time.perf_counter()
+		res = getattr(engine, name)()
+		elapsed = (time.perf_counter() - start) * 1000
+		print(f'{name} ({len(res)} rows, {elapsed:.3f} ms):')
+		for row in res: print(row)
+		print()
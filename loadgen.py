@@ -0,0 +1,289 @@
+import queue
+import random
+import threading
+import time
+
+class Histogram:
+	'''
+	Latency histogram in the style of HdrHistogram: values (in microseconds)
+	are counted in buckets whose width doubles with each power of two, split
+	into 2^sub_bits sub-buckets, so that any value is recorded with a relative
+	error below 2^(1 - sub_bits) in constant memory, whatever the range.
+	'''
+
+	def __init__(self, sub_bits: int = 7):
+		'''
+		Args:
+			sub_bits: number of bits of precision of recorded values.
+		'''
+
+		self.sub_bits = sub_bits
+		self.counts = {}
+		self.total = 0
+		self.sum = 0
+		self.max = 0
+
+	def index(self, value: int) -> int:
+		shift = max(0, value.bit_length() - self.sub_bits)
+		return (shift << self.sub_bits) | (value >> shift)
+
+	def value(self, index: int) -> int:
+		'''
+		Highest value counted in a bucket.
+		'''
+
+		shift = index >> self.sub_bits
+		return (((index & ((1 << self.sub_bits) - 1)) + 1) << shift) - 1
+
+	def record(self, value: int, count: int = 1):
+		value = max(0, int(value))
+		i = self.index(value)
+		self.counts[i] = self.counts.get(i, 0) + count
+		self.total += count
+		self.sum += value * count
+		self.max = max(self.max, value)
+
+	def merge(self, other):
+		for i, count in other.counts.items():
+			self.counts[i] = self.counts.get(i, 0) + count
+		self.total += other.total
+		self.sum += other.sum
+		self.max = max(self.max, other.max)
+
+	def percentile(self, p: float) -> int:
+		if not self.total: return 0
+		rank = max(1, -(-self.total * p // 100))
+		seen = 0
+		for i in sorted(self.counts):
+			seen += self.counts[i]
+			if seen >= rank: return min(self.value(i), self.max)
+		return self.max
+
+	def mean(self) -> float:
+		return self.sum / self.total if self.total else 0
+
+	def summary(self) -> dict:
+		'''
+		Count, mean, percentiles and maximum, in ms.
+		'''
+
+		res = {'count': self.total, 'mean': self.mean() / 1000}
+		for p in [50, 90, 99, 99.9]:
+			res[f'p{p}'] = self.percentile(p) / 1000
+		res['max'] = self.max / 1000
+		return res
+
+class LoadGenerator:
+	'''
+	Drives a weighted mix of read-only queries from several worker threads,
+	each with its own connection, and records their latency.
+
+	In closed loop, each worker runs its next query as soon as the previous
+	one is done, so the load is set by the number of workers. In open loop,
+	queries are scheduled at a fixed arrival rate, whatever the response time,
+	and latency is measured from their scheduled start: time spent waiting for
+	a free worker is counted, which avoids coordinated omission.
+	'''
+
+	def __init__(self, connect, queries: dict, weights: dict = None,
+							 method: str = 'run', seed: int = 0):
+		'''
+		Args:
+			connect: function returning a new connection, closed with close().
+			queries: (query, params) of each query name.
+			weights: weight of each query name in the mix (default: 1 each).
+			method: method of a connection running a query and returning an
+				iterable over its rows, e.g. 'run' for a Neo4j session or 'execute'
+				for a Postgres connection.
+			seed: seed of the query mix.
+		'''
+
+		self.connect = connect
+		self.queries = queries
+		self.names = list(queries)
+		weights = weights or {}
+		self.weights = [weights.get(name, 1) for name in self.names]
+		self.method = method
+		self.seed = seed
+
+	def run_one(self, connection, name: str):
+		query, params = self.queries[name]
+		for _ in getattr(connection, self.method)(query, params):
+			pass
+
+	def worker(self, index: int, jobs, deadline: float, warmup_end: float,
+						 results: dict):
+		'''
+		Runs queries until deadline: from the jobs queue of scheduled start times
+		(open loop), or one after the other (closed loop, no queue).
+		'''
+
+		rng = random.Random(self.seed * 1000 + index)
+		histograms = {name: Histogram() for name in self.names}
+		errors = 0
+		connection = self.connect()
+		try:
+			while True:
+				if jobs is None:
+					scheduled = time.perf_counter()
+					if scheduled >= deadline: break
+				else:
+					scheduled = jobs.get()
+					if scheduled is None: break
+					delay = scheduled - time.perf_counter()
+					if delay > 0: time.sleep(delay)
+				name = rng.choices(self.names, self.weights)[0]
+				try:
+					self.run_one(connection, name)
+				except Exception:
+					errors += 1
+					continue
+				end = time.perf_counter()
+				if scheduled >= warmup_end:
+					histograms[name].record((end - scheduled) * 1e6)
+		finally:
+			connection.close()
+			with results['lock']:
+				for name, histogram in histograms.items():
+					results['histograms'][name].merge(histogram)
+				results['errors'] += errors
+
+	def run(self, workers: int, duration: float, rate: float = None,
+					warmup: float = 1, poisson: bool = True) -> dict:
+		'''
+		Runs the load for warmup + duration seconds, and returns the latency
+		histogram of each query and of all queries, the throughput (queries per
+		second after warmup) and the number of errors. In open loop, also the
+		number of scheduled queries that could not start before the end.
+
+		Args:
+			workers: number of worker threads (and connections).
+			duration: measured duration, in seconds.
+			rate: arrival rate in queries per second (open loop), if any.
+			warmup: duration before measurements start, in seconds.
+			poisson: in open loop, whether arrivals are a Poisson process rather
+				than evenly spaced.
+		'''
+
+		results = {
+			'lock': threading.Lock(),
+			'histograms': {name: Histogram() for name in self.names},
+			'errors': 0
+		}
+		start = time.perf_counter()
+		warmup_end = start + warmup
+		deadline = warmup_end + duration
+		jobs = None if rate is None else queue.Queue()
+		threads = [
+			threading.Thread(
+				target = self.worker, args = (i, jobs, deadline, warmup_end, results)
+			) for i in range(workers)
+		]
+		for thread in threads: thread.start()
+		missed = 0
+		if jobs is not None:
+			rng = random.Random(self.seed)
+			scheduled = start
+			try:
+				while scheduled < deadline:
+					jobs.put(scheduled)
+					scheduled += rng.expovariate(rate) if poisson else 1 / rate
+					delay = min(scheduled, deadline) - time.perf_counter()
+					if delay > 0: time.sleep(delay)
+				# queries still waiting at the deadline are dropped, and reported
+				while True:
+					try:
+						jobs.get_nowait()
+					except queue.Empty:
+						break
+					missed += 1
+			finally:
+				for _ in threads: jobs.put(None)
+		for thread in threads: thread.join()
+		histograms = results['histograms']
+		total = Histogram()
+		for histogram in histograms.values(): total.merge(histogram)
+		return {
+			'histograms': histograms,
+			'all': total,
+			'throughput': total.total / duration,
+			'errors': results['errors'],
+			'missed': missed
+		}
+
+	def curve(self, mode: str, levels: list, duration: float,
+						workers: int = None, warmup: float = 1) -> list:
+		'''
+		Throughput and latency at increasing load, for capacity planning: one row
+		per level, a number of workers in closed loop, an arrival rate in open
+		loop.
+
+		Args:
+			mode: 'closed' or 'open'.
+			levels: numbers of workers, or arrival rates.
+			duration: measured duration of each level, in seconds.
+			workers: number of workers in open loop (default: the highest rate,
+				so that workers are never the bottleneck below one second latency).
+			warmup: duration before measurements of each level, in seconds.
+		'''
+
+		rows = []
+		for level in levels:
+			if mode == 'closed':
+				res = self.run(int(level), duration, warmup = warmup)
+			else:
+				res = self.run(
+					workers or int(max(levels)), duration, rate = level, warmup = warmup
+				)
+			rows.append({
+				'mode': mode,
+				'level': level,
+				'throughput': res['throughput'],
+				'errors': res['errors'],
+				'missed': res['missed'],
+				**res['all'].summary(),
+				'queries': {
+					name: histogram.summary()
+					for name, histogram in res['histograms'].items()
+				}
+			})
+		return rows
+
+def parse_option(option: str) -> tuple:
+	'''
+	Mode, levels and duration of a command line option
+	'<closed|open>:<level,...>[:<duration>]', e.g. 'closed:1,2,4,8:30'.
+	'''
+
+	parts = option.split(':')
+	if parts[0] not in ['closed', 'open'] or len(parts) < 2:
+		raise ValueError(f'Unknown load option: {option}')
+	levels = [float(level) for level in parts[1].split(',')]
+	duration = float(parts[2]) if len(parts) > 2 else 10
+	return parts[0], levels, duration
+
+def parse_weights(option: str) -> dict:
+	'''
+	Weights of a command line option 'name=weight,...'.
+	'''
+
+	weights = {}
+	for item in option.split(','):
+		name, _, weight = item.partition('=')
+		weights[name] = float(weight)
+	return weights
+
+def print_curve(rows: list):
+	'''
+	Prints throughput and latency percentiles (ms) at each load level.
+	'''
+
+	level = 'Workers' if rows and rows[0]['mode'] == 'closed' else 'Rate (q/s)'
+	print('Throughput and latency (ms) under load:')
+	print(f'{level:<12}{"Throughput":<12}{"Mean":<10}{"p50":<10}{"p90":<10}'
+				+ f'{"p99":<10}{"p99.9":<10}{"Max":<10}{"Errors":<8}Missed')
+	for row in rows:
+		print(f'{row["level"]:<12g}{row["throughput"]:<12.1f}{row["mean"]:<10.2f}'
+					+ f'{row["p50"]:<10.2f}{row["p90"]:<10.2f}{row["p99"]:<10.2f}'
+					+ f'{row["p99.9"]:<10.2f}{row["max"]:<10.2f}{row["errors"]:<8}'
+					+ f'{row["missed"]}')
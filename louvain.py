@@ -0,0 +1,218 @@
+import numpy as np
+import time
+from sys import argv
+import dataset
+from engine import PokemonEngine
+
+class Graph:
+	'''
+	Undirected weighted graph as a symmetric CSR adjacency, where parallel
+	relationships add up their weights. A self-loop of weight w is stored as 2w,
+	so that the degree of a node is the sum of its row.
+	'''
+
+	def __init__(self, n: int, sources: np.ndarray, targets: np.ndarray,
+							 weights: np.ndarray = None, names: list = None):
+		'''
+		Args:
+			n: number of nodes.
+			sources, targets: ends of each relationship, as node indices.
+			weights: weight of each relationship (default: 1).
+			names: name of each node, if any.
+		'''
+
+		weights = np.ones(len(sources)) if weights is None else weights
+		rows = np.concatenate([sources, targets])
+		cols = np.concatenate([targets, sources])
+		keys, inverse = np.unique(rows * n + cols, return_inverse = True)
+		self.n = n
+		self.names = names
+		self.weights = np.bincount(inverse.ravel(), np.concatenate([weights, weights]))
+		self.indices = keys % n
+		self.indptr = np.searchsorted(keys // n, np.arange(n + 1))
+		self.degrees = np.bincount(keys // n, self.weights, minlength = n)
+		self.total = self.weights.sum()
+
+	@classmethod
+	def from_engine(cls, engine: PokemonEngine):
+		'''
+		Ability/Pokemon/Type graph of the relationships model: HAS_TYPE,
+		HAS_ABILITY and one AGAINST relationship per Pokemon and type.
+		'''
+
+		n = len(engine.names)
+		types, abilities = len(engine.types), len(engine.abilities)
+		pokemon = np.arange(n)
+		has_type = np.nonzero(engine.has_type)
+		has_ability = np.nonzero(engine.has_ability)
+		sources = np.concatenate([
+			has_type[0], has_ability[0], np.repeat(pokemon, types)
+		])
+		targets = np.concatenate([
+			n + has_type[1], n + types + has_ability[1], n + np.tile(np.arange(types), n)
+		])
+		names = list(engine.names) + engine.types + engine.abilities
+		return cls(n + types + abilities, sources, targets, names = names)
+
+	@classmethod
+	def from_neo4j(cls, session):
+		'''
+		Exports the Ability/Pokemon/Type graph of a Neo4j database, as projected
+		for the GDS community detection.
+		'''
+
+		nodes = session.run('''
+			MATCH (n) WHERE n:Ability OR n:Pokemon OR n:Type
+			RETURN elementId(n), n.name
+		''')
+		index, names = {}, []
+		for node_id, name in nodes:
+			index[node_id] = len(names)
+			names.append(name)
+		res = session.run('''
+			MATCH (a)-[:AGAINST|HAS_ABILITY|HAS_TYPE]->(b)
+			RETURN elementId(a), elementId(b)
+		''')
+		edges = np.array([(index[a], index[b]) for a, b in res], dtype = np.int64)
+		edges = edges.reshape(-1, 2)
+		return cls(len(names), edges[:, 0], edges[:, 1], names = names)
+
+	def neighbours(self, i: int) -> tuple:
+		start, end = self.indptr[i], self.indptr[i + 1]
+		return self.indices[start:end], self.weights[start:end]
+
+	def aggregate(self, partition: np.ndarray):
+		'''
+		Graph of the communities of a partition, numbered from 0.
+		'''
+
+		sources = np.repeat(np.arange(self.n), np.diff(self.indptr))
+		keep = sources <= self.indices
+		# edges are stored in both directions, and self-loops twice already
+		weights = np.where(sources == self.indices, self.weights / 2, self.weights)
+		return Graph(
+			partition.max() + 1,
+			partition[sources[keep]],
+			partition[self.indices[keep]],
+			weights[keep]
+		)
+
+	def modularity(self, partition: np.ndarray, resolution: float = 1.0) -> float:
+		sources = np.repeat(np.arange(self.n), np.diff(self.indptr))
+		inside = self.weights[partition[sources] == partition[self.indices]].sum()
+		totals = np.bincount(partition, self.degrees)
+		return (inside - resolution * (totals ** 2).sum() / self.total) / self.total
+
+def move_nodes(graph: Graph, partition: np.ndarray, resolution: float,
+							 rng: np.random.Generator, within: np.ndarray = None) -> bool:
+	'''
+	Moves nodes one at a time to the neighbouring community with the highest
+	modularity gain, until no move improves modularity. The gains of all the
+	neighbouring communities of a node are computed at once.
+	Returns whether any node moved.
+
+	Args:
+		graph: graph to partition.
+		partition: community of each node, updated in place.
+		resolution: resolution of the modularity.
+		rng: generator of the order nodes are visited in.
+		within: if given, nodes only move to communities inside their own one
+			(refinement), and only while they are still alone in their community.
+	'''
+
+	totals = np.bincount(partition, graph.degrees, minlength = graph.n)
+	sizes = np.bincount(partition, minlength = graph.n)
+	moved = False
+	improved = True
+	while improved:
+		improved = False
+		for i in rng.permutation(graph.n):
+			own = partition[i]
+			if within is not None and sizes[own] > 1: continue
+			neighbours, weights = graph.neighbours(i)
+			keep = neighbours != i
+			if within is not None:
+				keep &= within[neighbours] == within[i]
+			communities, inverse = np.unique(
+				partition[neighbours[keep]], return_inverse = True
+			)
+			links = np.bincount(inverse.ravel(), weights[keep], len(communities))
+			degree = graph.degrees[i]
+			totals[own] -= degree
+			# gain of joining each community, and of staying alone
+			gains = links - resolution * totals[communities] * degree / graph.total
+			stay = links[communities == own].sum() - resolution * totals[own] * degree / graph.total
+			best = own
+			if len(gains) and gains.max() > stay + 1e-12:
+				best = communities[gains.argmax()]
+			totals[best] += degree
+			if best != own:
+				sizes[own] -= 1
+				sizes[best] += 1
+				partition[i] = best
+				improved = moved = True
+		if within is not None: break
+	return moved
+
+def renumber(partition: np.ndarray) -> np.ndarray:
+	return np.unique(partition, return_inverse = True)[1].ravel()
+
+def communities(graph: Graph, resolution: float = 1.0, refine: bool = False,
+								seed: int = 0, max_levels: int = 10) -> np.ndarray:
+	'''
+	Community of each node with the Louvain algorithm, or with Leiden-style
+	refinement: communities are split into well connected subcommunities before
+	aggregation, while aggregated nodes start in their unrefined community.
+
+	Args:
+		graph: graph to partition.
+		resolution: resolution of the modularity.
+		refine: whether to refine communities before aggregation (Leiden).
+		seed: seed of the order nodes are visited in.
+		max_levels: maximum number of aggregation levels.
+	'''
+
+	rng = np.random.default_rng(seed)
+	membership = np.arange(graph.n)
+	partition = np.arange(graph.n)
+	for _ in range(max_levels):
+		moved = move_nodes(graph, partition, resolution, rng)
+		partition = renumber(partition)
+		if refine:
+			refined = np.arange(graph.n)
+			move_nodes(graph, refined, resolution, rng, within = partition)
+			refined = renumber(refined)
+		else:
+			refined = partition
+		if not moved and refined.max() + 1 == graph.n: break
+		membership = refined[membership]
+		# aggregated nodes start in the community of their members
+		start = np.zeros(refined.max() + 1, dtype = np.int64)
+		start[refined] = partition
+		graph = graph.aggregate(refined)
+		partition = start
+		if graph.n == 1: break
+	return renumber(partition[membership])
+
+def print_communities(name: str, partition: np.ndarray):
+	'''
+	Prints community sizes, as the GDS analysis queries do.
+	'''
+
+	sizes = np.bincount(partition)
+	print(f'{name} communities:')
+	for community in np.argsort(-sizes, kind = 'stable'):
+		print(f'Community n°{community} has size {sizes[community]}')
+	print(f'Number of communities: {len(sizes)}')
+
+if __name__ == '__main__':
+	datafile = argv[1] if len(argv) > 1 else 'pokemon.csv'
+	graph = Graph.from_engine(PokemonEngine(dataset.read_rows(datafile)))
+	print(f'Graph of {graph.n} nodes and {len(graph.indices) // 2} relationships')
+	for name, refine in [('Louvain', False), ('Leiden', True)]:
+		start = time.perf_counter()
+		partition = communities(graph, refine = refine)
+		elapsed = (time.perf_counter() - start) * 1000
+		print_communities(name, partition)
+		print(f'Modularity: {graph.modularity(partition):.4f} ({elapsed:.2f} ms)')
+		print()
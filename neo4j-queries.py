@@ -1,11 +1,75 @@
 from neo4j import GraphDatabase
 from sys import argv
+import inspect
+import os
+import statistics
+import tempfile
+import time
+from cache import ResultCache
+from engine import PokemonEngine, verify
+from strong_against import StrongAgainst
+from typestats import TypeStats
+import cycles
+import louvain
+import distances
+import tracing
+import resultdiff
+import loadgen
+import replay
+import dataset
+from snapshot import is_snapshot, write_snapshot
+
+# Bump whenever the schema or import_data changes, so that databases imported
+# with an older version are imported again.
+IMPORT_VERSION = 4
+
+# Number of rows sent per query when importing from the client.
+BATCH_SIZE = 1000
+
+# Graph models selectable at import time:
+# - relationships: type effectiveness as AGAINST relationships to Type nodes
+# - properties: type effectiveness as an `against` list on Pokemon nodes,
+#		indexed by the `index` property of Type nodes
+# - value_types: AGAINST relationships, plus one relationship per
+#		non-neutral effectiveness, typed by its value (see VALUE_TYPES)
+# - value_types_only: value-class relationships only
+MODELS = ['relationships', 'properties', 'value_types', 'value_types_only']
+
+# Relationship types of the value_types models, by effectiveness value
+VALUE_TYPES = {
+	4: 'WEAK_4X',
+	2: 'WEAK_2X',
+	0.5: 'RESIST_2X',
+	0.25: 'RESIST_4X',
+	0: 'IMMUNE'
+}
+
+# Index profiles: default (constraint and Type.name indexes only), or prefix,
+# adding a TEXT index on Pokemon names for the STARTS WITH filters of reduce
+# and predicate_function (see Neo4jQueries.prefix_seek)
+INDEX_PROFILES = ['default', 'prefix']
+
+# Name of the TEXT index of the prefix profile
+TEXT_INDEX = 'pokemon_name_text'
 
 class Neo4jDB:
-	def __init__(self, uri, user, password):
-		self.driver = GraphDatabase.driver(uri, auth = (user, password))
-		self.session = self.driver.session()
-		self.driver.verify_connectivity()
+	def __init__(self, uri, user, password, model = 'relationships',
+							 connect = GraphDatabase.driver, indexes = 'default'):
+		'''
+		Args:
+			uri, user, password: connection to the database.
+			model: graph model used at import.
+			connect: function creating a driver, as GraphDatabase.driver (e.g. a
+				recording or replay driver, see replay.py).
+			indexes: index profile applied after each load (see INDEX_PROFILES).
+		'''
+
+		with tracing.span('connect', uri = uri):
+			self.driver = connect(uri, auth = (user, password))
+			self.session = self.driver.session()
+			self.driver.verify_connectivity()
+		self.model = model
+		self.indexes = indexes
 
 	def close(self):
 		self.driver.close()
@@ -45,23 +109,33 @@ class Neo4jDB:
 
 		self.session.run('CREATE INDEX FOR (t:Type) ON (t.name)')
 
-	def import_data(self):
+	def apply_index_profile(self):
 		'''
-		Imports the data from pokemon.csv file into the database.
-		The file *must* already be placed in the import directory of Neo4j.
+		Creates the indexes of the index profile, and drops those of the others.
+		Indexes of profiles are not part of the imported data, so switching
+		profile does not import again.
 		'''
 
-		types = [
-			'bug', 'dark', 'dragon', 'electric', 'fairy', 'fighting', 'fire',
-			'flying', 'ghost', 'grass', 'ground', 'ice', 'normal', 'poison',
-			'psychic', 'rock', 'steel', 'water'
-		]
-		# Ability cleaning should also work using 
-		# apoc.text.replace(ability, '[^a-zA-Z]', '') but is not used here because
-		# we want to avoid the use of an extra library.
-		r = '''
-		LOAD CSV WITH HEADERS FROM 'file:///pokemon.csv' AS row
-		CREATE (p:Pokemon {
+		if self.indexes == 'prefix':
+			self.session.run(
+				f'CREATE TEXT INDEX {TEXT_INDEX} IF NOT EXISTS FOR (p:Pokemon) ON (p.name)'
+			).consume()
+			self.session.run('CALL db.awaitIndexes()').consume()
+		else:
+			self.session.run(f'DROP INDEX {TEXT_INDEX} IF EXISTS').consume()
+
+	def import_row_query(self, abilities: str, ability: str) -> str:
+		'''
+		Query creating a Pokemon and its relationships from the current `row`.
+		Used for both the csv import and the delta import.
+
+		Args:
+			abilities: expression of the list of abilities of the row.
+			ability: expression of the name of an `ability` of that list.
+		'''
+
+		r = f'''
+		CREATE (p:Pokemon {{
 			attack: toInteger(row.attack),
 			base_egg_steps: toInteger(row.base_egg_steps),
 			base_happiness: toInteger(row.base_happiness),
@@ -81,80 +155,456 @@ class Neo4jDB:
 			speed: toInteger(row.speed),
 			weight_kg: toFloat(row.weight_kg),
 			generation: toInteger(row.generation),
-			is_legendary: toInteger(row.is_legendary)
-		})
+			is_legendary: toInteger(row.is_legendary),
+			row_hash: row.row_hash{self.against_property()}
+		}})
 		WITH p, row
-		UNWIND split(row.abilities, ',') AS ability
-		MERGE (a:Ability {
-			name: replace(
-				replace(
-					replace(
-						trim(ability), ']', ''
-					), '[', ''
-				), "'", ''
-			)
-		})
+		UNWIND {abilities} AS ability
+		MERGE (a:Ability {{name: {ability}}})
 		MERGE (p)-[:HAS_ABILITY]->(a)
-		MERGE (t:Type {name: row.type1})
-		MERGE (p)-[:HAS_TYPE {first: true}]->(t)
+		MERGE (t:Type {{name: row.type1}})
+		MERGE (p)-[:HAS_TYPE {{first: true}}]->(t)
 		'''
 		i = 2
-		for t in types:
+		for t in dataset.TYPES if self.model != 'properties' else []:
 			t2 = 'fight' if t == 'fighting' else t
 			i += 1		
 			var = f't{i}'
 			r += f'''
 			MERGE ({var}:Type {{name: '{t}'}})
-			MERGE (p)-[:AGAINST {{value: toFloat(row.against_{t2})}}]->({var})
 			'''
+			if self.model != 'value_types_only':
+				r += f'''
+				MERGE (p)-[:AGAINST {{value: toFloat(row.against_{t2})}}]->({var})
+				'''
+			if self.model.startswith('value_types'):
+				for value, rel in VALUE_TYPES.items():
+					r += f'''
+					FOREACH (_ IN CASE WHEN toFloat(row.against_{t2}) = {value} THEN [1] ELSE [] END |
+						MERGE (p)-[:{rel}]->({var})
+					)
+					'''
 		r += '''
 		WITH p, row WHERE row.type2 IS NOT NULL
 		MERGE (t2:Type {name: row.type2})
 		MERGE (p)-[:HAS_TYPE {first: false}]->(t2)
 		'''
-		self.session.run(r)
+		return r
+
+	def against_property(self) -> str:
+		'''
+		Property holding type effectiveness in the properties model, in the order
+		of the `index` of Type nodes.
+		'''
+
+		if self.model != 'properties': return ''
+		values = ', '.join(
+			f"toFloat(row.against_{'fight' if t == 'fighting' else t})"
+			for t in dataset.TYPES
+		)
+		return f',\n\t\t\tagainst: [{values}]'
+
+	def index_types(self):
+		'''
+		Creates all Type nodes with their index in type effectiveness lists.
+		'''
+
+		r = '''
+		UNWIND range(0, size($types) - 1) AS i
+		MERGE (t:Type {name: $types[i]})
+		SET t.index = i
+		'''
+		self.session.run(r, types = dataset.TYPES)
+
+	def import_data(self):
+		'''
+		Imports the data from pokemon.csv file into the database.
+		The file *must* already be placed in the import directory of Neo4j.
+		'''
+
+		# Ability cleaning should also work using 
+		# apoc.text.replace(ability, '[^a-zA-Z]', '') but is not used here because
+		# we want to avoid the use of an extra library.
+		r = '''
+		LOAD CSV WITH HEADERS FROM 'file:///pokemon.csv' AS row
+		''' + self.import_row_query(
+			"split(row.abilities, ',')",
+			'''replace(
+				replace(
+					replace(
+						trim(ability), ']', ''
+					), '[', ''
+				), "'", ''
+			)'''
+		)
+		tracing.add_counters(summary_counters(self.session.run(r).consume()))
+		self.index_types()
+
+	def store_row_hashes(self, rows: list):
+		'''
+		Stores the hash of each row on its Pokemon, so that a later delta import
+		knows which Pokemon changed.
+
+		Args:
+			rows: parsed rows of the imported dataset.
+		'''
+
+		r = '''
+		UNWIND $hashes AS h
+		MATCH (p:Pokemon {pokedex_number: h[0]})
+		SET p.row_hash = h[1]
+		'''
+		hashes = [[row['pokedex_number'], dataset.row_hash(row)] for row in rows]
+		for i in range(0, len(hashes), BATCH_SIZE):
+			self.session.run(r, hashes = hashes[i:i + BATCH_SIZE])
+
+	def import_rows(self, rows: list):
+		'''
+		Imports parsed rows sent from the client, in batches, along with their
+		hashes. Used for the delta import and for snapshots, which Neo4j cannot
+		read with LOAD CSV.
+
+		Args:
+			rows: parsed rows to import.
+		'''
+
+		r = 'UNWIND $rows AS row' + self.import_row_query('row.abilities', 'ability')
+		for i in range(0, len(rows), BATCH_SIZE):
+			summary = self.session.run(r, rows = [
+				dict(row, row_hash = dataset.row_hash(row))
+				for row in rows[i:i + BATCH_SIZE]
+			]).consume()
+			tracing.add_counters(summary_counters(summary))
+
+	def delta_import(self, rows: list) -> tuple:
+		'''
+		Imports only the Pokemon that changed since the last import, and deletes
+		those that are not in rows anymore.
+		Returns the number of upserted and deleted Pokemon.
+
+		Args:
+			rows: parsed rows of the new dataset.
+		'''
+
+		res = self.session.run(
+			'MATCH (p:Pokemon) RETURN p.pokedex_number, p.row_hash'
+		)
+		upserts, removed = dataset.diff(rows, {r[0]: r[1] for r in res})
+
+		numbers = removed + [row['pokedex_number'] for row in upserts]
+		stored = self.stored_type_stats()
+		stats = stored.copy()
+		for sensibilities, abilities in self.stored_contributions(numbers):
+			stats.add(sensibilities, abilities, -1)
+		for i in range(0, len(numbers), BATCH_SIZE):
+			self.session.run(
+				'''
+				MATCH (p:Pokemon) WHERE p.pokedex_number IN $numbers
+				DETACH DELETE p
+				''',
+				numbers = numbers[i:i + BATCH_SIZE]
+			)
+
+		self.import_rows(upserts)
+
+		if numbers:
+			self.session.run('MATCH (a:Ability) WHERE NOT (a)--() DELETE a')
+		for row in upserts: stats.add_row(row)
+		self.store_type_stats(stats, stats.changed(stored))
+		return len(upserts), len(removed)
+
+	def stored_contributions(self, numbers: list) -> list:
+		'''
+		Sensibilities by type and abilities of stored Pokemon, as contributing
+		to type aggregates (see typestats.py), read back from the graph model.
+
+		Args:
+			numbers: pokedex numbers of the Pokemon.
+		'''
+
+		if self.model == 'properties':
+			pairs = '[i IN range(0, size(p.against) - 1) | [$types[i], p.against[i]]]'
+		elif self.model == 'value_types_only':
+			pairs = '''[(p)-[r]->(t:Type) WHERE type(r) IN keys($values)
+				| [t.name, $values[type(r)]]]'''
+		else:
+			pairs = '[(p)-[r:AGAINST]->(t:Type) | [t.name, r.value]]'
+		r = f'''
+		MATCH (p:Pokemon) WHERE p.pokedex_number IN $numbers
+		RETURN {pairs}, [(p)-[:HAS_ABILITY]->(a:Ability) | a.name]
+		'''
+		res = []
+		for i in range(0, len(numbers), BATCH_SIZE):
+			res += [
+				(dict(record[0]), record[1])
+				for record in self.session.run(
+					r, numbers = numbers[i:i + BATCH_SIZE], types = dataset.TYPES,
+					values = {rel: float(value) for value, rel in VALUE_TYPES.items()}
+				)
+			]
+		return res
+
+	def stored_type_stats(self) -> TypeStats:
+		'''
+		Type aggregates stored on Type nodes.
+		'''
+
+		res = self.session.run('''
+		MATCH (t:Type) WHERE t.weak_count IS NOT NULL
+		RETURN t.name, t.weak_count, t.resistant_count, t.immune_count,
+			t.weak_abilities, t.weak_ability_counts
+		''')
+		type_rows, ability_rows = [], []
+		for name, weak, resistant, immune, abilities, counts in res:
+			type_rows.append((name, weak, resistant, immune))
+			ability_rows += [(name, a, c) for a, c in zip(abilities, counts)]
+		return TypeStats.from_tables(type_rows, ability_rows)
+
+	def store_type_stats(self, stats: TypeStats, types: list = None):
+		'''
+		Stores type aggregates as properties of Type nodes: numbers of Pokemon
+		weak, resistant and immune to the type, and abilities of the Pokemon weak
+		to it with their numbers, in two lists.
+
+		Args:
+			stats: aggregates of the dataset.
+			types: types whose aggregates are stored (default: all).
+		'''
+
+		r = '''
+		UNWIND $stats AS s
+		MERGE (t:Type {name: s.name})
+		SET t.weak_count = s.weak,
+			t.resistant_count = s.resistant,
+			t.immune_count = s.immune,
+			t.weak_abilities = s.abilities,
+			t.weak_ability_counts = s.counts
+		'''
+		rows = [
+			{
+				'name': t, 'weak': weak, 'resistant': resistant, 'immune': immune,
+				'abilities': [a for a, _ in stats.ability_counts(t)],
+				'counts': [c for _, c in stats.ability_counts(t)]
+			} for t, weak, resistant, immune in stats.type_rows(types)
+		]
+		if rows: self.session.run(r, stats = rows).consume()
+
+	def stored_dataset(self) -> tuple:
+		'''
+		Fingerprint and import version of the dataset currently in the database,
+		if any.
+		'''
+
+		res = self.session.run(
+			'MATCH (d:Dataset) RETURN d.fingerprint, d.version'
+		).single()
+		return (res[0], res[1]) if res else (None, None)
+
+	def store_dataset(self, fingerprint: str):
+		'''
+		Stores the fingerprint of the imported dataset in the database.
+		'''
+
+		self.session.run(
+			'MERGE (d:Dataset) SET d.fingerprint = $fingerprint, d.version = $version',
+			fingerprint = fingerprint,
+			version = self.import_version()
+		)
+
+	def store_size(self) -> tuple:
+		'''
+		Numbers of nodes, relationships and properties in the database.
+		'''
+
+		nodes, node_properties = self.session.run(
+			'MATCH (n) RETURN count(n), sum(size(keys(n)))'
+		).single()
+		relationships, relationship_properties = self.session.run(
+			'MATCH ()-[r]->() RETURN count(r), sum(size(keys(r)))'
+		).single()
+		return nodes, relationships, node_properties + relationship_properties
+
+	def import_version(self) -> str:
+		'''
+		Version of the import code, including the graph model.
+		'''
+
+		return f'{IMPORT_VERSION}-{self.model}'
+
+	def load(self, datafile: str, force: bool = False,
+					 delta: bool = False) -> bool:
+		'''
+		Clears the database and imports the data, unless the dataset already in
+		the database has the same fingerprint as datafile.
+		Returns True if the data has been imported.
+
+		Args:
+			datafile: local copy of the csv file placed in the import directory, or
+				a snapshot of it (see snapshot.py), imported from the client.
+			force: import even if fingerprints match.
+			delta: only import the Pokemon that changed, if the database has been
+				imported by the same version of the import code, with the same model.
+		'''
+
+		with tracing.span('load', model = self.model):
+			with tracing.span('fingerprint'):
+				fingerprint = dataset.fingerprint(datafile, self.import_version())
+				stored_fingerprint, stored_version = self.stored_dataset()
+			if not force and stored_fingerprint == fingerprint:
+				with tracing.span('apply_index_profile', indexes = self.indexes):
+					self.apply_index_profile()
+				return False
+			with tracing.span('read_rows') as span:
+				rows = dataset.read_rows(datafile)
+				span.set_rows(len(rows))
+			if delta and not force and stored_version == self.import_version():
+				with tracing.span('delta_import'):
+					upserted, deleted = self.delta_import(rows)
+				print(f'Delta import: {upserted} Pokemon upserted, {deleted} deleted')
+			else:
+				with tracing.span('clear'):
+					self.clear()
+				with tracing.span('add_constraints'):
+					self.add_constraints()
+				with tracing.span('add_indexes'):
+					self.add_indexes()
+				if is_snapshot(datafile):
+					with tracing.span('import_rows'):
+						self.import_rows(rows)
+						self.index_types()
+				else:
+					with tracing.span('import_data'):
+						self.import_data()
+					with tracing.span('store_row_hashes'):
+						self.store_row_hashes(rows)
+				with tracing.span('store_type_stats'):
+					self.store_type_stats(TypeStats.from_rows(rows))
+			with tracing.span('apply_index_profile', indexes = self.indexes):
+				self.apply_index_profile()
+			# stored last, so that an interrupted import is done again on next run
+			self.store_dataset(fingerprint)
+			return True
 
 class Neo4jQueries:
 
-	def __init__(self, driver):
+	def __init__(self, driver, cache = None, strong_against = None,
+							 streaming = False):
+		'''
+		Args:
+			driver: driver connected to the database.
+			cache: ResultCache in front of read-only queries, if any.
+			strong_against: STRONG_AGAINST edges computed in process, bulk loaded
+				instead of being merged by strong_against_request, if any.
+			streaming: whether compare queries stream their results instead of
+				fetching them fully.
+		'''
+
 		self.driver = driver
 		self.session = driver.session()
+		self.cache = cache
+		self.strong_against = strong_against
+		self.streaming = streaming
+		if cache is not None:
+			res = self.session.run('MATCH (d:Dataset) RETURN d.fingerprint').single()
+			cache.set_version(res[0] if res else None)
 
-	def negative_filter(self):
+	def fetch(self, query: str, **params) -> list:
 		'''
-		Counts the number of Pokemon that are not weak against Fire and not strong
-		against	Water.
+		Runs a read-only query and returns its rows as tuples, from the result
+		cache if any.
 		'''
-		
-		r = '''
+
+		with tracing.span('fetch') as span:
+			def run():
+				res = self.session.run(query, params)
+				rows = [tuple(r.values()) for r in res]
+				span.add_counters(summary_counters(res.consume()))
+				return rows
+			rows = run() if self.cache is None else self.cache.fetch(query, params, run)
+			span.set_rows(len(rows))
+			return rows
+
+	def stream(self, query: str, **params):
+		'''
+		Runs a read-only query and generates its rows as tuples, one at a time,
+		bypassing the result cache, so that client memory stays flat whatever
+		the size of the result. Each stream has its own session, so that
+		several results can be streamed at once.
+		'''
+
+		with self.driver.session() as session:
+			res = session.run(query, params)
+			count = 0
+			for r in res:
+				count += 1
+				yield tuple(r.values())
+			tracing.add_counters(summary_counters(res.consume()))
+			tracing.add_counters({'streamed_rows': count})
+
+	def compare(self, r1: str, r2: str, ordered: bool = True,
+							**params) -> resultdiff.Diff:
+		'''
+		Compares the rows of two queries, in lockstep if they have the same
+		ORDER BY, by hashed buckets otherwise. When streaming, rows are compared
+		as they arrive instead of being fetched fully.
+		'''
+
+		get = self.stream if self.streaming else self.fetch
+		return resultdiff.diff(get(r1, **params), get(r2, **params), ordered)
+
+	def execute(self, query: str, **params):
+		'''
+		Runs a query modifying the database, invalidating the result cache.
+		'''
+
+		with tracing.span('execute') as span:
+			span.add_counters(summary_counters(self.session.run(query, params).consume()))
+		if self.cache is not None: self.cache.invalidate()
+
+	def negative_filter_request(self, **params):
+		return '''
 		MATCH (p:Pokemon)-[r]->(m)
-		WHERE NOT (p)-[:AGAINST {value: 2}]->(:Type {name: 'fire'})
-			AND NOT (p)-[:AGAINST {value: 0.5}]->(:Type {name: 'water'})
+		WHERE NOT (p)-[:AGAINST {value: 2}]->(:Type {name: $weak_against})
+			AND NOT (p)-[:AGAINST {value: 0.5}]->(:Type {name: $strong_against})
 		RETURN count(distinct p)
 		'''
-		res = self.session.run(r)
-		print('1. Number of Pokemon not weak against Fire and not strong against'
-					+ ' Water: ' + str(res.single()[0]))
+
+	def negative_filter(self, weak_against: str = 'fire',
+											strong_against: str = 'water'):
+		'''
+		Counts the number of Pokemon that are not weak against Fire and not strong
+		against	Water.
+		'''
+		
+		r = self.negative_filter_request()
+		res = self.fetch(
+			r, weak_against = weak_against, strong_against = strong_against
+		)
+		print(f'1. Number of Pokemon not weak against {weak_against.capitalize()}'
+					+ f' and not strong against {strong_against.capitalize()}: '
+					+ str(res[0][0]))
 	
-	def optional_match_request(self):
+	def optional_match_request(self, **params):
 		return '''
-		MATCH (p:Pokemon)-[:HAS_TYPE {first: true}]->(:Type {name: 'psychic'})
+		MATCH (p:Pokemon)-[:HAS_TYPE {first: true}]->(:Type {name: $type})
 		OPTIONAL MATCH (p)-[r:AGAINST]->(t:Type)
-		WHERE NOT t.name IN ['psychic', 'fighting']
-				AND r.value IN [0.5, 0.25]
+		WHERE NOT t.name IN $excluded
+				AND r.value IN $values
 		RETURN p.name, t.name, r.value
 		'''
 
-	def optional_match(self):
+	def optional_match(self, type: str = 'psychic',
+										 excluded: tuple = ('psychic', 'fighting'),
+										 values: tuple = (0.5, 0.25)):
 		'''
 		Get resistences of Psychic type Pokemon, apart from against Psychic and
 		Fighting (well-known resistences for Psychic Pokemon), if any.
 		'''
 
-		r = self.optional_match_request()
+		r = self.optional_match_request(values = values)
 
-		print('2. Psychic type Pokemon resistences:')
-		res = self.session.run(r)
+		print(f'2. {type.capitalize()} type Pokemon resistences:')
+		res = self.fetch(r, type = type, excluded = excluded, values = values)
 		print('Pokemon\t\tType\t\tValue')
 		for r in res:
 			tab1 = '\t\t' if len(r[0]) < 8 else '\t'
@@ -163,10 +613,10 @@ class Neo4jQueries:
 		
 
 	# TODO: check plans of collect_unwind and collect_unwind_variant
-	def collect_unwind_request(self):
+	def collect_unwind_request(self, **params):
 		return '''
-		MATCH (p:Pokemon)-[r:AGAINST]->(t:Type {name: 'psychic'})
-		WHERE r.value IN [2, 4]
+		MATCH (p:Pokemon)-[r:AGAINST]->(t:Type {name: $type})
+		WHERE r.value IN $values
 		WITH p, COLLECT {
 			MATCH (p)-[:HAS_ABILITY]->(a:Ability)
 			RETURN a.name
@@ -176,69 +626,92 @@ class Neo4jQueries:
 		ORDER BY ability
 		'''
 	
-	def collect_unwind_variant_request(self):
+	def collect_unwind_variant_request(self, **params):
 		return '''
-		MATCH (p:Pokemon)-[r:AGAINST]->(t:Type {name: 'psychic'})
-		WHERE r.value IN [2, 4]
+		MATCH (p:Pokemon)-[r:AGAINST]->(t:Type {name: $type})
+		WHERE r.value IN $values
 		MATCH (p)-[:HAS_ABILITY]->(a:Ability)
 		RETURN a.name, COUNT(distinct p)
 		ORDER BY a.name
 		'''
 
-	def collect_unwind(self):
+	def collect_unwind(self, type: str = 'psychic', values: tuple = (2, 4)):
 		'''
 		Find the abilities of Pokemon (very) weak against Psychic type, and count
 		how many of them have each ability.
 	 	'''
 
-		r = self.collect_unwind_request()
-		res = self.session.run(r)
-		print('3. Abilities of Pokemon (very) weak against Psychic type:')
+		r = self.collect_unwind_request(values = values)
+		res = self.fetch(r, type = type, values = values)
+		print(f'3. Abilities of Pokemon (very) weak against {type.capitalize()}'
+					+ ' type:')
 		for r in res: print(f'{r[0]}: {r[1]}')
 	
-	def collect_unwind_variant(self):
+	def collect_unwind_variant(self, type: str = 'psychic',
+														 values: tuple = (2, 4)):
 		'''
 		Same as collect_unwind, but without using COLLECT and UNWIND.
 		'''
 		
-		r = self.collect_unwind_variant_request()
-		res = self.session.run(r)
+		r = self.collect_unwind_variant_request(values = values)
+		res = self.fetch(r, type = type, values = values)
 		print('3b. Same as 3., but without using COLLECT and UNWIND:')
 		for r in res: print(f'{r[0]}: {r[1]}')
 	
-	def collect_unwind_compare(self):
+	def collect_unwind_compare(self, type: str = 'psychic',
+														 values: tuple = (2, 4)):
 		'''
 		Compares if results of collect_unwind and collect_unwind_variant are equal.
 		'''
 
-		r1 = self.collect_unwind_request()
-		r2 = self.collect_unwind_variant_request()
-		list1 = self.session.run(r1).data()
-		list2 = self.session.run(r2).data()
+		r1 = self.collect_unwind_request(values = values)
+		r2 = self.collect_unwind_variant_request(values = values)
 		print('3c. Comparing results of collect_unwind and collect_unwind_variant:')
-		if len(list1) != len(list2):
+		res = self.compare(r1, r2, type = type, values = values)
+		print(res.report(('collect_unwind', 'collect_unwind_variant')))
+		if not res.equal:
 			raise Exception('Results are not equal')
-		else :
-			set1 = {tuple(obj.values()) for obj in list1}
-			set2 = {tuple(obj.values()) for obj in list2}
 
-			if set1 != set2:
-				raise Exception('Results are not equal')
-			else:
-				print('Results are equal')
-		
-	def reduce(self):
+	def collect_unwind_stats_request(self, **params):
+		# weak means (2, 4), the values of the aggregates
+		return '''
+		MATCH (t:Type {name: $type})
+		UNWIND range(0, size(t.weak_abilities) - 1) AS i
+		RETURN t.weak_abilities[i] AS ability, t.weak_ability_counts[i]
+		ORDER BY ability
 		'''
-		For each ability, sum the attack of all Pokemon (very) weak against Fire,
-		Water or Grass, whose name starts with 'A'. If there is no such Pokemon for
-		an ability, the ability should not be returned.
-		'''	
 
-		r = '''
+	def collect_unwind_stats(self, type: str = 'psychic'):
+		'''
+		Same as collect_unwind, from the type aggregates computed at import.
+		'''
+
+		res = self.fetch(self.collect_unwind_stats_request(), type = type)
+		print('3d. Same as 3., from the type aggregates:')
+		for r in res: print(f'{r[0]}: {r[1]}')
+
+	def collect_unwind_stats_compare(self, type: str = 'psychic'):
+		'''
+		Compares if results of collect_unwind and collect_unwind_stats are equal,
+		i.e. if the type aggregates are up to date.
+		'''
+
+		r1 = self.collect_unwind_request(values = (2, 4))
+		r2 = self.collect_unwind_stats_request()
+		print('3e. Comparing results of collect_unwind and collect_unwind_stats:')
+		res = resultdiff.diff(
+			self.fetch(r1, type = type, values = (2, 4)), self.fetch(r2, type = type)
+		)
+		print(res.report(('collect_unwind', 'collect_unwind_stats')))
+		if not res.equal:
+			raise Exception('Results are not equal')
+
+	def reduce_request(self, **params):
+		return '''
 		MATCH (t:Type)<-[r:AGAINST]-(p:Pokemon)-[:HAS_ABILITY]->(a:Ability)
-		WHERE r.value IN [2, 4]
-			AND p.name STARTS WITH 'A'
-			AND t.name IN ['fire', 'water', 'grass']
+		WHERE r.value IN $values
+			AND p.name STARTS WITH $prefix
+			AND t.name IN $types
 		WITH a, collect(distinct p) AS list_pkmn
 		RETURN a.name AS ability,
 			reduce(
@@ -250,46 +723,106 @@ class Neo4jQueries:
 			) as pokemons
 		ORDER BY ability
 		'''
-	
-		res = self.session.run(r)
-		print("4. Total attack of Pokemon (very) weak against Fire, Water or Grass,"
-					+ " whose name starts with 'A' and who can learn a given ability:")
+		
+	def reduce(self, prefix: str = 'A',
+						 types: tuple = ('fire', 'water', 'grass'),
+						 values: tuple = (2, 4)):
+		'''
+		For each ability, sum the attack of all Pokemon (very) weak against Fire,
+		Water or Grass, whose name starts with 'A'. If there is no such Pokemon for
+		an ability, the ability should not be returned.
+		'''	
+
+		r = self.reduce_request(values = values)
+		res = self.fetch(r, prefix = prefix, types = types, values = values)
+		names = ', '.join(t.capitalize() for t in types[:-1])
+		if types: names += (' or ' if names else '') + types[-1].capitalize()
+		else: names = 'no type'
+		print(f'4. Total attack of Pokemon (very) weak against {names}'
+					+ f", whose name starts with '{prefix}' and who can learn a given"
+					+ ' ability:')
 		for r in res: print(f'{r[0]}: {r[1]} ({r[2]})')
 
-	def with_filter_aggregate(self):
+	def prefix_seek(self, variable: str, prefix: str, hint: bool = False) -> str:
 		'''
-		Get Pokemon who are immunized against more than one type.
+		Clause binding the Pokemon whose name starts with prefix, so that the
+		query it is prepended to starts from a prefix seek on an index of
+		Pokemon names, instead of checking names along its match.
+
+		Args:
+			variable: variable the Pokemon are bound to.
+			prefix: parameter or variable holding the prefix.
+			hint: whether the seek is forced on the TEXT index of the prefix
+				profile; otherwise the planner picks it or the range index of the
+				uniqueness constraint on names.
 		'''
 
-		r = '''
-		MATCH (p:Pokemon)-[:AGAINST {value: 0}]->(t:Type)
+		using = f'USING TEXT INDEX {variable}:Pokemon(name)' if hint else ''
+		return f'''
+		MATCH ({variable}:Pokemon) {using}
+		WHERE {variable}.name STARTS WITH {prefix}
+		WITH DISTINCT {variable}
+		'''
+
+	def reduce_prefix_request(self, hint: bool = False, **params):
+		return self.prefix_seek('p', '$prefix', hint) + self.reduce_request(**params)
+
+	def reduce_prefix(self, prefix: str = 'A',
+										types: tuple = ('fire', 'water', 'grass'),
+										values: tuple = (2, 4)):
+		'''
+		Same as reduce, seeking the Pokemon whose name starts with prefix first.
+		'''
+
+		r = self.reduce_prefix_request(values = values)
+		res = self.fetch(r, prefix = prefix, types = types, values = values)
+		print(f"4b. Same as 4., seeking Pokemon whose name starts with '{prefix}'"
+					+ ' first:')
+		for r in res: print(f'{r[0]}: {r[1]} ({r[2]})')
+
+	def reduce_prefix_compare(self, prefix: str = 'A',
+														types: tuple = ('fire', 'water', 'grass'),
+														values: tuple = (2, 4)):
+		'''
+		Compares if results of reduce and reduce_prefix are equal.
+		'''
+
+		r1 = self.reduce_request(values = values)
+		r2 = self.reduce_prefix_request(values = values)
+		print('4c. Comparing results of reduce and reduce_prefix:')
+		res = self.compare(r1, r2, prefix = prefix, types = types, values = values)
+		print(res.report(('reduce', 'reduce_prefix')))
+		if not res.equal:
+			raise Exception('Results are not equal')
+
+	def with_filter_aggregate_request(self, **params):
+		return '''
+		MATCH (p:Pokemon)-[:AGAINST {value: $value}]->(t:Type)
 		WITH p, count(distinct t) AS count_types
-		WHERE count_types > 1
+		WHERE count_types > $more_than
 		RETURN p.name AS pokemon, count_types
 		ORDER BY pokemon
 		'''
-		res = self.session.run(r)
+
+	def with_filter_aggregate(self, value: float = 0, more_than: int = 1):
+		'''
+		Get Pokemon who are immunized against more than one type.
+		'''
+
+		r = self.with_filter_aggregate_request(value = value)
+		res = self.fetch(r, value = value, more_than = more_than)
 		print('5. Pokemon who are immunized against more than one type:')
 		for r in res: print(f'{r[0]}: {r[1]}')
 
-	def predicate_function(self):
-		'''
-		Get distinct pairs of Pokemon who have a common type, who both are immunized
-		against a type, and where either of one of them or their common type starts
-		with 'f' or 'g', and the two other nodes start with another letter.
-	 	'''
-	
-		r = '''
+	def predicate_function_request(self, **params):
+		return '''
 		MATCH path = (p1:Pokemon)-[:HAS_TYPE]->(t:Type)<-[:HAS_TYPE]-(p2:Pokemon)
 		WHERE p1 <> p2
 			AND t IS NOT NULL
 			AND p1.pokedex_number < p2.pokedex_number
 			AND single(
 				n IN nodes(path)
-				WHERE n.name STARTS WITH 'f'
-					OR n.name STARTS WITH 'g'
-					OR n.name STARTS WITH 'F'
-					OR n.name STARTS WITH 'G'
+				WHERE any(prefix IN $prefixes WHERE n.name STARTS WITH prefix)
 			)
 			AND exists(
 				(p1)-[:AGAINST {value: 0}]->(:Type)
@@ -300,113 +833,184 @@ class Neo4jQueries:
 		RETURN DISTINCT p1.name, p2.name, t.name
 		ORDER BY p1.name, p2.name
 		'''
-		res = self.session.run(r)
+
+	def predicate_function(self, prefixes: tuple = ('f', 'g', 'F', 'G')):
+		'''
+		Get distinct pairs of Pokemon who have a common type, who both are immunized
+		against a type, and where either of one of them or their common type starts
+		with 'f' or 'g', and the two other nodes start with another letter.
+	 	'''
+	
+		r = self.predicate_function_request()
+		res = self.fetch(r, prefixes = prefixes)
 		print('6. Pairs of Pokemon who have a common type, who both are immunized'
 					+ ' against a type, and where either of one of them or their common'
-					+ " type starts with 'f' or 'g':")
+					+ ' type starts with '
+					+ ' or '.join(f"'{p}'" for p in sorted({p.lower() for p in prefixes}))
+					+ ':')
+		for r in res: print(f'{r[0]} - {r[1]} (type {r[2]})')
+
+	def predicate_function_prefix_request(self, hint: bool = False, **params):
+		'''
+		predicate_function as a union of three branches, one per node whose name
+		may start with a prefix (p1, p2 or t), each starting from the nodes whose
+		name does, sought by prefix. single() keeps the branches disjoint.
+		'''
+
+		# match and conditions of predicate_function, without its RETURN
+		body = self.predicate_function_request(**params).rsplit('RETURN', 1)[0]
+		anchors = [
+			'UNWIND $prefixes AS prefix' + self.prefix_seek('p1', 'prefix', hint),
+			'UNWIND $prefixes AS prefix' + self.prefix_seek('p2', 'prefix', hint),
+			'''
+			MATCH (t:Type)
+			WHERE any(prefix IN $prefixes WHERE t.name STARTS WITH prefix)
+			WITH t
+			'''
+		]
+		branches = '\t\tUNION\n'.join(
+			f'{anchor}{body}RETURN p1.name AS p1_name, p2.name AS p2_name,'
+			+ ' t.name AS t_name\n'
+			for anchor in anchors
+		)
+		return f'''
+		CALL {{
+			{branches}
+		}}
+		RETURN p1_name, p2_name, t_name
+		ORDER BY p1_name, p2_name
+		'''
+
+	def predicate_function_prefix(self, prefixes: tuple = ('f', 'g', 'F', 'G')):
+		'''
+		Same as predicate_function, seeking the nodes whose name starts with a
+		prefix first.
+		'''
+
+		r = self.predicate_function_prefix_request()
+		res = self.fetch(r, prefixes = prefixes)
+		print('6b. Same as 6., seeking the nodes whose name starts with a prefix'
+					+ ' first:')
 		for r in res: print(f'{r[0]} - {r[1]} (type {r[2]})')
 
+	def predicate_function_prefix_compare(self,
+																				prefixes: tuple = ('f', 'g', 'F', 'G')):
+		'''
+		Compares if results of predicate_function and predicate_function_prefix
+		are equal. Pairs with several common types are ordered by pair only, so
+		rows are compared unordered.
+		'''
+
+		r1 = self.predicate_function_request()
+		r2 = self.predicate_function_prefix_request()
+		print('6c. Comparing results of predicate_function and'
+					+ ' predicate_function_prefix:')
+		res = self.compare(r1, r2, ordered = False, prefixes = prefixes)
+		print(res.report(('predicate_function', 'predicate_function_prefix')))
+		if not res.equal:
+			raise Exception('Results are not equal')
+
 	# TODO: check plans of post_union_processing(_variant)
-	def post_union_processing_request(self):
+	def post_union_processing_request(self, **params):
 		return '''
 		CALL {
 				MATCH (p:Pokemon)
 				WHERE p.weight_kg IS NOT NULL
 				RETURN p
-				ORDER BY p.weight_kg DESC
-				LIMIT 10
+				ORDER BY p.weight_kg DESC, p.name
+				LIMIT $limit
 			UNION
 				MATCH (p:Pokemon)
 				WHERE p.weight_kg IS NOT NULL
 				RETURN p
-				ORDER BY p.weight_kg ASC
-				LIMIT 10
+				ORDER BY p.weight_kg ASC, p.name
+				LIMIT $limit
 		} WITH *
 		MATCH (p)-[:HAS_TYPE]->(t:Type)
 		RETURN p.name AS name, p.weight_kg AS weight_kg, collect(t.name) AS types
 		ORDER BY weight_kg, name
 	 	'''
 	
-	def post_union_processing_variant_request(self):
+	def post_union_processing_variant_request(self, **params):
 		return '''
 		CALL {
 				MATCH (p:Pokemon)-[:HAS_TYPE]->(t:Type)
 				WHERE p.weight_kg IS NOT NULL
 				RETURN p, collect(t.name) as types
-				ORDER BY p.weight_kg DESC
-				LIMIT 10
+				ORDER BY p.weight_kg DESC, p.name
+				LIMIT $limit
 			UNION
 				MATCH (p:Pokemon)-[:HAS_TYPE]->(t:Type)
 				WHERE p.weight_kg IS NOT NULL
 				RETURN p, collect(t.name) as types
-				ORDER BY p.weight_kg ASC
-				LIMIT 10
+				ORDER BY p.weight_kg ASC, p.name
+				LIMIT $limit
 		} WITH *
 		RETURN p.name AS name, p.weight_kg AS weight_kg, types
 		ORDER BY weight_kg, name
 		'''
 	
-	def post_union_processing(self):
+	def post_union_processing(self, limit: int = 10):
 		'''
 		Get the 10 heaviest and lightest Pokemon and their types.
 	 	'''
 		
 		r = self.post_union_processing_request()
-		res = self.session.run(r)
-		print('7. 10 heaviest and lightest Pokemon and their types:')
+		res = self.fetch(r, limit = limit)
+		print(f'7. {limit} heaviest and lightest Pokemon and their types:')
 		for r in res: print(f'{r[0]} ({r[1]} kg): {r[2]}')
 
-	def post_union_processing_variant(self):
+	def post_union_processing_variant(self, limit: int = 10):
 		'''
 		Same as post_union_processing, but with a twist.
 	 	'''
 		
 		r = self.post_union_processing_variant_request()
-		res = self.session.run(r)
-		print('7b. 10 heaviest and lightest Pokemon and their types:')
+		res = self.fetch(r, limit = limit)
+		print(f'7b. {limit} heaviest and lightest Pokemon and their types:')
 		for r in res: print(f'{r[0]} ({r[1]} kg): {r[2]}')
 	
-	def post_union_processing_compare(self):
+	def post_union_processing_compare(self, limit: int = 10):
 		'''
 		Compares if results of post_union_processing and post_union_processing_variant are equal.
 		'''
 
 		r1 = self.post_union_processing_request()
 		r2 = self.post_union_processing_variant_request()
-		list1 = self.session.run(r1).data()
-		list2 = self.session.run(r2).data()
 		print('7c. Comparing results of post_union_processing and post_union_processing_variant:')
-		if len(list1) != len(list2):
+		res = self.compare(r1, r2, limit = limit)
+		print(res.report(('post_union_processing', 'post_union_processing_variant')))
+		if not res.equal:
 			raise Exception('Results are not equal')
-		else :
-			tupleize = lambda obj: tuple(tupleize(item) if isinstance(item, list) else item for item in obj)
-
-			set1 = {tupleize(obj.values()) for obj in list1}
-			set2 = {tupleize(obj.values()) for obj in list2}
-
-			if set1 != set2:
-				raise Exception('Results are not equal')
-			else:
-				print('Results are equal')
 
-	def data_and_topo(self):
-		'''
-		Get paths such as there is a loop of 3 or 4 Pokemon strong against each
-		other, and where the first is not strong against the last.
-		Warning: this query can be very long to run
-	 	'''
-		
-		# first, create relationships between Pokemon where one is strong against
-		# the other
-		r = '''
+	def strong_against_request(self, **params):
+		return '''
 		MATCH (p1:Pokemon)-[r:AGAINST]->(t:Type)<-[:HAS_TYPE]-(p2:Pokemon)
-		WHERE r.value IN [0.25, 0.5]
+		WHERE r.value IN $values
 			AND p1 <> p2
 		MERGE (p1)-[:STRONG_AGAINST]->(p2)
 		'''
-		self.session.run(r)
-		# run the real query
-		r = '''
+
+	def type_stats_request(self, **params):
+		return '''
+		MATCH (t:Type) WHERE t.weak_count IS NOT NULL
+		RETURN t.name, t.weak_count, t.resistant_count, t.immune_count
+		ORDER BY t.name
+		'''
+
+	def type_stats(self):
+		'''
+		Numbers of Pokemon weak, resistant and immune to each type, from the type
+		aggregates computed at import.
+		'''
+
+		res = self.fetch(self.type_stats_request())
+		print('13. Numbers of Pokemon weak, resistant and immune to each type:')
+		print(f'{"Type":<16}{"Weak":<8}{"Resistant":<12}Immune')
+		for r in res: print(f'{r[0]:<16}{r[1]:<8}{r[2]:<12}{r[3]}')
+
+	def data_and_topo_request(self, **params):
+		return '''
 		MATCH path = (p1:Pokemon) ((i1:Pokemon)-[:STRONG_AGAINST]->(i2:Pokemon)){3,4} (p2)
 		WHERE none(n IN i1 WHERE exists((n)-[:STRONG_AGAINST]->(p1)))
 				AND exists((p2)-[:STRONG_AGAINST]->(p1))
@@ -414,7 +1018,24 @@ class Neo4jQueries:
 		RETURN [x in nodes(path) | x.name]
 		
 		'''
-		res = self.session.run(r)
+
+	def data_and_topo(self, values: tuple = (0.25, 0.5)):
+		'''
+		Get paths such as there is a loop of 3 or 4 Pokemon strong against each
+		other, and where the first is not strong against the last.
+		Warning: this query can be very long to run
+	 	'''
+		
+		# first, create relationships between Pokemon where one is strong against
+		# the other
+		strong = self.strong_against
+		if strong is not None and strong.values == tuple(values):
+			load_strong_against(self.session, strong)
+			if self.cache is not None: self.cache.invalidate()
+		else:
+			self.execute(self.strong_against_request(values = values), values = values)
+		# run the real query
+		res = self.fetch(self.data_and_topo_request())
 		print('8. Paths such as there is a loop of 3 or 4 Pokemon strong against'
 					+ ' each other, and where the first is not strong against the last:')
 		for r in res: 
@@ -425,23 +1046,24 @@ class Neo4jQueries:
 		MATCH (:Pokemon)-[r:STRONG_AGAINST]->(:Pokemon)
 		DELETE r
 		'''
-		self.session.run(r)
+		self.execute(r)
+
+	def explain(self, name: str) -> str:
+		'''
+		Execution plan of a query template, with its default parameters.
+		'''
+
+		query, params = self.templates()[name]
+		summary = self.session.run('EXPLAIN' + query, params).consume()
+		return summary.plan['args']['string-representation']
 
 	def negative_filter_wid(self):
 		'''
 		Execution plan of negative_filter without index.
 		'''
 		
-		r = '''EXPLAIN
-		MATCH (p:Pokemon)-[r]->(m)
-		WHERE NOT (p)-[:AGAINST {value: 2}]->(:Type {name: 'fire'})
-			AND NOT (p)-[:AGAINST {value: 0.5}]->(:Type {name: 'water'})
-		RETURN count(distinct p)
-		'''
-		
-		_, summary, _ = self.driver.execute_query(r)
 		print('9a. EXPLAIN of negative_filter without index:')
-		print(summary.plan['args']['string-representation'])
+		print(self.explain('negative_filter'))
 	
 	def negative_filter_id(self):
 		'''
@@ -450,16 +1072,8 @@ class Neo4jQueries:
 
 		self.session.run('CREATE INDEX FOR (r:AGAINST) ON (r.value)')
 
-		r = '''EXPLAIN
-		MATCH (p:Pokemon)-[r]->(m)
-		WHERE NOT (p)-[:AGAINST {value: 2}]->(:Type {name: 'fire'})
-			AND NOT (p)-[:AGAINST {value: 0.5}]->(:Type {name: 'water'})
-		RETURN count(distinct p)
-		'''
-
-		_, summary, _ = self.driver.execute_query(r)
 		print('9b. EXPLAIN of negative_filter with index:')
-		print(summary.plan['args']['string-representation'])
+		print(self.explain('negative_filter'))
 		
 		indexes = self.session.run('SHOW INDEXES')
 		for index in indexes:
@@ -471,44 +1085,92 @@ class Neo4jQueries:
 		Execution plan of collect_unwind.
 		'''
 
-		r = 'EXPLAIN' + self.collect_unwind_request()
-
-		_, summary, _ = self.driver.execute_query(r)
 		print('10a. EXPLAIN of collect_unwind:')
-		print(summary.plan['args']['string-representation'])
+		print(self.explain('collect_unwind'))
 	
 	def collect_unwind_variant_ep(self):
 		'''
 		Execution plan of collect_unwind_variant.
 		'''
 		
-		r = 'EXPLAIN' + self.collect_unwind_variant_request()
-
-		_, summary, _ = self.driver.execute_query(r)
 		print('10b. EXPLAIN of collect_unwind_variant:')
-		print(summary.plan['args']['string-representation'])
+		print(self.explain('collect_unwind_variant'))
 	
 	def post_union_processing_ep(self):
 		'''
 		Execution plan of post_union_processing.
 		'''
 
-		r = 'EXPLAIN' + self.post_union_processing_request()
-
-		_, summary, _ = self.driver.execute_query(r)
 		print('11a. EXPLAIN of post_union_processing:')
-		print(summary.plan['args']['string-representation'])
+		print(self.explain('post_union_processing'))
 	
 	def post_union_processing_variant_ep(self):
 		'''
 		Execution plan of post_union_processing_variant.
 		'''
 
-		r = 'EXPLAIN' + self.post_union_processing_variant_request()
-
-		_, summary, _ = self.driver.execute_query(r)
 		print('11b. EXPLAIN of post_union_processing_variant:')
-		print(summary.plan['args']['string-representation'])
+		print(self.explain('post_union_processing_variant'))
+
+	def db_hits(self, name: str) -> int:
+		'''
+		Total database hits of a query template, with its default parameters.
+		'''
+
+		query, params = self.templates()[name]
+		profile = self.session.run('PROFILE' + query, params).consume().profile
+		total = lambda plan: plan.get('dbHits', 0) + sum(
+			total(child) for child in plan.get('children', [])
+		)
+		return total(profile)
+
+	def templates(self) -> dict:
+		'''
+		Get dictionary of read-only query templates, with their default
+		parameters (those of the corresponding methods).
+		Request methods are given these parameters too, for the models where
+		some of them are part of the query text.
+		'''
+
+		names = [
+			'negative_filter', 'optional_match', 'collect_unwind',
+			'collect_unwind_variant', 'collect_unwind_stats', 'reduce',
+			'reduce_prefix', 'with_filter_aggregate', 'predicate_function',
+			'predicate_function_prefix', 'post_union_processing',
+			'post_union_processing_variant', 'type_stats'
+		]
+		res = {}
+		for name in names:
+			params = inspect.signature(getattr(self, name)).parameters
+			params = {key: param.default for key, param in params.items()}
+			res[name] = (getattr(self, name + '_request')(**params), params)
+		return res
+
+	def warmup(self):
+		'''
+		Runs every query template once, so that their plans are in the query
+		cache before the first real query.
+		'''
+
+		for query, params in self.templates().values():
+			self.session.run(query, params).consume()
+
+	def plan_cache_latency(self):
+		'''
+		Measures the latency of the first run of each query template with an
+		empty query cache (cold) and once its plan is cached (warm).
+		'''
+
+		self.session.run('CALL db.clearQueryCaches()').consume()
+		print('12. First query latency with cold and warm plan cache (ms):')
+		print(f'{"Query":<32}{"Cold":<16}Warm')
+		for name, (query, params) in self.templates().items():
+			times = []
+			for _ in range(2):
+				start = time.perf_counter()
+				self.session.run(query, params).consume()
+				times.append((time.perf_counter() - start) * 1000)
+			print(f'{name:<32}{times[0]:<16.2f}{times[1]:.2f}')
 
 	def functions_dict(self):
 		'''
@@ -521,9 +1183,15 @@ class Neo4jQueries:
 			'3' :  self.collect_unwind,
 			'3b':  self.collect_unwind_variant,
 			'3c':  self.collect_unwind_compare,
+			'3d':  self.collect_unwind_stats,
+			'3e':  self.collect_unwind_stats_compare,
 			'4' :  self.reduce,
+			'4b':  self.reduce_prefix,
+			'4c':  self.reduce_prefix_compare,
 			'5' :  self.with_filter_aggregate,
 			'6' :  self.predicate_function,
+			'6b':  self.predicate_function_prefix,
+			'6c':  self.predicate_function_prefix_compare,
 			'7' :  self.post_union_processing,
 			'7b':  self.post_union_processing_variant,
 			'7c':  self.post_union_processing_compare,
@@ -533,7 +1201,9 @@ class Neo4jQueries:
 			'10a': self.collect_unwind_ep,
 			'10b': self.collect_unwind_variant_ep,
 			'11a': self.post_union_processing_ep,
-			'11b': self.post_union_processing_variant_ep
+			'11b': self.post_union_processing_variant_ep,
+			'12': self.plan_cache_latency,
+			'13': self.type_stats
 		}
 		
 
@@ -544,19 +1214,276 @@ class Neo4jQueries:
 
 		for key, value in self.functions_dict().items():
 			if key == '8' and not run_topo: break
-			value()
+			with tracing.span(f'query {key}'):
+				value()
 			print()
 
+class Neo4jCompactQueries(Neo4jQueries):
+	'''
+	Same queries as Neo4jQueries, for the properties model: type effectiveness
+	is read from the `against` list of Pokemon nodes, at the `index` of the
+	Type nodes, instead of traversing AGAINST relationships.
+	'''
+
+	def negative_filter_request(self, **params):
+		return '''
+		MATCH (wt:Type {name: $weak_against}), (st:Type {name: $strong_against})
+		MATCH (p:Pokemon)
+		WHERE p.against[wt.index] <> 2
+			AND p.against[st.index] <> 0.5
+		RETURN count(distinct p)
+		'''
+
+	def optional_match_request(self, **params):
+		return '''
+		MATCH (p:Pokemon)-[:HAS_TYPE {first: true}]->(:Type {name: $type})
+		OPTIONAL MATCH (t:Type)
+		WHERE NOT t.name IN $excluded
+				AND p.against[t.index] IN $values
+		RETURN p.name, t.name, p.against[t.index]
+		'''
+
+	def collect_unwind_request(self, **params):
+		return '''
+		MATCH (t:Type {name: $type})
+		MATCH (p:Pokemon)
+		WHERE p.against[t.index] IN $values
+		WITH p, COLLECT {
+			MATCH (p)-[:HAS_ABILITY]->(a:Ability)
+			RETURN a.name
+		} AS abilities
+		UNWIND abilities AS ability
+		RETURN ability, COUNT(distinct p)
+		ORDER BY ability
+		'''
+
+	def collect_unwind_variant_request(self, **params):
+		return '''
+		MATCH (t:Type {name: $type})
+		MATCH (p:Pokemon)
+		WHERE p.against[t.index] IN $values
+		MATCH (p)-[:HAS_ABILITY]->(a:Ability)
+		RETURN a.name, COUNT(distinct p)
+		ORDER BY a.name
+		'''
+
+	def reduce_request(self, **params):
+		return '''
+		MATCH (t:Type) WHERE t.name IN $types
+		MATCH (p:Pokemon)-[:HAS_ABILITY]->(a:Ability)
+		WHERE p.name STARTS WITH $prefix
+			AND p.against[t.index] IN $values
+		WITH a, collect(distinct p) AS list_pkmn
+		RETURN a.name AS ability,
+			reduce(
+				total_attack = 0, pp IN list_pkmn | total_attack + pp.attack
+			) AS total_attack,
+			reduce(
+				names = [], p IN list_pkmn |
+				CASE WHEN NOT p.name IN names THEN names + p.name ELSE names END
+			) as pokemons
+		ORDER BY ability
+		'''
+
+	def with_filter_aggregate_request(self, **params):
+		return '''
+		MATCH (p:Pokemon)
+		WITH p, size([v IN p.against WHERE v = $value]) AS count_types
+		WHERE count_types > $more_than
+		RETURN p.name AS pokemon, count_types
+		ORDER BY pokemon
+		'''
+
+	def predicate_function_request(self, **params):
+		return '''
+		MATCH path = (p1:Pokemon)-[:HAS_TYPE]->(t:Type)<-[:HAS_TYPE]-(p2:Pokemon)
+		WHERE p1 <> p2
+			AND t IS NOT NULL
+			AND p1.pokedex_number < p2.pokedex_number
+			AND single(
+				n IN nodes(path)
+				WHERE any(prefix IN $prefixes WHERE n.name STARTS WITH prefix)
+			)
+			AND 0 IN p1.against
+			AND 0 IN p2.against
+		RETURN DISTINCT p1.name, p2.name, t.name
+		ORDER BY p1.name, p2.name
+		'''
+
+	def strong_against_request(self, **params):
+		return '''
+		MATCH (t:Type)<-[:HAS_TYPE]-(p2:Pokemon)
+		MATCH (p1:Pokemon)
+		WHERE p1.against[t.index] IN $values
+			AND p1 <> p2
+		MERGE (p1)-[:STRONG_AGAINST]->(p2)
+		'''
+
+class Neo4jValueTypeQueries(Neo4jQueries):
+	'''
+	Same queries as Neo4jQueries, for the value_types models: type effectiveness
+	is read from value-class relationships (see VALUE_TYPES), so that traversals
+	only expand the relationships with the wanted values.
+	'''
+
+	def rel_types(self, values: tuple) -> str:
+		'''
+		Relationship type expression matching the given effectiveness values.
+		'''
+
+		if any(value not in VALUE_TYPES for value in values):
+			raise ValueError(f'No relationship type for some of {values}')
+		return '|'.join(VALUE_TYPES[value] for value in values)
+
+	def value_of(self, variable: str) -> str:
+		'''
+		Expression of the effectiveness value of a value-class relationship.
+		'''
+
+		cases = ' '.join(
+			f"WHEN '{rel}' THEN {float(value)}" for value, rel in VALUE_TYPES.items()
+		)
+		return f'CASE type({variable}) {cases} END'
+
+	def negative_filter_request(self, **params):
+		return '''
+		MATCH (p:Pokemon)
+		WHERE NOT (p)-[:WEAK_2X]->(:Type {name: $weak_against})
+			AND NOT (p)-[:RESIST_2X]->(:Type {name: $strong_against})
+		RETURN count(distinct p)
+		'''
+
+	def optional_match_request(self, values = (0.5, 0.25), **params):
+		return f'''
+		MATCH (p:Pokemon)-[:HAS_TYPE {{first: true}}]->(:Type {{name: $type}})
+		OPTIONAL MATCH (p)-[r:{self.rel_types(values)}]->(t:Type)
+		WHERE NOT t.name IN $excluded
+		RETURN p.name, t.name, {self.value_of('r')}
+		'''
+
+	def collect_unwind_request(self, values = (2, 4), **params):
+		return f'''
+		MATCH (p:Pokemon)-[:{self.rel_types(values)}]->(t:Type {{name: $type}})
+		WITH p, COLLECT {{
+			MATCH (p)-[:HAS_ABILITY]->(a:Ability)
+			RETURN a.name
+		}} AS abilities
+		UNWIND abilities AS ability
+		RETURN ability, COUNT(distinct p)
+		ORDER BY ability
+		'''
+
+	def collect_unwind_variant_request(self, values = (2, 4), **params):
+		return f'''
+		MATCH (p:Pokemon)-[:{self.rel_types(values)}]->(t:Type {{name: $type}})
+		MATCH (p)-[:HAS_ABILITY]->(a:Ability)
+		RETURN a.name, COUNT(distinct p)
+		ORDER BY a.name
+		'''
+
+	def reduce_request(self, values = (2, 4), **params):
+		return f'''
+		MATCH (t:Type)<-[:{self.rel_types(values)}]-(p:Pokemon)-[:HAS_ABILITY]->(a:Ability)
+		WHERE p.name STARTS WITH $prefix
+			AND t.name IN $types
+		WITH a, collect(distinct p) AS list_pkmn
+		RETURN a.name AS ability,
+			reduce(
+				total_attack = 0, pp IN list_pkmn | total_attack + pp.attack
+			) AS total_attack,
+			reduce(
+				names = [], p IN list_pkmn |
+				CASE WHEN NOT p.name IN names THEN names + p.name ELSE names END
+			) as pokemons
+		ORDER BY ability
+		'''
+
+	def with_filter_aggregate_request(self, value = 0, **params):
+		return f'''
+		MATCH (p:Pokemon)-[:{self.rel_types([value])}]->(t:Type)
+		WITH p, count(distinct t) AS count_types
+		WHERE count_types > $more_than
+		RETURN p.name AS pokemon, count_types
+		ORDER BY pokemon
+		'''
+
+	def predicate_function_request(self, **params):
+		return '''
+		MATCH path = (p1:Pokemon)-[:HAS_TYPE]->(t:Type)<-[:HAS_TYPE]-(p2:Pokemon)
+		WHERE p1 <> p2
+			AND t IS NOT NULL
+			AND p1.pokedex_number < p2.pokedex_number
+			AND single(
+				n IN nodes(path)
+				WHERE any(prefix IN $prefixes WHERE n.name STARTS WITH prefix)
+			)
+			AND exists(
+				(p1)-[:IMMUNE]->(:Type)
+			)
+			AND exists(
+				(p2)-[:IMMUNE]->(:Type)
+			)
+		RETURN DISTINCT p1.name, p2.name, t.name
+		ORDER BY p1.name, p2.name
+		'''
+
+	def strong_against_request(self, values = (0.25, 0.5), **params):
+		return f'''
+		MATCH (p1:Pokemon)-[:{self.rel_types(values)}]->(t:Type)<-[:HAS_TYPE]-(p2:Pokemon)
+		WHERE p1 <> p2
+		MERGE (p1)-[:STRONG_AGAINST]->(p2)
+		'''
+
+# Queries for each graph model
+QUERIES = {
+	'relationships': Neo4jQueries,
+	'properties': Neo4jCompactQueries,
+	'value_types': Neo4jValueTypeQueries,
+	'value_types_only': Neo4jValueTypeQueries
+}
+
 class Neo4jAnalysis:
 	
-	def __init__(self, session):
+	def __init__(self, session, strong_against = None):
 		self.session = session
+		self.strong_against = strong_against
+		self.gds = None
+		self.graph = None
+		self.distances = None
+
+	def has_gds(self) -> bool:
+		'''
+		Whether the graph-data-science plugin is installed. Without it, analysis
+		runs in process on a copy of the graph.
+		'''
+
+		if self.gds is None:
+			self.gds = self.session.run(
+				"SHOW PROCEDURES YIELD name WHERE name STARTS WITH 'gds.' RETURN count(*)"
+			).single()[0] > 0
+		return self.gds
+
+	def local_communities(self, name: str, refine: bool):
+		'''
+		Same report as louvain and leiden, computed in process on the
+		Ability/Pokemon/Type graph, exported once.
+		'''
+
+		if self.graph is None:
+			self.graph = louvain.Graph.from_neo4j(self.session)
+		louvain.print_communities(
+			name, louvain.communities(self.graph, refine = refine)
+		)
 	
 	def louvain(self):
 		'''
 		Get communities and their sizes using Louvain algorithm.
 	 	'''
 
+		if not self.has_gds():
+			self.local_communities('Louvain', refine = False)
+			return
+
 		r_remove = '''
 		CALL gds.graph.drop('graph1', false);
 		'''
@@ -606,6 +1533,10 @@ class Neo4jAnalysis:
 		'''
 		Get communities and their sizes using Leiden algorithm.
 	 	'''
+
+		if not self.has_gds():
+			self.local_communities('Leiden', refine = True)
+			return
 	 
 		r_create = '''
 		CALL gds.graph.project(
@@ -690,15 +1621,40 @@ class Neo4jAnalysis:
 		ORDER BY distance DESC
 	 	'''
 		
-		self.session.run(r_rel)
+		if self.strong_against is not None:
+			load_strong_against(self.session, self.strong_against)
+		else:
+			self.session.run(r_rel)
+		if not self.has_gds():
+			self.local_distances()
+			names = self.distances['names']
+			distances.print_longest([
+				(names[s], names[t], float(d)) for d, s, t in self.distances['longest']
+			])
+			return
 		self.session.run(r_proj)
 		res = self.session.run(r_call)
 		limit = 10
-		print('Shortest paths between Pokemon:')
+		rows = []
 		for r in res:
-			print(f'Shortest path between {r[0]} and {r[1]}: {r[2]}')
+			rows.append(tuple(r.values()))
 			limit -= 1	
 			if not limit: break
+		res.consume()
+		distances.print_longest(rows)
+		differ = distances.DistanceEngine.from_neo4j(self.session).verify(rows)
+		print(f'Distances differing from the local engine: {len(differ)}')
+
+	def local_distances(self):
+		'''
+		Distances over STRONG_AGAINST relationships computed in process, exported
+		once, with no pair list: the 10 longest and the average by name order.
+		'''
+
+		if self.distances is None:
+			engine = distances.DistanceEngine.from_neo4j(self.session)
+			self.distances = engine.all_pairs(k = 10)
+			self.distances['names'] = engine.names
 
 	def dijkstra(self):
 		'''
@@ -709,6 +1665,11 @@ class Neo4jAnalysis:
 		Warning: can take some time to run.
 		'''
 
+		if not self.has_gds():
+			self.local_distances()
+			distances.print_average(distances.average(self.distances))
+			return
+
 		r_call = '''
 		MATCH(p:Pokemon)
 		MATCH(pp:Pokemon)
@@ -730,8 +1691,7 @@ class Neo4jAnalysis:
 		self.session.run(r_call)
 		res = self.session.run(r_avg)
 		self.session.run("CALL gds.graph.drop('graph1')")
-		print('Average length of the shortest path between all pairs of Pokemon: '
-				+ str(res.single()[0]))
+		distances.print_average(res.single()[0])
 		r_delete = '''
 		MATCH (:Pokemon)-[r:PATH]->(:Pokemon)
 		WITH r LIMIT 10000
@@ -747,13 +1707,206 @@ class Neo4jAnalysis:
 		Runs all the queries.
 		'''
 
-		self.louvain()
-		print()
-		self.leiden()
-		print()
-		self.shortest_path()
-		print()
-		self.dijkstra()
+		for analysis in [self.louvain, self.leiden, self.shortest_path, self.dijkstra]:
+			with tracing.span(analysis.__name__):
+				analysis()
+			if analysis != self.dijkstra: print()
+
+def summary_counters(summary) -> dict:
+	'''
+	Server counters of a result summary: update counters, and the time the
+	server took to make the result available and to stream it.
+	'''
+
+	counters = {
+		k: v for k, v in vars(summary.counters).items() if not k.startswith('_')
+	}
+	counters['server_ms'] = (
+		(summary.result_available_after or 0) + (summary.result_consumed_after or 0)
+	)
+	return counters
+
+def load_strong_against(session, strong: StrongAgainst):
+	'''
+	Creates STRONG_AGAINST relationships computed in process, in batches,
+	replacing any existing ones.
+	'''
+
+	session.run('MATCH (:Pokemon)-[r:STRONG_AGAINST]->(:Pokemon) DELETE r').consume()
+	r = '''
+	UNWIND $edges AS e
+	MATCH (p1:Pokemon {pokedex_number: e[0]})
+	MATCH (p2:Pokemon {pokedex_number: e[1]})
+	CREATE (p1)-[:STRONG_AGAINST]->(p2)
+	'''
+	for edges in strong.pokedex_batches():
+		session.run(r, edges = edges).consume()
+
+def median_latency(session, query: str, params: dict, runs: int) -> float:
+	'''
+	Median latency of a query in ms, after a first run warming up caches.
+	'''
+
+	session.run(query, params).consume()
+	times = []
+	for _ in range(runs):
+		start = time.perf_counter()
+		session.run(query, params).consume()
+		times.append((time.perf_counter() - start) * 1000)
+	return statistics.median(times)
+
+def benchmark_models(ndb: Neo4jDB, datafile: str, runs: int = 5):
+	'''
+	Compares store size, import time and query latency of all graph models.
+	The database is imported again with its original model afterwards.
+	'''
+
+	model = ndb.model
+	results = {}
+	for m in MODELS:
+		ndb.model = m
+		start = time.perf_counter()
+		ndb.load(datafile, force = True)
+		import_time = time.perf_counter() - start
+		nrq = QUERIES[m](ndb.driver)
+		latencies = {
+			name: median_latency(ndb.session, query, params, runs)
+			for name, (query, params) in nrq.templates().items()
+		}
+		db_hits = {name: nrq.db_hits(name) for name in latencies}
+		results[m] = (import_time, ndb.store_size(), latencies, db_hits)
+	ndb.model = model
+	ndb.load(datafile, force = True)
+
+	print('Comparison of graph models:')
+	print(f'{"Model":<24}{"Import (s)":<16}{"Nodes":<16}{"Relationships":<16}'
+				+ 'Properties')
+	for m, (import_time, size, _, _) in results.items():
+		print(f'{m:<24}{import_time:<16.2f}{size[0]:<16}{size[1]:<16}{size[2]}')
+	print()
+	print('Median query latency (ms):')
+	print(f'{"Query":<32}' + ''.join(f'{m:<20}' for m in results))
+	for name in results[MODELS[0]][2]:
+		print(f'{name:<32}'
+					+ ''.join(f'{res[2][name]:<20.2f}' for res in results.values()))
+	print()
+	print('Database hits:')
+	print(f'{"Query":<32}' + ''.join(f'{m:<20}' for m in results))
+	for name in results[MODELS[0]][3]:
+		print(f'{name:<32}'
+					+ ''.join(f'{res[3][name]:<20}' for res in results.values()))
+
+def index_seeks(session, query: str, params: dict) -> list:
+	'''
+	Indexes read by the execution plan of a query, as described by the
+	operators reading them (e.g. 'TEXT INDEX p:Pokemon(name)').
+	'''
+
+	plan = session.run('EXPLAIN' + query, params).consume().plan
+	nodes = lambda plan: [plan] + [
+		node for child in plan.get('children', []) for node in nodes(child)
+	]
+	return sorted({
+		node['args'].get('Details', '').split(' WHERE')[0]
+		for node in nodes(plan) if 'Index' in node['operatorType']
+	})
+
+def benchmark_indexes(ndb: Neo4jDB, datafile: str, scale: int = 1, runs: int = 5):
+	'''
+	Compares the latency of the queries filtering names by prefix (reduce and
+	predicate_function) with their rewrites seeking names first, without and
+	with the TEXT index hint, in each index profile, and prints the indexes
+	each plan reads. The original dataset and profile are restored afterwards.
+
+	Args:
+		datafile: csv file or snapshot to import.
+		scale: scale factor of the dataset (see dataset.scale_rows): index
+			seeks only pay off on large enough stores.
+		runs: number of measured runs of each query.
+	'''
+
+	indexes = ndb.indexes
+	nrq = QUERIES[ndb.model](ndb.driver)
+	templates = nrq.templates()
+	queries = {
+		name: templates[name] for name in
+		['reduce', 'reduce_prefix', 'predicate_function', 'predicate_function_prefix']
+	}
+	for name in ['reduce_prefix', 'predicate_function_prefix']:
+		query, params = templates[name]
+		queries[f'{name} (hint)'] = (
+			getattr(nrq, name + '_request')(hint = True, **params), params
+		)
+	results = {}
+	with tempfile.TemporaryDirectory() as tmp:
+		path = datafile
+		if scale > 1:
+			path = os.path.join(tmp, f'scale{scale}.snap')
+			write_snapshot(dataset.scale_rows(dataset.read_rows(datafile), scale), path)
+		for profile in INDEX_PROFILES:
+			ndb.indexes = profile
+			ndb.load(path)
+			results[profile] = {
+				name: (
+					median_latency(ndb.session, query, params, runs),
+					index_seeks(ndb.session, query, params)
+				)
+				# the hint needs the TEXT index
+				for name, (query, params) in queries.items()
+				if profile == 'prefix' or not name.endswith('(hint)')
+			}
+	nrq.session.close()
+	ndb.indexes = indexes
+	ndb.load(datafile)
+
+	print(f'Comparison of index profiles (dataset x{scale}):')
+	print('Median query latency (ms):')
+	print(f'{"Query":<40}' + ''.join(f'{p:<16}' for p in results))
+	for name in queries:
+		print(f'{name:<40}' + ''.join(
+			f'{res[name][0]:<16.2f}' if name in res else f'{"-":<16}'
+			for res in results.values()
+		))
+	print()
+	print('Indexes read:')
+	for profile, res in results.items():
+		for name, (_, seeks) in res.items():
+			print(f'{profile:<16}{name:<40}' + (', '.join(seeks) or 'none'))
+
+def benchmark_cycles(nrq: Neo4jQueries, datafile: str, limit: int = 30):
+	'''
+	Compares the time taken by query 8 and by the in-process cycle finder to
+	return their first paths, and checks the paths returned by the database.
+	'''
+
+	finder = cycles.CycleFinder.from_engine(PokemonEngine.from_csv(datafile))
+	load_strong_against(nrq.session, finder.strong)
+	start = time.perf_counter()
+	res = nrq.session.run(nrq.data_and_topo_request() + 'LIMIT $limit', limit = limit)
+	paths = [r[0] for r in res]
+	db_time = (time.perf_counter() - start) * 1000
+	nrq.session.run('MATCH (:Pokemon)-[r:STRONG_AGAINST]->(:Pokemon) DELETE r').consume()
+	_, local_time, count = cycles.benchmark(finder, limit, 1)
+	valid = sum(finder.is_path(path) for path in paths)
+	print(f'First {limit} paths of query 8 (ms):')
+	print(f'{"Neo4j":<24}{db_time:.2f} ({len(paths)} paths, {valid} valid)')
+	print(f'{"In-process":<24}{local_time:.2f} ({count} paths)')
+
+def load_test(nrq: Neo4jQueries, option: str = 'closed:1,2,4,8,16',
+							weights: dict = None):
+	'''
+	Drives a mix of the read-only query templates from concurrent sessions,
+	and prints throughput and latency at each load level.
+
+	Args:
+		nrq: queries of the imported graph model.
+		option: load mode, levels and duration (see loadgen.parse_option).
+		weights: weight of each template in the mix (default: 1 each).
+	'''
+
+	mode, levels, duration = loadgen.parse_option(option)
+	generator = loadgen.LoadGenerator(nrq.driver.session, nrq.templates(), weights)
+	loadgen.print_curve(generator.curve(mode, levels, duration))
 
 def print_usage():
 	print('Usage: python neo4j-queries.py <user> <password> [OPTIONS]')
@@ -762,9 +1915,34 @@ def print_usage():
 	print('	-r run_queries:	 import data and run general queries (default)')
 	print('	-r run_analysis: import data and run analysis queries')
 	print('	-r import_only:  import data without running any queries')
+	print('	-r benchmark_models: compare graph models (import, size, latency, db hits)')
+	print('	-r verify_local: check query results against the in-process engine')
+	print('	-r benchmark_cycles: compare query 8 with the in-process cycle finder')
+	print('	-r load_test: run a mix of query templates under concurrent load')
+	print('	-r benchmark_indexes: compare index profiles on the name prefix queries')
 	print('	-k [number]: choose the query to run ')
-	print('		for run_queries: (1, 2, 3, 3b, 3c, 4, 5, 6, 7b, 7c, 8, 9a, 9b, 10a, 10b, 11a, 11b; default: all)')
+	print('		for run_queries: (1, 2, 3, 3b, 3c, 3d, 3e, 4, 4b, 4c, 5, 6, 6b, 6c, 7b, 7c, 8, 9a, 9b, 10a, 10b, 11a, 11b, 12, 13; default: all)')
 	print('	-t: run the last query (can be very long to run)')
+	print('	-f [datafile]: local copy of the imported csv file (default: pokemon.csv)')
+	print('	-F: import data even if the dataset is unchanged')
+	print('	-D: only import the Pokemon that changed since the last import')
+	print('	-c [file]: cache query results, persisted in file if given')
+	print('	-w: warm up the query plan cache before running queries')
+	print('	-m [model]: graph model used at import (' + ', '.join(MODELS)
+				+ '; default: relationships)')
+	print('	-s: compute STRONG_AGAINST relationships in process and bulk load them')
+	print('	-i [profile]: index profile (' + ', '.join(INDEX_PROFILES)
+				+ '; default: default)')
+	print('	-x [scale]: scale factor of the dataset in benchmark_indexes (default: 1)')
+	print('	-T [exporter]: trace phases and queries (console, jsonl:<file> or otlp:<file>)')
+	print('	-M: trace the peak client memory of phases and queries (tracemalloc)')
+	print('	-S: stream compared results (3c, 7c) instead of loading them fully')
+	print('	-L [mode:levels[:seconds]]: load of load_test (closed:1,2,4,8,16: numbers of')
+	print('		concurrent sessions; open:10,50,100: arrival rates in queries per second)')
+	print('	-W [name=weight,...]: weights of the query templates in load_test')
+	print('	-R record:<file>: record query results and summaries to file')
+	print('	-R replay:<file>[:latency]: replay recorded results without a database,')
+	print('		waiting latency ms (or the recorded time with recorded) per query')
 
 if __name__ == '__main__':
 	if len(argv) < 3:
@@ -779,30 +1957,92 @@ if __name__ == '__main__':
 		exit(0)
 
 	run_type = argv[argv.index('-r') + 1] if '-r' in argv else 'run_queries'
-	if run_type not in ['run_queries', 'run_analysis', 'import_only']:
+	if run_type not in ['run_queries', 'run_analysis', 'import_only',
+											'benchmark_models', 'verify_local', 'benchmark_cycles',
+											'load_test', 'benchmark_indexes']:
 		print_usage()
 		exit(1)
 	
+	warmup = True if '-w' in argv else False
 	query_number = argv[argv.index('-k') + 1] if '-k' in argv else None
 	
 	run_topo = True if '-t' in argv else False
 
-	uri = 'bolt://localhost:7687'
-	ndb = Neo4jDB(uri, argv[0], argv[1])
-	ndb.clear()
-	ndb.add_constraints()
-	ndb.add_indexes()
-	ndb.import_data()
+	datafile = argv[argv.index('-f') + 1] if '-f' in argv else 'pokemon.csv'
+	force_import = True if '-F' in argv else False
+	delta_import = True if '-D' in argv else False
+	model = argv[argv.index('-m') + 1] if '-m' in argv else 'relationships'
+	if model not in MODELS:
+		print_usage()
+		exit(1)
+	indexes = argv[argv.index('-i') + 1] if '-i' in argv else 'default'
+	if indexes not in INDEX_PROFILES:
+		print_usage()
+		exit(1)
 
-	nrq = Neo4jQueries(ndb.driver)
-	nra = Neo4jAnalysis(ndb.session)
+	memory = True if '-M' in argv else False
+	if '-T' in argv or memory:
+		i = argv.index('-T') + 1 if '-T' in argv else len(argv)
+		option = argv[i] if i < len(argv) and not argv[i].startswith('-') else None
+		tracing.set_tracer(tracing.from_option(option, memory))
+
+	recorder = replay.from_option(argv[argv.index('-R') + 1]) if '-R' in argv else None
+
+	uri = 'bolt://localhost:7687'
+	ndb = Neo4jDB(
+		uri, argv[0], argv[1], model,
+		GraphDatabase.driver if recorder is None else recorder.neo4j_driver,
+		indexes
+	)
+	if not ndb.load(datafile, force_import, delta_import):
+		print('Dataset unchanged, skipping import')
+
+	cache = None
+	if '-c' in argv:
+		i = argv.index('-c') + 1
+		path = argv[i] if i < len(argv) and not argv[i].startswith('-') else None
+		cache = ResultCache(path)
+
+	strong = StrongAgainst.from_csv(datafile) if '-s' in argv else None
+	nrq = QUERIES[model](ndb.driver, cache, strong, '-S' in argv)
+	nra = Neo4jAnalysis(ndb.session, strong)
 
 	if run_type != 'import_only':
+		if warmup: nrq.warmup()
 		if run_type == 'run_queries':
 			if query_number == None:
 				nrq.run_queries(run_topo)
 			else :
-				nrq.functions_dict()[query_number]()
+				with tracing.span(f'query {query_number}'):
+					nrq.functions_dict()[query_number]()
 		if run_type == 'run_analysis':
 			nra.run_analysis()
-	ndb.close()
\ No newline at end of file
+			# analysis writes relationships to the database
+			if cache is not None: cache.invalidate()
+		if run_type == 'benchmark_models':
+			benchmark_models(ndb, datafile)
+			if cache is not None: cache.invalidate()
+		if run_type == 'benchmark_cycles':
+			benchmark_cycles(nrq, datafile)
+			if cache is not None: cache.invalidate()
+		if run_type == 'benchmark_indexes':
+			benchmark_indexes(
+				ndb, datafile,
+				int(argv[argv.index('-x') + 1]) if '-x' in argv else 1
+			)
+		if run_type == 'load_test':
+			load_test(
+				nrq,
+				argv[argv.index('-L') + 1] if '-L' in argv else 'closed:1,2,4,8,16',
+				loadgen.parse_weights(argv[argv.index('-W') + 1]) if '-W' in argv else None
+			)
+		if run_type == 'verify_local':
+			differ = verify(nrq, PokemonEngine.from_csv(datafile))
+			print('Results differing from the in-process engine: '
+						+ (', '.join(differ) if differ else 'none'))
+	if cache is not None:
+		print(cache.stats())
+		cache.save()
+	ndb.close()
+	if recorder is not None: recorder.close()
+	tracing.tracer.finish()
\ No newline at end of file
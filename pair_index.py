@@ -0,0 +1,126 @@
+import numpy as np
+import time
+from sys import argv
+import dataset
+from engine import PokemonEngine
+
+class PairIndex:
+	'''
+	Precomputed bitsets answering predicate_function (query 6): per type, the
+	bitset of its members, the bitset of Pokemon immune to any type, and per
+	first letter, the bitset of Pokemon whose name starts with it. Candidate
+	pairs of a type are then found with bitset intersections, and sorted by
+	name with precomputed name ranks.
+	'''
+
+	def __init__(self, engine: PokemonEngine):
+		'''
+		Args:
+			engine: engine holding the column arrays of the dataset.
+		'''
+
+		self.n = len(engine.names)
+		self.names = engine.names
+		self.pokedex = engine.pokedex
+		self.types = engine.types
+		self.members = [
+			self.bitset(engine.has_type[:, t]) for t in range(len(self.types))
+		]
+		self.immune = self.bitset((engine.against == 0).any(axis = 1))
+		first = np.array([name[:1] for name in self.names], dtype = object)
+		self.letters = {c: self.bitset(first == c) for c in set(first.tolist())}
+		# rank of each name in sorted order, to sort pairs without comparing strings
+		self.rank = np.empty(self.n, dtype = np.int64)
+		self.rank[np.argsort(self.names.astype(str), kind = 'stable')] = np.arange(self.n)
+		# rank of each type by name
+		self.type_rank = np.argsort(np.argsort(self.types, kind = 'stable'))
+
+	def bitset(self, mask: np.ndarray) -> np.ndarray:
+		'''
+		Bitset of a boolean mask over Pokemon, as 64-bit words.
+		'''
+
+		padded = np.zeros(-(-self.n // 64) * 64, dtype = bool)
+		padded[:self.n] = mask
+		return np.packbits(padded, bitorder = 'little').view('<u8')
+
+	def indices(self, bits: np.ndarray) -> np.ndarray:
+		return np.flatnonzero(np.unpackbits(bits.view(np.uint8), bitorder = 'little'))
+
+	def starts_with(self, prefixes) -> np.ndarray:
+		'''
+		Bitset of Pokemon whose name starts with any of the prefixes.
+		'''
+
+		bits = np.zeros_like(self.immune)
+		for c in {prefix[:1] for prefix in prefixes}:
+			if c in self.letters: bits |= self.letters[c]
+		if all(len(prefix) == 1 for prefix in prefixes): return bits
+		# longer prefixes are checked on the Pokemon of their first letters only
+		candidates = self.indices(bits)
+		mask = np.zeros(self.n, dtype = bool)
+		mask[candidates] = [
+			self.names[p].startswith(tuple(prefixes)) for p in candidates
+		]
+		return self.bitset(mask)
+
+	def pairs(self, prefixes: tuple = ('f', 'g', 'F', 'G')) -> tuple:
+		'''
+		Pairs of query 6 as (p1, p2, type) index arrays, ordered by name of p1,
+		name of p2 and type.
+		'''
+
+		starts = self.starts_with(prefixes)
+		first, second, types = [], [], []
+		for t, type_name in enumerate(self.types):
+			members = self.members[t] & self.immune
+			if type_name.startswith(tuple(prefixes)):
+				# the type is the single node starting with a prefix
+				a = b = self.indices(members & ~starts)
+			else:
+				a = self.indices(members & starts)
+				b = self.indices(members & ~starts)
+			p1 = np.repeat(a, len(b))
+			p2 = np.tile(b, len(a))
+			if a is not b:
+				# pairs are ordered by pokedex number, whichever starts with a prefix
+				swap = self.pokedex[p1] > self.pokedex[p2]
+				p1, p2 = np.where(swap, p2, p1), np.where(swap, p1, p2)
+			keep = self.pokedex[p1] < self.pokedex[p2]
+			first.append(p1[keep])
+			second.append(p2[keep])
+			types.append(np.full(np.count_nonzero(keep), t))
+		p1, p2, t = (np.concatenate(a) for a in [first, second, types])
+		order = np.lexsort((self.type_rank[t], self.rank[p2], self.rank[p1]))
+		return p1[order], p2[order], t[order]
+
+	def predicate_function(self, prefixes: tuple = ('f', 'g', 'F', 'G')) -> list:
+		p1, p2, t = self.pairs(prefixes)
+		return [
+			(self.names[a], self.names[b], self.types[c])
+			for a, b, c in zip(p1.tolist(), p2.tolist(), t.tolist())
+		]
+
+if __name__ == '__main__':
+	datafile = argv[1] if len(argv) > 1 else 'pokemon.csv'
+	max_scale = int(argv[2]) if len(argv) > 2 else 8
+	rows = dataset.read_rows(datafile)
+	print(f'{"Pokemon":<12}{"Pairs":<12}{"Index (ms)":<16}{"Bitsets (ms)":<16}'
+				+ 'Engine (ms)')
+	scale = 1
+	while scale <= max_scale:
+		engine = PokemonEngine(dataset.scale_rows(rows, scale))
+		start = time.perf_counter()
+		index = PairIndex(engine)
+		build = (time.perf_counter() - start) * 1000
+		start = time.perf_counter()
+		res = index.predicate_function()
+		indexed = (time.perf_counter() - start) * 1000
+		start = time.perf_counter()
+		expected = engine.predicate_function_scan()
+		baseline = (time.perf_counter() - start) * 1000
+		if res != expected:
+			raise Exception('Results are not equal')
+		print(f'{len(engine.names):<12}{len(res):<12}{build:<16.2f}{indexed:<16.2f}'
+					+ f'{baseline:.2f}')
+		scale *= 2
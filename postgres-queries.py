@@ -1,31 +1,282 @@
+import os
 import psycopg
+import statistics
+import tempfile
+from itertools import islice
 from sys import argv
+from cache import ResultCache
+from engine import PokemonEngine
+from strong_against import StrongAgainst
+from typestats import TypeStats
+import cycles
+import time
+import tracing
+import sinks
+import loadgen
+import replay
+import dataset
+from snapshot import is_snapshot, write_snapshot
+
+# Rows of a streamed result grouped into a batch, in single row mode
+BATCH_SIZE = 1000
+
+# Bump whenever the schema or the populate queries change, so that databases
+# populated with an older version are populated again.
+IMPORT_VERSION = 4
+
+# Layouts of the Pokemon-keyed tables: single heaps, partitioned by generation
+# (list), partitioned by hash of pokemon_id, or single heaps with the
+# sensibilities of each Pokemon in an array instead of a row per type
+LAYOUTS = ['plain', 'generation', 'hash', 'array']
+
+# Number of partitions of each table in the hash layout
+HASH_PARTITIONS = 8
+
+# Types whose sensibility is indexed in the array layout, as the queries
+# filter on them
+INDEXED_TYPES = ['fire', 'water', 'grass', 'psychic']
+
+# Index profiles: default (primary keys only), or prefix, adding the indexes
+# of PREFIX_INDEXES for the name prefix filters (see PrefixQueries)
+INDEX_PROFILES = ['default', 'prefix']
+
+# Indexes of the prefix profile: text_pattern_ops serves LIKE 'A%' whatever
+# the collation of the database
+PREFIX_INDEXES = {'pokemon_name_prefix': 'pokemon (name text_pattern_ops)'}
 
 tables = [
 	'pokemon', 'type', 'ability', 'pokemon_type', 'pokemon_ability',
 	'pokemon_percentage_male', 'pokemon_sensibility', 'pokemon_classification',
 	'pokemon_basic_stats', 'pokemon_battle_stats', 'pokemon_generation',
-	'pokemon_legendary'
+	'pokemon_legendary', 'pokemon_row_hash', 'pokemon_effectiveness',
+	'type_stats', 'type_ability_stats', 'dataset'
+]
+
+# Tables partitioned in the generation and hash layouts
+partitioned_tables = [
+	'pokemon_type', 'pokemon_ability', 'pokemon_percentage_male',
+	'pokemon_sensibility', 'pokemon_classification', 'pokemon_basic_stats',
+	'pokemon_battle_stats', 'pokemon_generation', 'pokemon_legendary'
 ]
 
 class PostgresQueries:
-	def __init__(self, user, password, database, host, datafile):
-		try:
-			self.conn = psycopg.connect(host = host, user = user, password = password,
-															 dbname = database, autocommit = True)
-		except psycopg.OperationalError:
-			# could be because database doesn't exist
-			self.conn = psycopg.connect(host = host, user = user, password = password,
-															 autocommit = True)
-			with self.conn.cursor() as cursor:
-				cursor.execute(f'CREATE DATABASE {database}')
-			self.conn.close()
-			self.conn = psycopg.connect(host = host, user = user, password = password,
-															 dbname = database, autocommit = True)
-		self.create_and_populate(datafile)
+	def __init__(self, user, password, database, host, datafile, force = False,
+							 delta = False, cache = None, connect = psycopg.connect,
+							 layout = 'plain', indexes = 'default'):
+		'''
+		Args:
+			user, password, database, host: connection to the database.
+			datafile: csv file or snapshot to populate tables with, if any.
+			force: populate tables even if the dataset is unchanged.
+			delta: only update the Pokemon that changed since the last import.
+			cache: ResultCache in front of read-only queries, if any.
+			connect: function creating a connection, as psycopg.connect (e.g. a
+				recording or replay connection, see replay.py).
+			layout: layout of the Pokemon-keyed tables (see LAYOUTS); tables
+				populated with another layout are populated again.
+			indexes: index profile applied after each load (see INDEX_PROFILES).
+		'''
+
+		with tracing.span('connect', host = host, database = database):
+			try:
+				self.conn = connect(host = host, user = user, password = password,
+														dbname = database, autocommit = True)
+			except psycopg.OperationalError:
+				# could be because database doesn't exist
+				self.conn = connect(host = host, user = user, password = password,
+														autocommit = True)
+				with self.conn.cursor() as cursor:
+					cursor.execute(f'CREATE DATABASE {database}')
+				self.conn.close()
+				self.conn = connect(host = host, user = user, password = password,
+														dbname = database, autocommit = True)
+		self.cache = cache
+		self.layout = layout
+		self.indexes = indexes
+		self.configure()
+		if datafile is not None:
+			self.load(datafile, force, delta)
+		elif cache is not None:
+			cache.set_version(self.stored_dataset()[0])
+
+	def load(self, datafile: str, force: bool = False, delta: bool = False) -> bool:
+		'''
+		Create and populate tables (see create_and_populate), apply the index
+		profile, and key the result cache with the dataset now in database.
+		Returns True if tables have been populated.
+		'''
+
+		with tracing.span('create_and_populate'):
+			loaded = self.create_and_populate(datafile, force, delta)
+		with tracing.span('apply_index_profile', indexes = self.indexes):
+			self.apply_index_profile()
+		if self.cache is not None:
+			self.cache.set_version(self.stored_dataset()[0])
+		return loaded
 	
+	def configure(self):
+		'''
+		Let the planner join and aggregate partitioned tables partition by
+		partition (off by default, as it plans more slowly).
+		'''
+
+		partitionwise = 'off' if self.layout == 'plain' else 'on'
+		with self.conn.cursor() as cursor:
+			cursor.execute(f'SET enable_partitionwise_join = {partitionwise}')
+			cursor.execute(f'SET enable_partitionwise_aggregate = {partitionwise}')
+
+	def apply_index_profile(self):
+		'''
+		Create the indexes of the index profile, and drop those of the others.
+		Indexes of profiles are not part of the import version, so switching
+		profile does not populate tables again.
+		'''
+
+		with self.conn.cursor() as cursor:
+			for name, definition in PREFIX_INDEXES.items():
+				if self.indexes == 'prefix':
+					cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+				else:
+					cursor.execute(f'DROP INDEX IF EXISTS {name}')
+			# statistics on names, for the planner to estimate prefix filters
+			if self.indexes == 'prefix': cursor.execute('ANALYZE pokemon')
+
+	def import_version(self) -> str:
+		return f'{IMPORT_VERSION}-{self.layout}'
+
+	def pokemon_tables(self) -> list:
+		'''
+		Pokemon-keyed tables of the layout.
+		'''
+
+		absent = 'pokemon_sensibility' if self.layout == 'array' else 'pokemon_effectiveness'
+		return [t for t in tables if t.startswith('pokemon_') and t != absent]
+
+	def equivalents(self):
+		'''
+		Class of the Neo4j equivalents written for the layout.
+		'''
+
+		return EQUIVALENTS[self.layout]
+
 	def close(self):
 		self.conn.close()
+
+	def fetch(self, query: str, params = None, columns: bool = False):
+		'''
+		Run a read-only query and return its rows, from the result cache if any.
+
+		Args:
+			query, params: query to run.
+			columns: if True, return (column names, rows) instead, the names being
+				None when rows come from the result cache.
+		'''
+
+		with tracing.span('fetch') as span:
+			names = None
+			def run():
+				nonlocal names
+				with self.conn.cursor() as cursor:
+					cursor.execute(query, params)
+					names = [c.name for c in cursor.description or []]
+					return cursor.fetchall()
+			rows = run() if self.cache is None else self.cache.fetch(query, params, run)
+			span.set_rows(len(rows))
+			return (names, rows) if columns else rows
+
+	def load_strong_against(self, strong: StrongAgainst):
+		'''
+		Create the pokemon_strong table and copy STRONG_AGAINST edges computed in
+		process into it, instead of joining sensibility with type membership.
+		'''
+
+		with self.conn.cursor() as cursor, self.conn.transaction():
+			cursor.execute(Neo4jEquivalents.create_pokemon_strong())
+			with cursor.copy('COPY pokemon_strong (pid_1, pid_2) FROM STDIN') as copy:
+				for edges in strong.pokedex_batches():
+					for edge in edges:
+						copy.write_row(edge)
+		if self.cache is not None: self.cache.invalidate()
+
+	def batches(self, query: str, params = None, itersize: int = None):
+		'''
+		Run a read-only query and generate (columns, rows) batches as the server
+		sends them, bypassing the result cache, so that client memory stays flat
+		whatever the size of the result.
+
+		Args:
+			query, params: query to run.
+			itersize: if given, rows are fetched through a named server-side
+				cursor, itersize rows per round trip; otherwise they are sent one at
+				a time (single row mode) and grouped by BATCH_SIZE rows.
+		'''
+
+		count = 0
+		if itersize is None:
+			with self.conn.cursor() as cursor:
+				rows = cursor.stream(query, params)
+				while batch := list(islice(rows, BATCH_SIZE)):
+					count += len(batch)
+					yield [c.name for c in cursor.description], batch
+		else:
+			# server-side cursors only live inside a transaction
+			with self.conn.transaction(), self.conn.cursor('run_query') as cursor:
+				cursor.itersize = itersize
+				cursor.execute(query, params)
+				columns = [c.name for c in cursor.description]
+				while batch := cursor.fetchmany(itersize):
+					count += len(batch)
+					yield columns, batch
+		tracing.add_counters({'streamed_rows': count})
+
+	def explain(self, query: str, params = None) -> str:
+		'''
+		Execution plan of a read-only query.
+		'''
+
+		return '\n'.join(row[0] for row in self.fetch('EXPLAIN ' + query, params))
+
+	def profile(self, query: str, params = None) -> dict:
+		'''
+		Runs a read-only query with EXPLAIN ANALYZE, and returns its planning and
+		execution times (ms), the shared buffers it hit and read, and the indexes
+		it scanned.
+		'''
+
+		with self.conn.cursor() as cursor:
+			cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + query, params)
+			res = cursor.fetchone()[0][0]
+		nodes = plan_nodes(res['Plan'])
+		return {
+			'planning_ms': res['Planning Time'],
+			'execution_ms': res['Execution Time'],
+			'shared_hit_blocks': res['Plan'].get('Shared Hit Blocks', 0),
+			'shared_read_blocks': res['Plan'].get('Shared Read Blocks', 0),
+			'relations_scanned': len({
+				node['Relation Name'] for node in nodes
+				if 'Relation Name' in node and node.get('Actual Loops', 1) > 0
+			}),
+			'workers_launched': max(
+				[node.get('Workers Launched', 0) for node in nodes]
+			),
+			'indexes_used': sorted({
+				node['Index Name'] for node in nodes if 'Index Name' in node
+			})
+		}
+
+	def execute(self, query: str, params = None) -> list:
+		'''
+		Run a query modifying the database and return its rows if any,
+		invalidating the result cache.
+		'''
+
+		with tracing.span('execute') as span, self.conn.cursor() as cursor:
+			cursor.execute(query, params)
+			rows = cursor.fetchall() if cursor.description else []
+			span.set_rows(len(rows))
+			span.add_counters(cursor_counters(cursor))
+		if self.cache is not None: self.cache.invalidate()
+		return rows
 	
 	def clear(self):
 		'''
@@ -33,63 +284,141 @@ class PostgresQueries:
 		'''
 		with self.conn.cursor() as cursor:
 			for table in tables:
-				cursor.execute(f'DROP TABLE {table} CASCADE')
+				cursor.execute(f'DROP TABLE IF EXISTS {table} CASCADE')
 	
-	def create_and_populate(self, datafile: str):
+	def stored_dataset(self) -> tuple:
+		'''
+		Fingerprint and import version of the dataset currently in database, if
+		any.
+		'''
+
+		with self.conn.cursor() as cursor:
+			cursor.execute("SELECT to_regclass('dataset')")
+			if cursor.fetchone()[0] is None: return None, None
+			cursor.execute('SELECT fingerprint, version FROM dataset')
+			res = cursor.fetchone()
+			return (res[0], res[1]) if res else (None, None)
+
+	def store_size(self) -> int:
+		'''
+		Size on disk of all tables of the database, with their indexes and
+		partitions, in bytes.
+		'''
+
+		with self.conn.cursor() as cursor:
+			cursor.execute('''
+				SELECT COALESCE(SUM(pg_total_relation_size(oid)), 0) FROM pg_class
+				WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace
+			''')
+			return int(cursor.fetchone()[0])
+
+	def create_and_populate(self, datafile: str, force: bool = False,
+													delta: bool = False) -> bool:
 		'''
-		Create all tables in database, and populate them with data from csv file.
+		Create all tables in database, and populate them with data from csv file,
+		unless the dataset already in database has the same fingerprint.
+		Returns True if tables have been populated.
 
 		Args:
 			datafile: path to a csv file containing data to populate tables with.
+			force: populate even if fingerprints match.
+			delta: only update the Pokemon that changed, if tables have been
+				populated by the same version of the import code.
 		'''
 
-		with self.conn.cursor() as cursor:
-			for table in tables:
-				cursor.execute(f'DROP TABLE IF EXISTS {table} CASCADE')
-			self.__create_tables(cursor)
-			self.__populate_tables(cursor, datafile)
+		with tracing.span('fingerprint'):
+			fingerprint = dataset.fingerprint(datafile, self.import_version())
+			stored_fingerprint, stored_version = self.stored_dataset()
+		if not force and stored_fingerprint == fingerprint:
+			return False
+		with tracing.span('read_rows') as span:
+			rows = dataset.read_rows(datafile)
+			span.set_rows(len(rows))
+		with self.conn.cursor() as cursor, self.conn.transaction():
+			if delta and not force and stored_version == self.import_version():
+				with tracing.span('delta_populate'):
+					upserted, deleted = self.__delta_populate(cursor, rows)
+				print(f'Delta import: {upserted} Pokemon upserted, {deleted} deleted')
+				cursor.execute('DELETE FROM dataset')
+			else:
+				with tracing.span('drop_tables'):
+					for table in tables:
+						cursor.execute(f'DROP TABLE IF EXISTS {table} CASCADE')
+				with tracing.span('create_tables', layout = self.layout):
+					self.__create_tables(cursor, rows)
+				with tracing.span('populate_tables'):
+					self.__populate_tables(cursor, datafile, rows)
+				with tracing.span('populate_row_hashes'):
+					self.__populate_row_hashes(cursor, rows)
+				with tracing.span('populate_type_stats'):
+					self.__populate_type_stats(cursor, TypeStats.from_rows(rows))
+			cursor.execute(
+				QueryUtils.populate_dataset_table(),
+				(fingerprint, self.import_version())
+			)
+		return True
 
-	def __create_tables(self, cursor: psycopg.cursor):
+	def __create_tables(self, cursor: psycopg.cursor, rows: list):
 		'''
-		Create all tables in database.
+		Create all tables in database, and the partitions of the partitioned
+		ones.
+
+		Args:
+			rows: parsed rows of the dataset, whose generations get a partition
+				each in the generation layout.
 		'''
 	 
+		layout = self.layout
 		cursor.execute(QueryUtils.create_pokemon_table())
 		cursor.execute(QueryUtils.create_basic_table('type'))
-		cursor.execute(QueryUtils.create_association_table('type'))
+		cursor.execute(QueryUtils.create_association_table('type', layout))
 		cursor.execute(QueryUtils.create_basic_table('ability'))
-		cursor.execute(QueryUtils.create_association_table('ability'))
+		cursor.execute(QueryUtils.create_association_table('ability', layout))
 		cursor.execute(
 			QueryUtils.create_basic_association_table(
 				'percentage_male',
-				'REAL'
+				'REAL',
+				layout
 			)
 		)
 		cursor.execute(
 			QueryUtils.create_basic_association_table(
-			 	'classification'
+			 	'classification',
+				layout = layout
 			)
 		)
 		cursor.execute(
 			QueryUtils.create_basic_association_table(
 			 	'generation',
-				'INTEGER'
+				'INTEGER',
+				layout
 			)
 		)
-		cursor.execute(QueryUtils.create_pokemon_sensibility_table())
-		cursor.execute(QueryUtils.create_pokemon_basic_stats_table())
-		cursor.execute(QueryUtils.create_pokemon_battle_stats_table())
-		cursor.execute(QueryUtils.create_pokemon_legendary_table())
+		if layout == 'array':
+			cursor.execute(QueryUtils.create_pokemon_effectiveness_table())
+			for query in QueryUtils.create_effectiveness_indexes():
+				cursor.execute(query)
+		else:
+			cursor.execute(QueryUtils.create_pokemon_sensibility_table(layout))
+		cursor.execute(QueryUtils.create_pokemon_basic_stats_table(layout))
+		cursor.execute(QueryUtils.create_pokemon_battle_stats_table(layout))
+		cursor.execute(QueryUtils.create_pokemon_legendary_table(layout))
+		cursor.execute(QueryUtils.create_basic_association_table('row_hash'))
+		cursor.execute(QueryUtils.create_type_stats_table())
+		cursor.execute(QueryUtils.create_type_ability_stats_table())
+		cursor.execute(QueryUtils.create_dataset_table())
+		if layout != 'plain':
+			generations = sorted({
+				row['generation'] for row in rows if row['generation'] is not None
+			})
+			for table in partitioned_tables:
+				for query in QueryUtils.create_partitions(table, layout, generations):
+					cursor.execute(query)
 
-	def __populate_tables(self, cursor: psycopg.cursor, datafile: str):
+	def __create_tmp_table(self, cursor: psycopg.cursor, tmp_table: str):
 		'''
-		Populate all tables in database with data from csv file.
-
-		Args:
-			datafile: path to a csv file containing data to populate tables with.
+		Create a temporary table with the same columns as the csv file.
 		'''
-	
-		tmp_table = 'tmp'
 
 		cursor.execute(f'''
 			CREATE TEMP TABLE {tmp_table} (
@@ -109,41 +438,205 @@ class PostgresQueries:
 				generation INTEGER,is_legendary BOOLEAN
 			)
 		''')
-		with open(datafile, 'r') as f:
-			with cursor.copy(
+
+	def __populate_tables(self, cursor: psycopg.cursor, datafile: str,
+												rows: list):
+		'''
+		Populate all tables in database with data from csv file.
+
+		Args:
+			datafile: path to a csv file containing data to populate tables with,
+				or to a snapshot of it (see snapshot.py).
+			rows: parsed rows of datafile, copied as is for snapshots.
+		'''
+	
+		tmp_table = 'tmp'
+
+		self.__create_tmp_table(cursor, tmp_table)
+		if is_snapshot(datafile):
+			self.__copy_rows(cursor, tmp_table, rows)
+		else:
+			with open(datafile, 'r') as f, cursor.copy(
 		 		f"COPY {tmp_table} FROM STDIN DELIMITER ',' CSV HEADER"
 			) as copy:
-					while data := f.read(100): 
-						data = data.replace('[', '{').replace(']', '}').replace('\'', '')
-						copy.write(data)
+				while data := f.read(1 << 16):
+					data = data.replace('[', '{').replace(']', '}').replace('\'', '')
+					copy.write(data)
+		self.__populate_from_tmp_table(cursor, tmp_table)
+		cursor.execute(f'DROP TABLE {tmp_table}')
+
+	def __copy_rows(self, cursor: psycopg.cursor, tmp_table: str, rows: list):
+		'''
+		Copy parsed rows into the temporary table.
+		'''
+
+		if not rows: return
+		columns = ', '.join(rows[0].keys())
+		with cursor.copy(f'COPY {tmp_table} ({columns}) FROM STDIN') as copy:
+			for row in rows:
+				copy.write_row(tuple(row.values()))
+
+	def __populate_from_tmp_table(self, cursor: psycopg.cursor, tmp_table: str):
+		'''
+		Populate all tables in database with the rows of the temporary table.
+		'''
+
+		layout = self.layout
 		cursor.execute(QueryUtils.populate_pokemon_table(tmp_table))
 		cursor.execute(QueryUtils.populate_type_table(tmp_table))
 		cursor.execute(QueryUtils.populate_ability_table(tmp_table))
 		cursor.execute(
 			QueryUtils.populate_basic_association_table(
 				'classification',
-			 	tmp_table
+			 	tmp_table,
+				layout
 			)
 		)
 		cursor.execute(
 			QueryUtils.populate_basic_association_table(
 				'generation',
-			 	tmp_table
+			 	tmp_table,
+				layout
 			)
 		)
 		cursor.execute(
 			QueryUtils.populate_basic_association_table(
 				'percentage_male',
-			 	tmp_table
+			 	tmp_table,
+				layout
 			)
 		)
-		cursor.execute(QueryUtils.populate_pokemon_basic_stats_table(tmp_table))
-		cursor.execute(QueryUtils.populate_pokemon_battle_stats_table(tmp_table))
-		cursor.execute(QueryUtils.populate_pokemon_legendary_table(tmp_table))
-		cursor.execute(QueryUtils.populate_pokemon_sensibility_table(tmp_table))
-		cursor.execute(QueryUtils.populate_pokemon_ability_table(tmp_table))
-		cursor.execute(QueryUtils.populate_pokemon_type_table(tmp_table))
+		cursor.execute(QueryUtils.populate_pokemon_basic_stats_table(tmp_table, layout))
+		cursor.execute(QueryUtils.populate_pokemon_battle_stats_table(tmp_table, layout))
+		cursor.execute(QueryUtils.populate_pokemon_legendary_table(tmp_table, layout))
+		if layout == 'array':
+			cursor.execute(QueryUtils.populate_pokemon_effectiveness_table(tmp_table))
+		else:
+			cursor.execute(QueryUtils.populate_pokemon_sensibility_table(tmp_table, layout))
+		cursor.execute(QueryUtils.populate_pokemon_ability_table(tmp_table, layout))
+		cursor.execute(QueryUtils.populate_pokemon_type_table(tmp_table, layout))
+
+	def __populate_row_hashes(self, cursor: psycopg.cursor, rows: list):
+		'''
+		Store the hash of each row, so that a later delta import knows which
+		Pokemon changed.
+
+		Args:
+			rows: parsed rows of the imported dataset.
+		'''
+
+		with cursor.copy(
+			'COPY pokemon_row_hash (pokemon_id, row_hash) FROM STDIN'
+		) as copy:
+			for row in rows:
+				copy.write_row((row['pokedex_number'], dataset.row_hash(row)))
+
+	def __delta_populate(self, cursor: psycopg.cursor, rows: list) -> tuple:
+		'''
+		Update only the Pokemon that changed since the last import, and delete
+		those that are not in rows anymore.
+		Returns the number of upserted and deleted Pokemon.
+
+		Args:
+			rows: parsed rows of the new dataset.
+		'''
+
+		cursor.execute('SELECT pokemon_id, row_hash FROM pokemon_row_hash')
+		upserts, removed = dataset.diff(rows, dict(cursor.fetchall()))
+		ids = removed + [row['pokedex_number'] for row in upserts]
+		if not ids: return 0, 0
+
+		stored = self.__stored_type_stats(cursor)
+		stats = stored.copy()
+		for sensibilities, abilities in self.__stored_contributions(cursor, ids):
+			stats.add(sensibilities, abilities, -1)
+
+		# derived from the Pokemon that are about to change
+		cursor.execute('DROP TABLE IF EXISTS pokemon_strong')
+		for table in self.pokemon_tables():
+			cursor.execute(
+				f'DELETE FROM {table} WHERE pokemon_id = ANY(%s)', (ids,)
+			)
+		cursor.execute('DELETE FROM pokemon WHERE pokedex_id = ANY(%s)', (ids,))
+
+		tmp_table = 'tmp'
+		self.__create_tmp_table(cursor, tmp_table)
+		self.__copy_rows(cursor, tmp_table, upserts)
+		self.__populate_from_tmp_table(cursor, tmp_table)
 		cursor.execute(f'DROP TABLE {tmp_table}')
+		self.__populate_row_hashes(cursor, upserts)
+		cursor.execute(QueryUtils.delete_unused_abilities())
+		for row in upserts: stats.add_row(row)
+		self.__populate_type_stats(cursor, stats, stats.changed(stored))
+		return len(upserts), len(removed)
+
+	def __stored_contributions(self, cursor: psycopg.cursor, ids: list) -> list:
+		'''
+		Sensibilities by type and abilities of stored Pokemon, as contributing
+		to type aggregates (see typestats.py).
+
+		Args:
+			ids: pokedex numbers of the Pokemon.
+		'''
+
+		sensibilities = {id: {} for id in ids}
+		if self.layout == 'array':
+			cursor.execute(
+				'''SELECT pokemon_id, sensibility FROM pokemon_effectiveness
+				WHERE pokemon_id = ANY(%s)''', (ids,)
+			)
+			for id, values in cursor.fetchall():
+				sensibilities[id] = dict(zip(dataset.TYPES, values))
+		else:
+			cursor.execute(
+				'''SELECT pokemon_id, type.name, sensibility FROM pokemon_sensibility
+				JOIN type ON type.type_id = pokemon_sensibility.type_id
+				WHERE pokemon_id = ANY(%s)''', (ids,)
+			)
+			for id, type, value in cursor.fetchall():
+				sensibilities[id][type] = value
+		abilities = {id: [] for id in ids}
+		cursor.execute(
+			'''SELECT pokemon_id, ability.name FROM pokemon_ability
+			JOIN ability ON ability.ability_id = pokemon_ability.ability_id
+			WHERE pokemon_id = ANY(%s)''', (ids,)
+		)
+		for id, ability in cursor.fetchall():
+			abilities[id].append(ability)
+		return [(sensibilities[id], abilities[id]) for id in ids]
+
+	def __stored_type_stats(self, cursor: psycopg.cursor) -> TypeStats:
+		cursor.execute('SELECT type, weak, resistant, immune FROM type_stats')
+		type_rows = cursor.fetchall()
+		cursor.execute('SELECT type, ability, weak FROM type_ability_stats')
+		return TypeStats.from_tables(type_rows, cursor.fetchall())
+
+	def __populate_type_stats(self, cursor: psycopg.cursor, stats: TypeStats,
+														types: list = None):
+		'''
+		Store type aggregates, replacing those of the given types.
+
+		Args:
+			stats: aggregates of the dataset.
+			types: types whose aggregates are stored (default: all, in empty
+				tables).
+		'''
+
+		if types is not None:
+			cursor.execute('DELETE FROM type_stats WHERE type = ANY(%s)', (types,))
+			cursor.execute(
+				'DELETE FROM type_ability_stats WHERE type = ANY(%s)', (types,)
+			)
+		with cursor.copy(
+			'COPY type_stats (type, weak, resistant, immune) FROM STDIN'
+		) as copy:
+			for row in stats.type_rows(types):
+				copy.write_row(row)
+		with cursor.copy(
+			'COPY type_ability_stats (type, ability, weak) FROM STDIN'
+		) as copy:
+			for row in stats.ability_rows(types):
+				copy.write_row(row)
 
 class QueryUtils:
 	'''
@@ -171,36 +664,82 @@ class QueryUtils:
 		'''
 	
 	@staticmethod
-	def create_association_table(name: str) -> str:
+	def partitioning(layout: str, name: str = None) -> tuple:
+		'''
+		Extra column and PARTITION BY clause of a Pokemon-keyed table: in the
+		generation layout, tables carry the generation of their Pokemon, which
+		pokemon_generation already has.
+		'''
+
+		if layout == 'generation':
+			column = '' if name == 'generation' else ', generation INTEGER'
+			return column, ' PARTITION BY LIST (generation)'
+		if layout == 'hash':
+			return '', ' PARTITION BY HASH (pokemon_id)'
+		return '', ''
+
+	@staticmethod
+	def generation_column(layout: str, name: str = None) -> str:
+		'''
+		Generation selected last when populating a Pokemon-keyed table, in the
+		generation layout.
+		'''
+
+		return ', generation' if layout == 'generation' and name != 'generation' else ''
+
+	@staticmethod
+	def create_partitions(table: str, layout: str, generations: list) -> list:
+		'''
+		Partitions of a Pokemon-keyed table: one per generation and a default one
+		for generations imported later, or HASH_PARTITIONS by hash.
+		'''
+
+		if layout == 'generation':
+			return [
+				f'''CREATE TABLE {table}_g{generation} PARTITION OF {table}
+				FOR VALUES IN ({generation})''' for generation in generations
+			] + [f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT']
+		return [
+			f'''CREATE TABLE {table}_p{i} PARTITION OF {table}
+			FOR VALUES WITH (MODULUS {HASH_PARTITIONS}, REMAINDER {i})'''
+			for i in range(HASH_PARTITIONS)
+		]
+
+	@staticmethod
+	def create_association_table(name: str, layout: str = 'plain') -> str:
 		'''
 		One-to-many association table between pokemon and a basic table.
 		'''
 
+		column, partition = QueryUtils.partitioning(layout)
 		res = f'''
 			CREATE TABLE pokemon_{name} (
 				pokemon_id INTEGER references pokemon(pokedex_id) NOT NULL,
 				{name}_id INTEGER references {name}({name}_id) NOT NULL
 		'''
 		if name == 'type': res += ', first_type BOOLEAN NOT NULL'
-		return res + ')'
+		return res + column + ')' + partition
 	
 	@staticmethod
-	def create_basic_association_table(name: str, datatype: str = 'TEXT') -> str:
+	def create_basic_association_table(name: str, datatype: str = 'TEXT',
+																		 layout: str = 'plain') -> str:
 		'''
 		One-to-many association table between pokemon and characteristics that
 		are not in a basic table.
 		'''
 
+		column, partition = QueryUtils.partitioning(layout, name)
 		return f'''
 			CREATE TABLE pokemon_{name} (
 				pokemon_id INTEGER references pokemon(pokedex_id) NOT NULL,
-				{name} {datatype}
-			)
+				{name} {datatype}{column}
+			){partition}
 		'''
 	
 	@staticmethod
-	def create_pokemon_sensibility_table() -> str:
-		return '''
+	def create_pokemon_sensibility_table(layout: str = 'plain') -> str:
+		column, partition = QueryUtils.partitioning(layout)
+		return f'''
 			CREATE TABLE pokemon_sensibility (
 				pokemon_id INTEGER references pokemon(pokedex_id) NOT NULL,
 				type_id INTEGER references type(type_id) NOT NULL,
@@ -208,13 +747,47 @@ class QueryUtils:
 				CONSTRAINT check_sensibility CHECK (
 					sensibility = 0 OR sensibility = 0.25 OR sensibility = 0.5 OR
 					sensibility = 1 OR sensibility = 2 OR sensibility = 4
+				){column}
+			){partition}
+		'''
+	
+	@staticmethod
+	def create_pokemon_effectiveness_table() -> str:
+		'''
+		Sensibilities of each Pokemon against all types, in the order of
+		dataset.TYPES, in a single row.
+		'''
+
+		return f'''
+			CREATE TABLE pokemon_effectiveness (
+				pokemon_id INTEGER PRIMARY KEY references pokemon(pokedex_id),
+				sensibility REAL[] NOT NULL
+				CONSTRAINT check_sensibility CHECK (
+					cardinality(sensibility) = {len(dataset.TYPES)}
+					AND sensibility <@ ARRAY[0, 0.25, 0.5, 1, 2, 4]::REAL[]
 				)
 			)
 		'''
-	
+
 	@staticmethod
-	def create_pokemon_basic_stats_table() -> str:
-		return '''
+	def create_effectiveness_indexes() -> list:
+		'''
+		GIN index on sensibility arrays, for containment (e.g. immune to any
+		type: sensibility @> ARRAY[0]), and expression indexes on the
+		sensibilities against INDEXED_TYPES.
+		'''
+
+		return [
+			'CREATE INDEX ON pokemon_effectiveness USING GIN (sensibility)'
+		] + [
+			'CREATE INDEX ON pokemon_effectiveness'
+			+ f' ((sensibility[{dataset.TYPES.index(t) + 1}]))' for t in INDEXED_TYPES
+		]
+
+	@staticmethod
+	def create_pokemon_basic_stats_table(layout: str = 'plain') -> str:
+		column, partition = QueryUtils.partitioning(layout)
+		return f'''
 			CREATE TABLE pokemon_basic_stats (
 				pokemon_id INTEGER references pokemon(pokedex_id) NOT NULL,
 				height_m REAL,
@@ -222,13 +795,14 @@ class QueryUtils:
 				capture_rate INTEGER,
 				base_egg_steps INTEGER,
 				experience_growth INTEGER,
-				base_happiness INTEGER
-			)
+				base_happiness INTEGER{column}
+			){partition}
 		'''
 	
 	@staticmethod
-	def create_pokemon_battle_stats_table() -> str:
-		return '''
+	def create_pokemon_battle_stats_table(layout: str = 'plain') -> str:
+		column, partition = QueryUtils.partitioning(layout)
+		return f'''
 			CREATE TABLE pokemon_battle_stats (
 				pokemon_id INTEGER references pokemon(pokedex_id) NOT NULL,
 				hp INTEGER,
@@ -236,18 +810,62 @@ class QueryUtils:
 				defense INTEGER,
 				sp_attack INTEGER,
 				sp_defense INTEGER,
-				speed INTEGER
-			)
+				speed INTEGER{column}
+			){partition}
 		'''
 	
 	@staticmethod
-	def create_pokemon_legendary_table() -> str:
-		return '''
+	def create_pokemon_legendary_table(layout: str = 'plain') -> str:
+		column, partition = QueryUtils.partitioning(layout)
+		return f'''
 			CREATE TABLE pokemon_legendary (
-				pokemon_id INTEGER references pokemon(pokedex_id) NOT NULL
-			)
+				pokemon_id INTEGER references pokemon(pokedex_id) NOT NULL{column}
+			){partition}
 		'''
 	
+	@staticmethod
+	def create_type_stats_table() -> str:
+		'''
+		Numbers of Pokemon weak, resistant and immune to each type.
+		'''
+
+		return '''
+			CREATE TABLE type_stats (
+				type TEXT PRIMARY KEY,
+				weak INTEGER NOT NULL,
+				resistant INTEGER NOT NULL,
+				immune INTEGER NOT NULL
+			)
+		'''
+
+	@staticmethod
+	def create_type_ability_stats_table() -> str:
+		'''
+		Numbers of Pokemon weak to each type having each ability.
+		'''
+
+		return '''
+			CREATE TABLE type_ability_stats (
+				type TEXT NOT NULL,
+				ability TEXT NOT NULL,
+				weak INTEGER NOT NULL,
+				PRIMARY KEY (type, ability)
+			)
+		'''
+
+	@staticmethod
+	def create_dataset_table() -> str:
+		'''
+		Single row table holding the fingerprint of the imported dataset.
+		'''
+
+		return '''
+			CREATE TABLE dataset (
+				fingerprint TEXT NOT NULL,
+				version TEXT NOT NULL
+			)
+		'''
+
 	@staticmethod
 	def populate_pokemon_table(tmp_table: str) -> str:
 		return f'''
@@ -261,6 +879,7 @@ class QueryUtils:
 		return f'''
 			INSERT INTO type (name)
 			SELECT DISTINCT type1 FROM {tmp_table}
+			EXCEPT SELECT name FROM type
 		'''
 	
 	@staticmethod
@@ -268,78 +887,109 @@ class QueryUtils:
 		return f'''
 			INSERT INTO ability (name)
 			SELECT DISTINCT unnest(abilities) FROM {tmp_table}
+			EXCEPT SELECT name FROM ability
 		'''
 	
 	@staticmethod
-	def populate_basic_association_table(type: str, tmp_table: str) -> str:
+	def populate_basic_association_table(type: str, tmp_table: str,
+																			 layout: str = 'plain') -> str:
 		type2 = 'classfication' if type == 'classification' else type
+		generation = QueryUtils.generation_column(layout, type)
 		return f'''
 			INSERT INTO pokemon_{type}
-			SELECT pokedex_number, {type2} FROM {tmp_table}
+			SELECT pokedex_number, {type2}{generation} FROM {tmp_table}
 		'''
 	
 	@staticmethod
-	def populate_pokemon_basic_stats_table(tmp_table: str) -> str:
+	def populate_pokemon_basic_stats_table(tmp_table: str,
+																				 layout: str = 'plain') -> str:
 		return f'''
 			INSERT INTO pokemon_basic_stats
 			SELECT pokedex_number, height_m, weight_kg, capture_rate,
-				base_egg_steps, experience_growth, base_happiness
+				base_egg_steps, experience_growth,
+				base_happiness{QueryUtils.generation_column(layout)}
 			FROM {tmp_table}
 		'''
 	
 	@staticmethod
-	def populate_pokemon_battle_stats_table(tmp_table: str) -> str:
+	def populate_pokemon_battle_stats_table(tmp_table: str,
+																					layout: str = 'plain') -> str:
 		return f'''
 			INSERT INTO pokemon_battle_stats
-			SELECT pokedex_number, hp, attack, defense, sp_attack, sp_defense, speed
+			SELECT pokedex_number, hp, attack, defense, sp_attack, sp_defense,
+				speed{QueryUtils.generation_column(layout)}
 			FROM {tmp_table}
 		'''
 	
 	@staticmethod
-	def populate_pokemon_legendary_table(tmp_table: str) -> str:
+	def populate_pokemon_legendary_table(tmp_table: str,
+																			 layout: str = 'plain') -> str:
 		return f'''
 			INSERT INTO pokemon_legendary
-			SELECT pokedex_number FROM {tmp_table} WHERE is_legendary
+			SELECT pokedex_number{QueryUtils.generation_column(layout)}
+			FROM {tmp_table} WHERE is_legendary
 		'''
 	
 	@staticmethod
-	def populate_pokemon_sensibility_table(tmp_table: str) -> str:
-		types = [
-			'bug', 'dark', 'dragon', 'electric', 'fairy', 'fighting', 'fire',
-	 		'flying', 'ghost', 'grass', 'ground', 'ice', 'normal', 'poison',
-		 	'psychic', 'rock', 'steel', 'water'
-		]
-		res = '''INSERT INTO pokemon_sensibility
-		SELECT pokedex_number, type_id, sensibility FROM (
+	def populate_pokemon_sensibility_table(tmp_table: str,
+																				 layout: str = 'plain') -> str:
+		generation = QueryUtils.generation_column(layout)
+		types = dataset.TYPES
+		res = f'''INSERT INTO pokemon_sensibility
+		SELECT pokedex_number, type_id, sensibility{generation} FROM (
 		'''
 		for type in types:
 			against = 'fight' if type == 'fighting' else type
 			res += f'''
-				SELECT pokedex_number, type_id, against_{against} AS sensibility
+				SELECT pokedex_number, type_id, against_{against} AS sensibility{generation}
 				FROM {tmp_table} JOIN type ON '{type}' = type.name
 			'''
 			if type != types[-1]: res += ' UNION ALL '
 		return res + ') AS foo'
 	
 	@staticmethod
-	def populate_pokemon_ability_table(tmp_table: str) -> str:
+	def populate_pokemon_effectiveness_table(tmp_table: str) -> str:
+		columns = ', '.join(
+			'against_' + ('fight' if type == 'fighting' else type) for type in dataset.TYPES
+		)
+		return f'''
+			INSERT INTO pokemon_effectiveness
+			SELECT pokedex_number, ARRAY[{columns}] FROM {tmp_table}
+		'''
+
+	@staticmethod
+	def populate_dataset_table() -> str:
+		return 'INSERT INTO dataset (fingerprint, version) VALUES (%s, %s)'
+
+	@staticmethod
+	def delete_unused_abilities() -> str:
+		return '''
+		DELETE FROM ability WHERE ability_id NOT IN (
+			SELECT ability_id FROM pokemon_ability
+		)
+		'''
+
+	@staticmethod
+	def populate_pokemon_ability_table(tmp_table: str, layout: str = 'plain') -> str:
+		generation = QueryUtils.generation_column(layout)
 		return f'''
 		INSERT INTO pokemon_ability
-		SELECT pokedex_number, ability_id FROM (
-			SELECT pokedex_number, unnest(abilities) AS ability
+		SELECT pokedex_number, ability_id{generation} FROM (
+			SELECT pokedex_number, unnest(abilities) AS ability{generation}
 			FROM {tmp_table}
 		) AS foo JOIN ability ON foo.ability = ability.name
 		'''
 
 	@staticmethod
-	def populate_pokemon_type_table(tmp_table: str) -> str:
+	def populate_pokemon_type_table(tmp_table: str, layout: str = 'plain') -> str:
+		generation = QueryUtils.generation_column(layout)
 		return f'''
 		INSERT INTO pokemon_type
-		SELECT pokedex_number, type_id, first_type FROM (
-			SELECT pokedex_number, type1 AS type, true AS first_type
+		SELECT pokedex_number, type_id, first_type{generation} FROM (
+			SELECT pokedex_number, type1 AS type, true AS first_type{generation}
 			FROM {tmp_table}
 			UNION ALL
-			SELECT pokedex_number, type2 AS type, false AS first_type
+			SELECT pokedex_number, type2 AS type, false AS first_type{generation}
 			FROM {tmp_table} WHERE type2 IS NOT NULL
 		) AS foo JOIN type ON foo.type = type.name
 		'''
@@ -355,7 +1005,23 @@ class Neo4jEquivalents:
 
 	@staticmethod
 	def negative_filter() -> str:
-		raise NotImplementedError('Not implemented for SQL')
+		'''
+		Counts the number of Pokemon that are not weak against Fire and not strong
+		against Water.
+		'''
+
+		return '''
+		SELECT count(*) FROM pokemon
+		WHERE NOT EXISTS (
+			SELECT 1 FROM pokemon_sensibility
+			JOIN type ON type.type_id = pokemon_sensibility.type_id
+			WHERE pokemon_sensibility.pokemon_id = pokemon.pokedex_id
+				AND (
+					(type.name = 'fire' AND sensibility = 2)
+					OR (type.name = 'water' AND sensibility = 0.5)
+				)
+		)
+		'''
 
 	@staticmethod
 	def optional_match() -> str:
@@ -448,21 +1114,18 @@ class Neo4jEquivalents:
 		'''
 
 	@staticmethod
-	def predicate_function() -> str:
+	def predicate_function(condition: str = None) -> str:
 		'''
 		Get distinct pairs of Pokemon who have a common type, who both are immunized
 		against a type, and where either of one of them or their common type starts
 		with 'f' or 'g', and the two other nodes start with another letter.
+
+		Args:
+			condition: condition on the names of p1, p2 and type (default:
+				names_xor), e.g. a branch of PrefixQueries.predicate_function.
 	 	'''
 
-		xor_p1 = "p1.name SIMILAR TO '[fgFG]%'"
-		xor_p2 = "p2.name SIMILAR TO '[fgFG]%'"
-		xor_type = "type.name SIMILAR TO '[fgFG]%'"
-		xor_exp = f'''
-		({xor_p1} AND NOT {xor_p2} AND NOT {xor_type})
-		OR (NOT {xor_p1} AND {xor_p2} AND NOT {xor_type})
-		OR (NOT {xor_p1} AND NOT {xor_p2} AND {xor_type})
-		'''
+		xor_exp = condition or Neo4jEquivalents.names_xor()
 		return f'''
 		SELECT DISTINCT p1.name, p2.name, type.name
 		FROM pokemon_sensibility ps1
@@ -486,6 +1149,21 @@ class Neo4jEquivalents:
 		ORDER BY p1.name, p2.name
 		'''
 
+	@staticmethod
+	def names_xor() -> str:
+		'''
+		Condition of predicate_function on the names of p1, p2 and type.
+		'''
+
+		xor_p1 = "p1.name SIMILAR TO '[fgFG]%'"
+		xor_p2 = "p2.name SIMILAR TO '[fgFG]%'"
+		xor_type = "type.name SIMILAR TO '[fgFG]%'"
+		return f'''
+		({xor_p1} AND NOT {xor_p2} AND NOT {xor_type})
+		OR (NOT {xor_p1} AND {xor_p2} AND NOT {xor_type})
+		OR (NOT {xor_p1} AND NOT {xor_p2} AND {xor_type})
+		'''
+
 	@staticmethod
 	def post_union_processing() -> str:
 		'''
@@ -534,21 +1212,46 @@ class Neo4jEquivalents:
 		other, and where the first is not strong against the last.
 		'''
 		
-		create_pokemon_strong = Neo4jEquivalents.__create_pokemon_strong()
+		create_pokemon_strong = Neo4jEquivalents.create_pokemon_strong()
 		populate_pokemon_strong = Neo4jEquivalents.__populate_pokemon_strong()
-		# 'AND EXISTS...' for ensuring there is no loop in the path
-		recursive_query = '''
+		recursive_query = Neo4jEquivalents.data_and_topo_paths()
+		return f'''
+		{create_pokemon_strong}
+		{populate_pokemon_strong}
+		{recursive_query}
+		'''
+
+	@staticmethod
+	def data_and_topo_paths(limit: int = 30) -> str:
+		'''
+		Same as data_and_topo, over an already populated pokemon_strong table.
+		'''
+
+		# as in query 8, paths of 3 or 4 hops where only the last Pokemon is
+		# strong against the first, traversing each relationship at most once;
+		# arr holds every Pokemon of the path, from pid_1 to pid_2
+		return f'''
 		WITH RECURSIVE path AS (
-			SELECT pid_1, pid_2, 0 AS depth, ARRAY[pid_1] arr FROM pokemon_strong
-			UNION
+			SELECT pid_1, pid_2, 1 AS depth, ARRAY[pid_1, pid_2] arr FROM pokemon_strong
+			UNION ALL
 			SELECT p.pid_1, ps.pid_2, depth + 1, arr || ps.pid_2 FROM path p
 			JOIN pokemon_strong ps ON
 				p.pid_2 = ps.pid_1
-			WHERE depth < 5
+			WHERE depth < 4
+				AND NOT EXISTS (
+					SELECT * FROM pokemon_strong s
+					WHERE s.pid_1 = p.pid_2
+						AND s.pid_2 = p.pid_1
+				)
+				AND NOT EXISTS (
+					SELECT * FROM generate_subscripts(p.arr, 1) i
+					WHERE p.arr[i] = ps.pid_1
+						AND p.arr[i + 1] = ps.pid_2
+				)
 		)
 		SELECT pid_1 AS start, pid_2 AS end, arr AS path FROM path p
-		WHERE
-			EXISTS (
+		WHERE depth >= 3
+			AND EXISTS (
 				SELECT * FROM pokemon_strong ps
 				WHERE p.pid_1 = ps.pid_2
 					AND p.pid_2 = ps.pid_1
@@ -558,30 +1261,18 @@ class Neo4jEquivalents:
 				WHERE p.pid_1 = ps.pid_1
 					AND p.pid_2 = ps.pid_2
 			)
-			AND depth = 3 OR depth = 4
-			AND EXISTS (
-				WITH dist_c AS (
-					SELECT COUNT(DISTINCT u) dist_c FROM unnest(arr) u
-				), c AS (
-					SELECT COUNT(u) c FROM unnest(arr) u
-    		)
-				SELECT * FROM dist_c JOIN c ON dist_c.dist_c = c.c
-			)
-		LIMIT 30;
-		'''
-		return f'''
-		{create_pokemon_strong}
-		{populate_pokemon_strong}
-		{recursive_query}
+		LIMIT {limit};
 		'''
 
 	@staticmethod
-	def __create_pokemon_strong() -> str:
+	def create_pokemon_strong() -> str:
 		'''
-		Create a table pokemon_strong(p1, p2) where p1 is strong against p2.
+		Create a table pokemon_strong(p1, p2) where p1 is strong against p2,
+		replacing the one of a previous run.
 	 	'''
 		
 		return '''
+		DROP TABLE IF EXISTS pokemon_strong;
 		CREATE TABLE pokemon_strong (
 			pid_1 INTEGER references pokemon(pokedex_id) NOT NULL,
 		 	pid_2 INTEGER references pokemon(pokedex_id) NOT NULL
@@ -603,47 +1294,658 @@ class Neo4jEquivalents:
 		WHERE sensibility IN (0.25, 0.5);
 		'''
 
-def executeQueries(psql, run_topo):
-	#print("negative filter")
-	#with psql.conn.cursor() as cursor:
-	#	cursor.execute(Neo4jEquivalents.negative_filter())
-	#	print(cursor.fetchone()[0])
-	#print()
+class ArrayEquivalents(Neo4jEquivalents):
+	'''
+	Neo4j equivalents for the array layout, reading the sensibilities of a
+	Pokemon from its array in pokemon_effectiveness instead of joining and
+	grouping its rows of pokemon_sensibility. Queries not reading
+	sensibilities are inherited.
+	'''
+
+	@staticmethod
+	def against(type: str, alias: str = 'pe') -> str:
+		'''
+		Sensibility against a type, in the array of a Pokemon.
+		'''
+
+		return f'{alias}.sensibility[{dataset.TYPES.index(type) + 1}]'
+
+	@staticmethod
+	def type_names() -> str:
+		'''
+		Names of the types, in the order of the arrays, to unnest them with.
+		'''
+
+		return 'ARRAY[' + ', '.join(f"'{type}'" for type in dataset.TYPES) + ']'
+
+	@staticmethod
+	def negative_filter() -> str:
+		'''
+		Counts the number of Pokemon that are not weak against Fire and not strong
+		against Water.
+		'''
+
+		fire = ArrayEquivalents.against('fire')
+		water = ArrayEquivalents.against('water')
+		return f'''
+		SELECT count(*) FROM pokemon_effectiveness pe
+		WHERE ({fire} = 2 OR {water} = 0.5) IS NOT TRUE
+		'''
+
+	@staticmethod
+	def optional_match() -> str:
+		'''
+		Get resistences of Psychic type Pokemon, apart from against Psychic and
+		Fighting (well-known resistences for Psychic Pokemon), if any.
+		'''
+
+		return f'''
+		SELECT DISTINCT pokemon.name, e.type, e.sensibility FROM pokemon_type
+		JOIN pokemon ON
+			pokemon.pokedex_id = pokemon_type.pokemon_id
+			AND type_id = (SELECT type_id FROM type WHERE name = 'psychic')
+			AND pokemon_type.first_type
+		JOIN pokemon_effectiveness pe ON
+			pe.pokemon_id = pokemon_type.pokemon_id
+		LEFT JOIN LATERAL unnest(
+			pe.sensibility, {ArrayEquivalents.type_names()}
+		) AS e(sensibility, type) ON
+			e.type NOT IN ('psychic', 'fighting')
+			AND e.sensibility IN (0.25, 0.5)
+		ORDER BY pokemon.name
+		'''
+
+	@staticmethod
+	def collect_unwind() -> str:
+		'''
+		Find the abilities of Pokemon (very) weak against Psychic type, and count
+		how many of them have each ability.
+		'''
+
+		return f'''
+		SELECT ability.name ability, COUNT(DISTINCT pokemon_ability.pokemon_id)
+		FROM pokemon_effectiveness pe
+		JOIN pokemon_ability ON
+			pokemon_ability.pokemon_id = pe.pokemon_id
+		JOIN ability ON
+			ability.ability_id = pokemon_ability.ability_id
+		WHERE {ArrayEquivalents.against('psychic')} IN (2, 4)
+		GROUP BY ability.name
+		ORDER BY ability.name
+		'''
+
+	@staticmethod
+	def reduce() -> str:
+		'''
+		For each ability, sum the attack of all Pokemon (very) weak against Fire,
+		Water or Grass, whose name starts with 'A'. If there is no such Pokemon for
+		an ability, the ability should not be returned.
+		'''
+
+		weak = ' OR '.join(
+			f'{ArrayEquivalents.against(type)} IN (2, 4)'
+			for type in ['fire', 'water', 'grass']
+		)
+		return f'''
+		SELECT name, SUM(attack), array_agg(pname) FROM (
+			SELECT DISTINCT ability.name AS name, pokemon.name AS pname, attack FROM ability
+			JOIN pokemon_ability ON
+				pokemon_ability.ability_id = ability.ability_id
+			JOIN pokemon_battle_stats ON
+				pokemon_battle_stats.pokemon_id = pokemon_ability.pokemon_id
+			JOIN pokemon ON
+				pokemon.pokedex_id = pokemon_ability.pokemon_id
+				AND pokemon.name LIKE 'A%'
+			JOIN pokemon_effectiveness pe ON
+				pe.pokemon_id = pokemon.pokedex_id
+				AND ({weak})
+		) foo
+		GROUP BY name
+		ORDER BY name
+		'''
+
+	@staticmethod
+	def with_filter_aggregate() -> str:
+		'''
+		Get Pokemon who are immunized against more than one type.
+		'''
+
+		count = 'cardinality(array_positions(pe.sensibility, 0::REAL))'
+		return f'''
+		SELECT pokemon.name, {count} count_types
+		FROM pokemon_effectiveness pe
+		JOIN pokemon ON
+			pe.pokemon_id = pokemon.pokedex_id
+		WHERE pe.sensibility @> ARRAY[0]::REAL[]
+			AND {count} > 1
+		ORDER BY pokemon.name
+		'''
+
+	@staticmethod
+	def predicate_function(condition: str = None) -> str:
+		'''
+		Get distinct pairs of Pokemon who have a common type, who both are immunized
+		against a type, and where either of one of them or their common type starts
+		with 'f' or 'g', and the two other nodes start with another letter.
+		'''
+
+		xor_exp = condition or Neo4jEquivalents.names_xor()
+		return f'''
+		SELECT DISTINCT p1.name, p2.name, type.name
+		FROM pokemon_effectiveness pe1
+		JOIN pokemon_effectiveness pe2 ON
+			pe1.pokemon_id < pe2.pokemon_id
+			AND pe1.sensibility @> ARRAY[0]::REAL[]
+			AND pe2.sensibility @> ARRAY[0]::REAL[]
+		JOIN pokemon_type pt1 ON
+			pt1.pokemon_id = pe1.pokemon_id
+		JOIN pokemon_type pt2 ON
+			pt2.pokemon_id = pe2.pokemon_id
+			AND pt1.type_id = pt2.type_id
+		JOIN type ON
+			type.type_id = pt1.type_id
+			AND type.type_id = pt2.type_id
+		JOIN pokemon p1 ON
+			p1.pokedex_id = pe1.pokemon_id
+		JOIN pokemon p2 ON
+			p2.pokedex_id = pe2.pokemon_id
+		WHERE {xor_exp}
+		ORDER BY p1.name, p2.name
+		'''
+
+	@staticmethod
+	def data_and_topo() -> str:
+		'''
+		Get paths such as there is a loop of 3 or 4 Pokemon strong against each
+		other, and where the first is not strong against the last.
+		'''
+
+		create_pokemon_strong = ArrayEquivalents.create_pokemon_strong()
+		populate_pokemon_strong = ArrayEquivalents.__populate_pokemon_strong()
+		recursive_query = ArrayEquivalents.data_and_topo_paths()
+		return f'''
+		{create_pokemon_strong}
+		{populate_pokemon_strong}
+		{recursive_query}
+		'''
+
+	@staticmethod
+	def __populate_pokemon_strong() -> str:
+		return f'''
+		INSERT INTO pokemon_strong
+		SELECT DISTINCT pe.pokemon_id pid_1, pt.pokemon_id pid_2
+		FROM pokemon_effectiveness pe
+		CROSS JOIN LATERAL unnest(
+			pe.sensibility, {ArrayEquivalents.type_names()}
+		) AS e(sensibility, type)
+		JOIN type ON type.name = e.type
+		JOIN pokemon_type pt ON
+			type.type_id = pt.type_id
+			AND pe.pokemon_id <> pt.pokemon_id
+		WHERE e.sensibility IN (0.25, 0.5);
+		'''
+
+# Neo4j equivalents of each layout
+EQUIVALENTS = {
+	'plain': Neo4jEquivalents,
+	'generation': Neo4jEquivalents,
+	'hash': Neo4jEquivalents,
+	'array': ArrayEquivalents
+}
+
+class StatsQueries:
+	'''
+	Queries answered from the type aggregates computed at import (see
+	typestats.py), in time proportional to the number of types instead of
+	Pokemon. All methods should be static and return a string.
+	'''
+
+	@staticmethod
+	def collect_unwind() -> str:
+		'''
+		Same as Neo4jEquivalents.collect_unwind, from type_ability_stats.
+		'''
+
+		return '''
+		SELECT ability, weak FROM type_ability_stats
+		WHERE type = 'psychic'
+		ORDER BY ability
+		'''
+
+	@staticmethod
+	def type_stats() -> str:
+		'''
+		Numbers of Pokemon weak, resistant and immune to each type.
+		'''
+
+		return 'SELECT type, weak, resistant, immune FROM type_stats ORDER BY type'
+
+class PrefixQueries:
+	'''
+	Rewrites of the Neo4j equivalents filtering names by prefix, so that the
+	planner can use the indexes of the prefix profile (see PREFIX_INDEXES).
+	LIKE 'A%' (reduce) needs none, but SIMILAR TO '[fgFG]%' has no fixed
+	prefix, and the exclusive or of predicate_function over three names can
+	only be checked once they are all joined. All methods are static and
+	return a string.
+	'''
+
+	@staticmethod
+	def starts_with(column: str, prefixes: str = 'fgFG') -> str:
+		'''
+		Condition equivalent to column SIMILAR TO '[<prefixes>]%', as LIKE
+		patterns with a fixed prefix each.
+		'''
+
+		return '(' + ' OR '.join(f"{column} LIKE '{p}%'" for p in prefixes) + ')'
+
+	@staticmethod
+	def predicate_function(equivalents = Neo4jEquivalents) -> str:
+		'''
+		predicate_function of equivalents as a union of three branches, one per
+		name starting with 'f' or 'g' (p1, p2 or type), so that each branch
+		starts from the Pokemon (or types) whose name does, found by prefix.
+		'''
+
+		names = ['p1.name', 'p2.name', 'type.name']
+		branches = [
+			equivalents.predicate_function(' AND '.join(
+				PrefixQueries.starts_with(n) if n == name
+				else f'NOT {PrefixQueries.starts_with(n)}'
+				for n in names
+			))
+			for name in names
+		]
+		return ' UNION '.join(f'({b})' for b in branches) + ' ORDER BY 1, 2'
+
+class GenerationQueries:
+	'''
+	Queries restricted to the Pokemon of one generation, given as parameter,
+	to measure partition pruning. All methods are static and return a string,
+	for a layout: in the generation layout, joins also match generations, so
+	that the filter prunes the partitions of every joined table.
+	'''
+
+	@staticmethod
+	def same_generation(layout: str, left: str, right: str) -> str:
+		if layout != 'generation': return ''
+		return f' AND {left}.generation = {right}.generation'
+
+	@staticmethod
+	def weaknesses(layout: str = 'plain') -> str:
+		'''
+		Count the Pokemon of a generation (very) weak against each type.
+		'''
+
+		if layout == 'array':
+			return f'''
+			SELECT e.type, COUNT(*) FROM pokemon_generation pg
+			JOIN pokemon_effectiveness pe ON pe.pokemon_id = pg.pokemon_id
+			CROSS JOIN LATERAL unnest(
+				pe.sensibility, {ArrayEquivalents.type_names()}
+			) AS e(sensibility, type)
+			WHERE pg.generation = %s
+				AND e.sensibility IN (2, 4)
+			GROUP BY e.type
+			ORDER BY e.type
+			'''
+		same = GenerationQueries.same_generation(layout, 'ps', 'pg')
+		return f'''
+		SELECT type.name, COUNT(*) FROM pokemon_generation pg
+		JOIN pokemon_sensibility ps ON
+			ps.pokemon_id = pg.pokemon_id{same}
+			AND ps.sensibility IN (2, 4)
+		JOIN type ON type.type_id = ps.type_id
+		WHERE pg.generation = %s
+		GROUP BY type.name
+		ORDER BY type.name
+		'''
+
+	@staticmethod
+	def attack_by_ability(layout: str = 'plain') -> str:
+		'''
+		Average attack of the Pokemon of a generation having each ability.
+		'''
+
+		same_pa = GenerationQueries.same_generation(layout, 'pa', 'pg')
+		same_pbs = GenerationQueries.same_generation(layout, 'pbs', 'pg')
+		return f'''
+		SELECT ability.name, AVG(attack) FROM pokemon_generation pg
+		JOIN pokemon_ability pa ON
+			pa.pokemon_id = pg.pokemon_id{same_pa}
+		JOIN pokemon_battle_stats pbs ON
+			pbs.pokemon_id = pg.pokemon_id{same_pbs}
+		JOIN ability ON ability.ability_id = pa.ability_id
+		WHERE pg.generation = %s
+		GROUP BY ability.name
+		ORDER BY ability.name
+		'''
+
+def executeQueries(psql, run_topo, strong = None, **output):
+	equivalents = psql.equivalents()
+	print("negative filter")
+	run_query(
+		psql, equivalents.negative_filter(),
+		name = "negative filter", **output
+	)
+	print()
 
 	print("optional match")
-	run_query(psql, Neo4jEquivalents.optional_match())
+	run_query(
+		psql, equivalents.optional_match(),
+		name = "optional match", **output
+	)
 	print()
 	
 	print("collect unwind")
-	run_query(psql, Neo4jEquivalents.collect_unwind())
+	run_query(
+		psql, equivalents.collect_unwind(),
+		name = "collect unwind", **output
+	)
+	print()
+
+	print("collect unwind (type aggregates)")
+	run_query(
+		psql, StatsQueries.collect_unwind(),
+		name = "collect unwind stats", **output
+	)
 	print()
 
 	print("reduce")
-	run_query(psql, Neo4jEquivalents.reduce())
+	run_query(
+		psql, equivalents.reduce(),
+		name = "reduce", **output
+	)
 	print()
 
 	print("with filter aggregate")
-	run_query(psql, Neo4jEquivalents.with_filter_aggregate())
+	run_query(
+		psql, equivalents.with_filter_aggregate(),
+		name = "with filter aggregate", **output
+	)
 	print()
 
 	print("predicate function")
-	run_query(psql, Neo4jEquivalents.predicate_function())
+	run_query(
+		psql, equivalents.predicate_function(),
+		name = "predicate function", **output
+	)
 	print()
 
+	if psql.indexes == 'prefix':
+		print("predicate function (prefix rewrite)")
+		run_query(
+			psql, PrefixQueries.predicate_function(equivalents),
+			name = "predicate function prefix", **output
+		)
+		print()
+
 	print("post union processing")
-	run_query(psql, Neo4jEquivalents.post_union_processing())
+	run_query(
+		psql, equivalents.post_union_processing(),
+		name = "post union processing", **output
+	)
+	print()
+
+	print("type stats")
+	run_query(
+		psql, StatsQueries.type_stats(),
+		name = "type stats", **output
+	)
 	print()
 
 	if run_topo:
 		print("data and topo")
-		run_query(psql, Neo4jEquivalents.data_and_topo())
+		if strong is not None:
+			psql.load_strong_against(strong)
+			run_query(
+				psql, equivalents.data_and_topo_paths(),
+				name = "data and topo", **output
+			)
+		else:
+			run_query(
+				psql, equivalents.data_and_topo(), mutation = True,
+				name = "data and topo", **output
+			)
 		print()
 
-def run_query(psql, f):
-    with psql.conn.cursor() as cursor:
-     cursor.execute(f)
-     for row in cursor.fetchall():
-      print(row)
+def benchmark_cycles(psql, datafile: str, limit: int = 30):
+	'''
+	Compares the time taken by the topo query and by the in-process cycle finder
+	to return their first paths, and checks the paths returned by the database.
+	'''
+
+	engine = PokemonEngine.from_csv(datafile)
+	finder = cycles.CycleFinder.from_engine(engine)
+	names = dict(zip(engine.pokedex.tolist(), engine.names))
+	psql.load_strong_against(finder.strong)
+	start = time.perf_counter()
+	rows = psql.fetch(psql.equivalents().data_and_topo_paths(limit))
+	db_time = (time.perf_counter() - start) * 1000
+	_, local_time, count = cycles.benchmark(finder, limit, 1)
+	valid = sum(
+		finder.is_path([names[p] for p in path]) for _, _, path in rows
+	)
+	print(f'First {limit} paths of the topo query (ms):')
+	print(f'{"PostgreSQL":<24}{db_time:.2f} ({len(rows)} paths, {valid} valid)')
+	print(f'{"In-process":<24}{local_time:.2f} ({count} paths)')
+
+def median_latency(psql, query: str, params, runs: int) -> float:
+	'''
+	Median latency of a query in ms, after a first run warming up caches,
+	bypassing the result cache.
+	'''
+
+	with psql.conn.cursor() as cursor:
+		cursor.execute(query, params)
+		cursor.fetchall()
+		times = []
+		for _ in range(runs):
+			start = time.perf_counter()
+			cursor.execute(query, params)
+			cursor.fetchall()
+			times.append((time.perf_counter() - start) * 1000)
+	return statistics.median(times)
+
+def benchmark_layouts(psql, datafile: str, scale: int = 1, runs: int = 5,
+											generation: int = 1):
+	'''
+	Compares import time, size and query latency of all table layouts, on
+	full-scan queries and on queries filtered by generation, with the number
+	of relations (tables or partitions) each query scanned and of parallel
+	workers it launched. Tables are populated again with their original
+	layout afterwards.
+
+	Args:
+		datafile: csv file or snapshot to populate tables with.
+		scale: scale factor of the dataset (see dataset.scale_rows): parallel
+			plans are only chosen for large enough tables.
+		runs: number of measured runs of each query.
+		generation: generation the filtered queries are restricted to.
+	'''
+
+	layout = psql.layout
+	full_scans = [
+		'optional_match', 'collect_unwind', 'reduce', 'with_filter_aggregate',
+		'predicate_function'
+	]
+	filtered = ['weaknesses', 'attack_by_ability']
+	results = {}
+	with tempfile.TemporaryDirectory() as tmp:
+		path = datafile
+		if scale > 1:
+			path = os.path.join(tmp, f'scale{scale}.snap')
+			write_snapshot(dataset.scale_rows(dataset.read_rows(datafile), scale), path)
+		for l in LAYOUTS:
+			psql.layout = l
+			psql.configure()
+			start = time.perf_counter()
+			psql.load(path, force = True)
+			import_time = time.perf_counter() - start
+			queries = {
+				name: (getattr(EQUIVALENTS[l], name)(), None) for name in full_scans
+			}
+			queries.update({
+				f'{name} (gen {generation})': (
+					getattr(GenerationQueries, name)(l), (generation,)
+				) for name in filtered
+			})
+			latencies = {
+				name: median_latency(psql, query, params, runs)
+				for name, (query, params) in queries.items()
+			}
+			profiles = {
+				name: psql.profile(query, params)
+				for name, (query, params) in queries.items()
+			}
+			results[l] = (import_time, psql.store_size(), latencies, profiles)
+	psql.layout = layout
+	psql.configure()
+	psql.load(datafile, force = True)
+
+	print(f'Comparison of table layouts (dataset x{scale}):')
+	print(f'{"Layout":<24}{"Import (s)":<16}Size (MiB)')
+	for l, (import_time, size, _, _) in results.items():
+		print(f'{l:<24}{import_time:<16.2f}{size / (1 << 20):.2f}')
+	print()
+	print('Median query latency (ms), relations scanned / workers launched:')
+	print(f'{"Query":<32}' + ''.join(f'{l:<24}' for l in results))
+	for name in results[LAYOUTS[0]][2]:
+		print(f'{name:<32}' + ''.join(
+			f'{res[2][name]:<10.2f}{res[3][name]["relations_scanned"]:>5} / '
+			+ f'{res[3][name]["workers_launched"]:<6}'
+			for res in results.values()
+		))
+
+def benchmark_indexes(psql, datafile: str, scale: int = 1, runs: int = 5):
+	'''
+	Compares the latency of the queries filtering names by prefix (reduce and
+	predicate_function) and of the rewrite of predicate_function (see
+	PrefixQueries) in each index profile, with the indexes each query scanned.
+	The original dataset and profile are restored afterwards.
+
+	Args:
+		datafile: csv file or snapshot to populate tables with.
+		scale: scale factor of the dataset (see dataset.scale_rows): index
+			scans are only chosen for large enough tables.
+		runs: number of measured runs of each query.
+	'''
+
+	indexes = psql.indexes
+	equivalents = psql.equivalents()
+	queries = {
+		'reduce': equivalents.reduce(),
+		'predicate_function': equivalents.predicate_function(),
+		'predicate_function (prefix)': PrefixQueries.predicate_function(equivalents)
+	}
+	results = {}
+	with tempfile.TemporaryDirectory() as tmp:
+		path = datafile
+		if scale > 1:
+			path = os.path.join(tmp, f'scale{scale}.snap')
+			write_snapshot(dataset.scale_rows(dataset.read_rows(datafile), scale), path)
+		for profile in INDEX_PROFILES:
+			psql.indexes = profile
+			psql.load(path)
+			results[profile] = {
+				name: (
+					median_latency(psql, query, None, runs),
+					psql.profile(query)['indexes_used']
+				)
+				for name, query in queries.items()
+			}
+	psql.indexes = indexes
+	psql.load(datafile)
+
+	print(f'Comparison of index profiles (dataset x{scale}, {psql.layout} layout):')
+	print('Median query latency (ms):')
+	print(f'{"Query":<32}' + ''.join(f'{p:<16}' for p in results))
+	for name in queries:
+		print(f'{name:<32}' + ''.join(
+			f'{res[name][0]:<16.2f}' for res in results.values()
+		))
+	print()
+	print('Indexes scanned:')
+	for profile, res in results.items():
+		for name, (_, used) in res.items():
+			print(f'{profile:<16}{name:<32}' + (', '.join(used) or 'none'))
+
+def run_query(psql, f, mutation = False, name = 'query', sink = None,
+							streaming = False, itersize = None):
+	'''
+	Run a query and write its rows to a sink, printed if none is given. When
+	streaming, read-only queries write rows as they arrive instead of fetching
+	them all first (see PostgresQueries.batches). The time spent writing rows
+	is recorded apart from query time, as the output_ms counter of the span,
+	and printed after the rows if a sink is given.
+	'''
+
+	output = sink or sinks.PrintSink()
+	rows, elapsed = output.rows, output.elapsed
+	with tracing.span(name) as span:
+		start = time.perf_counter()
+		if mutation:
+			res = [(None, psql.execute(f))]
+		elif streaming or itersize:
+			res = psql.batches(f, itersize = itersize)
+		else:
+			res = [psql.fetch(f, columns = True)]
+		started = False
+		for columns, batch in res:
+			if not batch: continue
+			if not started:
+				# cached results have no column names
+				columns = columns or [f'column{i + 1}' for i in range(len(batch[0]))]
+				output.start(name, columns)
+				started = True
+			output.write(batch)
+		if not started: output.start(name, [])
+		output.end()
+		total = (time.perf_counter() - start) * 1000
+		rows, elapsed = output.rows - rows, (output.elapsed - elapsed) / 1e6
+		span.set_rows(rows)
+		span.add_counters({'output_ms': elapsed})
+	if sink is not None:
+		print(f'{rows} rows, query: {total - elapsed:.2f} ms, output: {elapsed:.2f} ms')
+
+def load_test(connect, option: str = 'closed:1,2,4,8,16', weights: dict = None,
+							equivalents = Neo4jEquivalents):
+	'''
+	Drives a mix of the Neo4j equivalents from concurrent connections, and
+	prints throughput and latency at each load level.
+
+	Args:
+		connect: function returning a new connection to the database.
+		option: load mode, levels and duration (see loadgen.parse_option).
+		weights: weight of each query in the mix (default: 1 each).
+		equivalents: class of the queries, for the layout of the tables.
+	'''
+
+	names = [
+		'negative_filter', 'optional_match', 'collect_unwind', 'reduce',
+		'with_filter_aggregate', 'predicate_function', 'post_union_processing'
+	]
+	queries = {name: (getattr(equivalents, name)(), None) for name in names}
+	mode, levels, duration = loadgen.parse_option(option)
+	generator = loadgen.LoadGenerator(connect, queries, weights, 'execute')
+	loadgen.print_curve(generator.curve(mode, levels, duration))
+
+def plan_nodes(plan: dict) -> list:
+	'''
+	All nodes of an execution plan in JSON format.
+	'''
+
+	return [plan] + [
+		node for child in plan.get('Plans', []) for node in plan_nodes(child)
+	]
+
+def cursor_counters(cursor) -> dict:
+	'''
+	Server counters of the last statement of a cursor: number of rows it
+	affected or returned.
+	'''
+
+	return {'rowcount': cursor.rowcount} if cursor.rowcount >= 0 else {}
 
 if __name__ == '__main__':
 	try:
@@ -653,11 +1955,68 @@ if __name__ == '__main__':
 		database = argv[argv.index('-d') + 1] if '-d' in argv else 'bdspe_ng_ss'
 		host = argv[argv.index('-h') + 1] if '-h' in argv else 'localhost'
 		datafile = argv[argv.index('-f') + 1] if '-f' in argv else 'pokemon.csv'
-		psql = PostgresQueries(user, password, database, host, datafile)
+		force_import = True if '-F' in argv else False
+		delta_import = True if '-D' in argv else False
+		layout = argv[argv.index('-l') + 1] if '-l' in argv else 'plain'
+		if layout not in LAYOUTS:
+			print(f'Unknown layout: {layout} (' + ', '.join(LAYOUTS) + ')')
+			exit(1)
+		indexes = argv[argv.index('-i') + 1] if '-i' in argv else 'default'
+		if indexes not in INDEX_PROFILES:
+			print(f'Unknown index profile: {indexes} (' + ', '.join(INDEX_PROFILES) + ')')
+			exit(1)
+		memory = True if '-M' in argv else False
+		if '-T' in argv or memory:
+			i = argv.index('-T') + 1 if '-T' in argv else len(argv)
+			option = argv[i] if i < len(argv) and not argv[i].startswith('-') else None
+			tracing.set_tracer(tracing.from_option(option, memory))
+		cache = None
+		if '-c' in argv:
+			i = argv.index('-c') + 1
+			path = argv[i] if i < len(argv) and not argv[i].startswith('-') else None
+			cache = ResultCache(path)
+		recorder = replay.from_option(argv[argv.index('-R') + 1]) if '-R' in argv else None
+		connect = psycopg.connect if recorder is None else recorder.postgres_connect
+		psql = PostgresQueries(user, password, database, host, datafile,
+													 force_import, delta_import, cache, connect, layout,
+													 indexes)
 
 		run_topo = True if 'topo' in argv else False
 
-		executeQueries(psql, run_topo)
+		strong = StrongAgainst.from_csv(datafile) if '-s' in argv else None
+
+		output = {'streaming': '-S' in argv}
+		if '-S' in argv:
+			i = argv.index('-S') + 1
+			if i < len(argv) and argv[i].isdigit(): output['itersize'] = int(argv[i])
+		if '-o' in argv:
+			i = argv.index('-o') + 1
+			option = argv[i] if i < len(argv) and not argv[i].startswith('-') else None
+			output['sink'] = sinks.from_option(option)
+
+		if 'cycles' in argv:
+			benchmark_cycles(psql, datafile)
+		elif 'layouts' in argv:
+			benchmark_layouts(
+				psql, datafile,
+				int(argv[argv.index('-x') + 1]) if '-x' in argv else 1
+			)
+			if cache is not None: cache.invalidate()
+		elif 'indexes' in argv:
+			benchmark_indexes(
+				psql, datafile,
+				int(argv[argv.index('-x') + 1]) if '-x' in argv else 1
+			)
+		elif 'load' in argv:
+			load_test(
+				lambda: connect(host = host, user = user, password = password,
+												dbname = database, autocommit = True),
+				argv[argv.index('-L') + 1] if '-L' in argv else 'closed:1,2,4,8,16',
+				loadgen.parse_weights(argv[argv.index('-W') + 1]) if '-W' in argv else None,
+				psql.equivalents()
+			)
+		else:
+			executeQueries(psql, run_topo, strong, **output)
 		
 	except psycopg.Error as e:
 		print(f'Error: {e}')
@@ -665,5 +2024,37 @@ if __name__ == '__main__':
 					+ ' -d <database> -h <host> -f <datafile> [OPTIONS]')
 		print('OPTIONS:')
 		print('   topo: run the last query (can be very long to run)')
+		print('   -F: populate tables even if the dataset is unchanged')
+		print('   -D: only update the Pokemon that changed since the last import')
+		print('   -c [file]: cache query results, persisted in file if given')
+		print('   -s: compute pokemon_strong in process and copy it (with topo)')
+		print('   cycles: compare the topo query with the in-process cycle finder')
+		print('   -l [layout]: layout of the Pokemon tables (' + ', '.join(LAYOUTS)
+					+ '; default: plain)')
+		print('   layouts: compare table layouts (import, size, latency, pruning)')
+		print('   -i [profile]: index profile (' + ', '.join(INDEX_PROFILES)
+					+ '; default: default)')
+		print('   indexes: compare index profiles on the name prefix queries')
+		print('   -x [scale]: scale factor of the dataset compared by layouts'
+					+ ' or indexes (default: 1)')
+		print('   load: run a mix of the queries under concurrent load')
+		print('   -L [mode:levels[:seconds]]: load (closed:1,2,4,8,16: numbers of'
+					+ ' connections; open:10,50,100: arrival rates in queries per second)')
+		print('   -W [name=weight,...]: weights of the queries under load')
+		print('   -R record:<file>: record query results to file')
+		print('   -R replay:<file>[:latency]: replay recorded results without a'
+					+ ' database, waiting latency ms (or recorded) per query')
+		print('   -T [exporter]: trace phases and queries (console, jsonl:<file>'
+					+ ' or otlp:<file>)')
+		print('   -M: trace the peak client memory of phases and queries')
+		print('   -S [itersize]: write rows as they are streamed instead of fetching'
+					+ ' them all, through a server-side cursor if itersize is given')
+		print('   -o [sink]: write rows to a sink (print, null, csv:<directory> or'
+					+ ' jsonl:<directory>) and time output apart')
 		exit(1)
-	psql.close()
\ No newline at end of file
+	if cache is not None:
+		print(cache.stats())
+		cache.save()
+	psql.close()
+	if recorder is not None: recorder.close()
+	tracing.tracer.finish()
\ No newline at end of file
@@ -1,8 +1,12 @@
 import csv
 from sys import argv
+import dataset
+import snapshot
 
 if __name__ == '__main__':
-	argv = argv[1:]
+	# -s also writes a snapshot of the preprocessed file (see snapshot.py)
+	write_snapshot = '-s' in argv
+	argv = [arg for arg in argv[1:] if arg != '-s']
 	if len(argv) != 1: argv = ['pokemon.csv']
 	
 	with open(argv[0], 'r') as f:
@@ -33,4 +37,12 @@ if __name__ == '__main__':
 	with open(argv[0], 'w') as f:
 		data = csv.DictWriter(f, reader.fieldnames)
 		data.writeheader()
-		data.writerows(new_rows)
\ No newline at end of file
+		data.writerows(new_rows)
+	if write_snapshot:
+		path = argv[0].rsplit('.', 1)[0] + snapshot.SUFFIX
+		snapshot.write_snapshot(
+			dataset.read_rows(argv[0]),
+			path,
+			dataset.fingerprint(argv[0], snapshot.SNAPSHOT_VERSION)
+		)
+		print(f'Snapshot written to {path}')
\ No newline at end of file
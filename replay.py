@@ -0,0 +1,416 @@
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+from types import SimpleNamespace
+
+# Column of a replayed Postgres result, as in cursor.description
+Column = namedtuple('Column', ['name'])
+
+def key(backend: str, query: str, params = None) -> str:
+	'''
+	Key of a recorded query: whitespace is normalized as in ResultCache.
+	'''
+
+	data = json.dumps(
+		[backend, ' '.join(query.split()), params or {}], sort_keys = True, default = str
+	)
+	return hashlib.sha256(data.encode()).hexdigest()
+
+def plain(value):
+	'''
+	Picklable copy of a Neo4j value: nodes and relationships become dicts of
+	their properties, paths lists of nodes.
+	'''
+
+	if isinstance(value, (list, tuple)): return [plain(v) for v in value]
+	if isinstance(value, dict): return {k: plain(v) for k, v in value.items()}
+	if hasattr(value, 'nodes') and hasattr(value, 'relationships'):
+		return [plain(node) for node in value.nodes]
+	if hasattr(value, 'labels') or hasattr(value, 'start_node'):
+		return dict(value.items())
+	return value
+
+class Recorder:
+	'''
+	Records the results and summaries of every query run through its drivers
+	and connections, wrapping the real ones, and appends them to a file as they
+	come. Results are buffered fully while recording.
+	'''
+
+	def __init__(self, path: str):
+		'''
+		Args:
+			path: file the recording is written to.
+		'''
+
+		self.path = path
+		self.file = open(path, 'wb')
+		self.lock = threading.Lock()
+
+	def record(self, backend: str, query: str, params, entry: dict):
+		entry['key'] = key(backend, query, params)
+		entry['query_key'] = key(backend, query)
+		with self.lock:
+			pickle.dump(entry, self.file)
+
+	def neo4j_driver(self, uri: str, **kwargs):
+		'''
+		Real driver, as GraphDatabase.driver, whose sessions record queries.
+		'''
+
+		from neo4j import GraphDatabase
+		return RecordingDriver(self, GraphDatabase.driver(uri, **kwargs))
+
+	def postgres_connect(self, *args, **kwargs):
+		'''
+		Real connection, as psycopg.connect, whose cursors record queries.
+		'''
+
+		import psycopg
+		return RecordingConnection(self, psycopg.connect(*args, **kwargs))
+
+	def close(self):
+		self.file.close()
+
+class Replayer:
+	'''
+	Serves recorded results back, through stand-in drivers and connections,
+	without any database. Queries are looked up by text and parameters, then by
+	text only; repeated queries replay their recorded results in turn.
+	'''
+
+	def __init__(self, path: str, latency = 0):
+		'''
+		Args:
+			path: file of a recording.
+			latency: time waited before each result: a number of ms, or
+				'recorded' for the time the query took when recorded.
+		'''
+
+		self.latency = latency
+		self.entries = {}
+		self.turns = {}
+		self.lock = threading.Lock()
+		with open(path, 'rb') as f:
+			while True:
+				try:
+					entry = pickle.load(f)
+				except EOFError:
+					break
+				for k in [entry['key'], entry['query_key']]:
+					self.entries.setdefault(k, []).append(entry)
+
+	def next(self, backend: str, query: str, params = None) -> dict:
+		for k in [key(backend, query, params), key(backend, query)]:
+			if k in self.entries:
+				with self.lock:
+					turn = self.turns.get(k, 0)
+					self.turns[k] = turn + 1
+				entries = self.entries[k]
+				entry = entries[turn % len(entries)]
+				break
+		else:
+			raise LookupError(f'Query not recorded: {" ".join(query.split())[:80]}')
+		wait = entry['elapsed_ms'] if self.latency == 'recorded' else self.latency
+		if wait: time.sleep(wait / 1000)
+		return entry
+
+	def neo4j_driver(self, uri: str, **kwargs):
+		return ReplayDriver(self)
+
+	def postgres_connect(self, *args, **kwargs):
+		return ReplayConnection(self)
+
+	def close(self):
+		pass
+
+class ReplayRecord(tuple):
+	'''
+	Record of a replayed result, used as a neo4j Record.
+	'''
+
+	def __new__(cls, keys: list, values: list):
+		record = super().__new__(cls, values)
+		record._keys = keys
+		return record
+
+	def __getitem__(self, index):
+		if isinstance(index, str): index = self._keys.index(index)
+		return super().__getitem__(index)
+
+	def keys(self) -> list:
+		return list(self._keys)
+
+	def values(self) -> list:
+		return list(self)
+
+	def data(self) -> dict:
+		return dict(zip(self._keys, self))
+
+class ReplayResult:
+	'''
+	Result of a replayed (or recorded) Neo4j query.
+	'''
+
+	def __init__(self, entry: dict):
+		self.records = [ReplayRecord(entry['keys'], values) for values in entry['records']]
+		summary = entry['summary']
+		self.summary = SimpleNamespace(
+			counters = SimpleNamespace(**summary['counters']),
+			result_available_after = summary['result_available_after'],
+			result_consumed_after = summary['result_consumed_after'],
+			plan = summary['plan'],
+			profile = summary['profile']
+		)
+
+	def __iter__(self):
+		return iter(self.records)
+
+	def keys(self) -> list:
+		return self.records[0].keys() if self.records else []
+
+	def single(self):
+		return self.records[0] if self.records else None
+
+	def data(self) -> list:
+		return [record.data() for record in self.records]
+
+	def consume(self):
+		return self.summary
+
+class ReplaySession:
+	def __init__(self, replayer: Replayer):
+		self.replayer = replayer
+
+	def run(self, query: str, parameters: dict = None, **kwargs) -> ReplayResult:
+		params = {**(parameters or {}), **kwargs}
+		return ReplayResult(self.replayer.next('neo4j', query, params))
+
+	def close(self):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+class ReplayDriver:
+	def __init__(self, replayer: Replayer):
+		self.replayer = replayer
+
+	def session(self, **kwargs) -> ReplaySession:
+		return ReplaySession(self.replayer)
+
+	def verify_connectivity(self):
+		pass
+
+	def close(self):
+		pass
+
+class RecordingSession(ReplaySession):
+	'''
+	Session running queries on a real session, and recording their results.
+	'''
+
+	def __init__(self, recorder: Recorder, session):
+		self.recorder = recorder
+		self.session = session
+
+	def run(self, query: str, parameters: dict = None, **kwargs) -> ReplayResult:
+		params = {**(parameters or {}), **kwargs}
+		start = time.perf_counter()
+		res = self.session.run(query, params)
+		records = [plain(r.values()) for r in res]
+		keys = res.keys()
+		summary = res.consume()
+		entry = {
+			'keys': list(keys),
+			'records': records,
+			'summary': {
+				'counters': {
+					k: v for k, v in vars(summary.counters).items() if not k.startswith('_')
+				},
+				'result_available_after': summary.result_available_after,
+				'result_consumed_after': summary.result_consumed_after,
+				'plan': summary.plan,
+				'profile': summary.profile
+			},
+			'elapsed_ms': (time.perf_counter() - start) * 1000
+		}
+		self.recorder.record('neo4j', query, params, entry)
+		return ReplayResult(entry)
+
+	def close(self):
+		self.session.close()
+
+class RecordingDriver:
+	def __init__(self, recorder: Recorder, driver):
+		self.recorder = recorder
+		self.driver = driver
+
+	def session(self, **kwargs) -> RecordingSession:
+		return RecordingSession(self.recorder, self.driver.session(**kwargs))
+
+	def verify_connectivity(self):
+		self.driver.verify_connectivity()
+
+	def close(self):
+		self.driver.close()
+
+class ReplayCopy:
+	'''
+	COPY of a replayed cursor, discarding rows.
+	'''
+
+	def write_row(self, row):
+		pass
+
+	def write(self, data):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		pass
+
+class ReplayCursor:
+	'''
+	Cursor of a replayed (or recorded) Postgres connection, serving the rows
+	of each executed query.
+	'''
+
+	def __init__(self, replayer: Replayer = None):
+		self.replayer = replayer
+		self.description = None
+		self.rowcount = -1
+		self.rows = []
+		self.position = 0
+		self.itersize = 100
+
+	def load(self, entry: dict):
+		self.description = (
+			None if entry['columns'] is None
+			else [Column(name) for name in entry['columns']]
+		)
+		self.rowcount = entry['rowcount']
+		self.rows = entry['rows']
+		self.position = 0
+
+	def execute(self, query: str, params = None):
+		self.load(self.replayer.next('postgres', query, params))
+		return self
+
+	def stream(self, query: str, params = None):
+		self.execute(query, params)
+		yield from self
+
+	def copy(self, statement: str):
+		return ReplayCopy()
+
+	def fetchone(self):
+		rows = self.fetchmany(1)
+		return rows[0] if rows else None
+
+	def fetchmany(self, size: int = None) -> list:
+		size = self.itersize if size is None else size
+		rows = self.rows[self.position:self.position + size]
+		self.position += len(rows)
+		return rows
+
+	def fetchall(self) -> list:
+		rows = self.rows[self.position:]
+		self.position = len(self.rows)
+		return rows
+
+	def __iter__(self):
+		while (row := self.fetchone()) is not None:
+			yield row
+
+	def close(self):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+class ReplayConnection:
+	def __init__(self, replayer: Replayer):
+		self.replayer = replayer
+
+	def cursor(self, name: str = '', **kwargs) -> ReplayCursor:
+		return ReplayCursor(self.replayer)
+
+	def execute(self, query: str, params = None) -> ReplayCursor:
+		return self.cursor().execute(query, params)
+
+	def transaction(self):
+		return nullcontext()
+
+	def close(self):
+		pass
+
+class RecordingCursor(ReplayCursor):
+	'''
+	Cursor running queries on a real cursor, and recording their rows.
+	'''
+
+	def __init__(self, recorder: Recorder, cursor):
+		super().__init__()
+		self.recorder = recorder
+		self.cursor = cursor
+
+	def execute(self, query: str, params = None):
+		start = time.perf_counter()
+		self.cursor.execute(query, params)
+		description = self.cursor.description
+		entry = {
+			'columns': None if description is None else [c.name for c in description],
+			'rows': self.cursor.fetchall() if description is not None else [],
+			'rowcount': self.cursor.rowcount,
+			'elapsed_ms': (time.perf_counter() - start) * 1000
+		}
+		self.recorder.record('postgres', query, params, entry)
+		self.load(entry)
+		return self
+
+	def copy(self, statement: str):
+		return self.cursor.copy(statement)
+
+	def close(self):
+		self.cursor.close()
+
+class RecordingConnection(ReplayConnection):
+	def __init__(self, recorder: Recorder, conn):
+		self.recorder = recorder
+		self.conn = conn
+
+	def cursor(self, name: str = '', **kwargs) -> RecordingCursor:
+		return RecordingCursor(self.recorder, self.conn.cursor(name, **kwargs))
+
+	def transaction(self):
+		return self.conn.transaction()
+
+	def close(self):
+		self.conn.close()
+
+def from_option(option: str):
+	'''
+	Recorder or replayer for a command line option: 'record:<file>', or
+	'replay:<file>[:<latency>]' where latency is a number of ms or 'recorded'.
+	'''
+
+	kind, _, rest = option.partition(':')
+	if kind == 'record': return Recorder(rest or 'recording.pickle')
+	if kind == 'replay':
+		path, _, latency = rest.partition(':')
+		if latency and latency != 'recorded': latency = float(latency)
+		return Replayer(path or 'recording.pickle', latency or 0)
+	raise ValueError(f'Unknown record option: {kind}')
@@ -0,0 +1,247 @@
+import csv
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from decimal import Decimal
+from itertools import chain, zip_longest
+from sys import argv
+
+# Marks the end of the shorter stream in lockstep comparisons
+_END = object()
+
+def normalize_row(row, sort_lists: bool = True, digits: int = None) -> tuple:
+	'''
+	Hashable form of a row, so that rows returned by different queries or
+	backends compare equal: lists become tuples (sorted, unless the order of
+	collected values matters), decimals become floats, floats are rounded to
+	digits if given, and integral floats become integers.
+	'''
+
+	def value(v):
+		if isinstance(v, (list, tuple)):
+			items = [value(item) for item in v]
+			return tuple(sorted(items, key = repr) if sort_lists else items)
+		if isinstance(v, Decimal): v = float(v)
+		if isinstance(v, float):
+			if digits is not None: v = round(v, digits)
+			if v.is_integer(): return int(v)
+		return v
+
+	return tuple(value(v) for v in row)
+
+def row_hash(row: tuple) -> int:
+	'''
+	Hash of a normalized row, stable across processes (unlike hash()).
+	'''
+
+	digest = hashlib.blake2b(repr(row).encode(), digest_size = 8).digest()
+	return int.from_bytes(digest, 'little')
+
+class Diff:
+	'''
+	Outcome of the comparison of two results: number of rows on each side,
+	number of rows found on one side only (counting duplicates), and the first
+	of these rows, with their position in their result.
+	'''
+
+	def __init__(self, limit: int = 10):
+		'''
+		Args:
+			limit: number of differing rows kept on each side.
+		'''
+
+		self.limit = limit
+		self.rows = [0, 0]
+		self.only = [0, 0]
+		self.examples = [[], []]
+
+	@property
+	def equal(self) -> bool:
+		return self.only == [0, 0]
+
+	def add(self, side: int, row: tuple, position: int, count: int = 1):
+		'''
+		Records count occurrences of a row found on one side only.
+		'''
+
+		self.only[side] += count
+		examples = self.examples[side]
+		examples.append((position, row))
+		if len(examples) > self.limit:
+			examples.sort(key = lambda example: example[0])
+			examples.pop()
+
+	def report(self, names: tuple = ('first', 'second')) -> str:
+		if self.equal: return f'Results are equal ({self.rows[0]} rows)'
+		lines = [
+			f'Results are not equal: {self.rows[0]} rows in {names[0]},'
+			+ f' {self.rows[1]} rows in {names[1]}'
+		]
+		for side in range(2):
+			if not self.only[side]: continue
+			lines.append(f'{self.only[side]} rows only in {names[side]}, first ones:')
+			for position, row in sorted(self.examples[side], key = lambda e: e[0]):
+				lines.append(f'  #{position}: {row}')
+		return '\n'.join(lines)
+
+	def __str__(self) -> str:
+		return self.report()
+
+def lockstep(left, right, limit: int = 10, window: int = 1000,
+						 buckets: int = 16, directory: str = None, **normalization) -> Diff:
+	'''
+	Compares two results sorted the same way, reading them in lockstep. Rows
+	that do not match the row at the same position wait for their match on the
+	other side, so that ties of the ORDER BY may come in any order; memory is
+	bounded by window rows per side. When it is exceeded, the waiting rows and
+	the rest of the results are compared by hashed buckets instead.
+
+	Args:
+		left, right: iterables of rows, e.g. streamed from a database.
+		limit: number of differing rows kept on each side.
+		window: maximum number of waiting rows per side.
+		buckets, directory: arguments of hashed, when the window is exceeded.
+		normalization: arguments of normalize_row.
+	'''
+
+	res = Diff(limit)
+	# waiting rows of each side: row -> [count, first position]
+	pending = ({}, {})
+	left, right = iter(left), iter(right)
+
+	def push(side: int, row: tuple, position: int):
+		other = pending[1 - side]
+		if row in other:
+			other[row][0] -= 1
+			if not other[row][0]: del other[row]
+			return
+		pending[side].setdefault(row, [0, position])[0] += 1
+
+	def waiting(side: int):
+		for row, (count, first) in pending[side].items():
+			for _ in range(count): yield first, row
+
+	for position, (a, b) in enumerate(zip_longest(left, right, fillvalue = _END)):
+		a = _END if a is _END else normalize_row(a, **normalization)
+		b = _END if b is _END else normalize_row(b, **normalization)
+		if a is not _END: res.rows[0] += 1
+		if b is not _END: res.rows[1] += 1
+		if a == b: continue
+		if a is not _END: push(0, a, position)
+		if b is not _END: push(1, b, position)
+		if max(len(pending[0]), len(pending[1])) > window:
+			_compare_hashed(res, [
+				chain(waiting(side), _numbered(res, side, rows, position + 1, normalization))
+				for side, rows in enumerate([left, right])
+			], buckets, directory)
+			return res
+	for side in range(2):
+		for row, (count, first) in pending[side].items():
+			res.add(side, row, first, count)
+	return res
+
+def hashed(left, right, limit: int = 10, buckets: int = 16,
+					 directory: str = None, **normalization) -> Diff:
+	'''
+	Compares two results whatever their order. Rows are spilled to bucket files
+	by hash, and buckets are compared one at a time, so that memory is bounded
+	by the largest bucket instead of the whole results. With a single bucket,
+	rows are counted in memory.
+
+	Args:
+		left, right: iterables of rows, e.g. streamed from a database.
+		limit: number of differing rows kept on each side.
+		buckets: number of bucket files.
+		directory: where bucket files are written (default: temporary directory).
+		normalization: arguments of normalize_row.
+	'''
+
+	res = Diff(limit)
+	_compare_hashed(res, [
+		_numbered(res, side, rows, 0, normalization)
+		for side, rows in enumerate([left, right])
+	], buckets, directory)
+	return res
+
+def _numbered(res: Diff, side: int, rows, start: int, normalization: dict):
+	for position, row in enumerate(rows, start):
+		res.rows[side] += 1
+		yield position, normalize_row(row, **normalization)
+
+def _compare_hashed(res: Diff, sides: list, buckets: int, directory: str):
+	# sides: iterables of (position, normalized row)
+	if buckets <= 1:
+		counts = {}
+		for side, rows in enumerate(sides):
+			for position, row in rows:
+				entry = counts.setdefault(row, [0, 0, position])
+				entry[side] += 1
+		_add_counts(res, counts)
+		return
+
+	with tempfile.TemporaryDirectory(dir = directory) as tmp:
+		files = [open(os.path.join(tmp, str(b)), 'wb') for b in range(buckets)]
+		try:
+			for side, rows in enumerate(sides):
+				for position, row in rows:
+					pickle.dump((side, position, row), files[row_hash(row) % buckets])
+		finally:
+			for f in files: f.close()
+		for b in range(buckets):
+			counts = {}
+			with open(os.path.join(tmp, str(b)), 'rb') as f:
+				while True:
+					try:
+						side, position, row = pickle.load(f)
+					except EOFError:
+						break
+					entry = counts.setdefault(row, [0, 0, position])
+					entry[side] += 1
+			_add_counts(res, counts)
+
+def _add_counts(res: Diff, counts: dict):
+	for row, (left, right, position) in counts.items():
+		if left > right: res.add(0, row, position, left - right)
+		if right > left: res.add(1, row, position, right - left)
+
+def diff(left, right, ordered: bool = True, **kwargs) -> Diff:
+	'''
+	Compares two results: in lockstep if they are sorted the same way, by
+	hashed buckets otherwise.
+	'''
+
+	return lockstep(left, right, **kwargs) if ordered else hashed(left, right, **kwargs)
+
+def read_rows(path: str):
+	'''
+	Generates the rows of a result file: JSON lines (one array per line) or
+	csv, with a header line.
+	'''
+
+	with open(path, newline = '') as f:
+		if path.endswith('.csv'):
+			reader = csv.reader(f)
+			next(reader, None)
+			yield from reader
+		else:
+			for line in f:
+				if line.strip(): yield json.loads(line)
+
+if __name__ == '__main__':
+	if len(argv) < 3:
+		print('Usage: python resultdiff.py <result 1> <result 2> [-u] [-n number]'
+					+ ' [-r digits]')
+		print('   -u: results are not sorted the same way (hashed buckets)')
+		print('   -n [number]: number of differing rows printed per result')
+		print('   -r [digits]: round floats to digits')
+		exit(1)
+	limit = int(argv[argv.index('-n') + 1]) if '-n' in argv else 10
+	digits = int(argv[argv.index('-r') + 1]) if '-r' in argv else None
+	res = diff(
+		read_rows(argv[1]), read_rows(argv[2]), '-u' not in argv,
+		limit = limit, digits = digits
+	)
+	print(res.report((argv[1], argv[2])))
+	exit(0 if res.equal else 1)
@@ -0,0 +1,146 @@
+import importlib
+from sys import argv
+from cache import ResultCache
+from strong_against import StrongAgainst
+import backends
+import loadgen
+import replay
+import sinks
+import tracing
+
+def print_usage():
+	print('Usage: python runner.py <' + '|'.join(backends.BACKENDS) + '> [OPTIONS]')
+	print('	OPTIONS:')
+	print('	-h: print this help')
+	print('	-u [user]: user (default: neo4j or postgres)')
+	print('	-p [password]: password (default: password)')
+	print('	-H [host]: Postgres host (default: localhost)')
+	print('	-d [database]: Postgres database (default: bdspe_ng_ss)')
+	layouts = importlib.import_module('postgres-queries').LAYOUTS
+	print('	-l [layout]: Postgres table layout (' + ', '.join(layouts) + '; default: plain)')
+	print('	-U [uri]: Neo4j URI (default: bolt://localhost:7687)')
+	print('	-m [model]: Neo4j graph model (default: relationships)')
+	print('	-i [profile]: index profile (default, prefix: name prefix indexes and')
+	print('		the rewrites of the queries filtering names by prefix; default: default)')
+	print('	-f [datafile]: imported csv file or snapshot (default: pokemon.csv)')
+	print('	-F: import data even if the dataset is unchanged')
+	print('	-D: only import the Pokemon that changed since the last import')
+	print('	-k [names]: comma-separated queries to run (default: all)')
+	print('		(' + ', '.join(backends.QUERY_NAMES) + ')')
+	print('	-e: print the execution plan of each query instead of running it')
+	print('	-P: print server-side measures of each query instead of its rows')
+	print('	-c [file]: cache query results, persisted in file if given')
+	print('	-s: compute STRONG_AGAINST relationships in process (Neo4j)')
+	print('	-o [sink]: write rows to a sink (print, null, csv:<directory> or'
+				+ ' jsonl:<directory>)')
+	print('	-S [itersize]: stream rows instead of fetching them all (Postgres)')
+	print('	-T [exporter]: trace phases and queries (console, jsonl:<file> or otlp:<file>)')
+	print('	-M: trace the peak client memory of phases and queries (tracemalloc)')
+	print('	-L [mode:levels[:seconds]]: run the queries under concurrent load')
+	print('		instead (closed:1,2,4: numbers of connections; open:10,50: arrival rates)')
+	print('	-W [name=weight,...]: weights of the queries under load')
+	print('	-R record:<file>: record query results to file')
+	print('	-R replay:<file>[:latency]: replay recorded results without a database')
+
+def option(flag: str) -> str:
+	'''
+	Optional value of a flag: the next argument, unless it is another flag.
+	'''
+
+	i = argv.index(flag) + 1
+	return argv[i] if i < len(argv) and not argv[i].startswith('-') else None
+
+if __name__ == '__main__':
+	if '-h' in argv or len(argv) < 2 or argv[1] not in backends.BACKENDS:
+		print_usage()
+		exit(0 if '-h' in argv else 1)
+
+	name = argv[1]
+	argv = argv[2:]
+	user = argv[argv.index('-u') + 1] if '-u' in argv else name
+	password = argv[argv.index('-p') + 1] if '-p' in argv else 'password'
+	datafile = argv[argv.index('-f') + 1] if '-f' in argv else 'pokemon.csv'
+	force_import = True if '-F' in argv else False
+	delta_import = True if '-D' in argv else False
+	indexes = argv[argv.index('-i') + 1] if '-i' in argv else 'default'
+
+	memory = True if '-M' in argv else False
+	if '-T' in argv or memory:
+		tracing.set_tracer(tracing.from_option(
+			option('-T') if '-T' in argv else None, memory
+		))
+	cache = ResultCache(option('-c')) if '-c' in argv else None
+	recorder = replay.from_option(argv[argv.index('-R') + 1]) if '-R' in argv else None
+
+	if name == 'neo4j':
+		backend = backends.Neo4jBackend(
+			user, password,
+			argv[argv.index('-U') + 1] if '-U' in argv else 'bolt://localhost:7687',
+			argv[argv.index('-m') + 1] if '-m' in argv else 'relationships',
+			cache,
+			StrongAgainst.from_csv(datafile) if '-s' in argv else None,
+			None if recorder is None else recorder.neo4j_driver,
+			indexes = indexes
+		)
+	else:
+		itersize = option('-S') if '-S' in argv else None
+		backend = backends.PostgresBackend(
+			user, password,
+			argv[argv.index('-d') + 1] if '-d' in argv else 'bdspe_ng_ss',
+			argv[argv.index('-H') + 1] if '-H' in argv else 'localhost',
+			cache,
+			None if recorder is None else recorder.postgres_connect,
+			'-S' in argv,
+			int(itersize) if itersize and itersize.isdigit() else None,
+			argv[argv.index('-l') + 1] if '-l' in argv else 'plain',
+			indexes
+		)
+
+	if name == 'postgres' and backend.layout not in backend.module.LAYOUTS:
+		print(f'Unknown layout: {backend.layout} (' + ', '.join(backend.module.LAYOUTS) + ')')
+		exit(1)
+	if indexes not in backend.module.INDEX_PROFILES:
+		print(f'Unknown index profile: {indexes} ('
+					+ ', '.join(backend.module.INDEX_PROFILES) + ')')
+		exit(1)
+
+	backend.connect()
+	try:
+		if not backend.load(datafile, force_import, delta_import):
+			print('Dataset unchanged, skipping import')
+		names = (
+			argv[argv.index('-k') + 1].split(',') if '-k' in argv
+			else backends.QUERY_NAMES
+		)
+		if '-L' in argv:
+			mode, levels, duration = loadgen.parse_option(argv[argv.index('-L') + 1])
+			connect, method = backend.load_client()
+			queries = backend.queries()
+			generator = loadgen.LoadGenerator(
+				connect, {n: queries[n] for n in names},
+				loadgen.parse_weights(argv[argv.index('-W') + 1]) if '-W' in argv else None,
+				method
+			)
+			loadgen.print_curve(generator.curve(mode, levels, duration))
+		else:
+			sink = sinks.from_option(option('-o') if '-o' in argv else None)
+			for query in names:
+				print(query)
+				if '-e' in argv:
+					print(backend.explain(query))
+				elif '-P' in argv:
+					for key, value in backend.profile(query).items():
+						print(f'{key}: {value}')
+				else:
+					elapsed = sink.output_ms()
+					rows = backends.run_query(backend, query, sink)
+					if '-o' in argv:
+						print(f'{rows} rows, output: {sink.output_ms() - elapsed:.2f} ms')
+				print()
+	finally:
+		backend.close()
+	if cache is not None:
+		print(cache.stats())
+		cache.save()
+	if recorder is not None: recorder.close()
+	tracing.tracer.finish()
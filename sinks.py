@@ -0,0 +1,133 @@
+import csv
+import json
+import os
+import sys
+import time
+
+class Sink:
+	'''
+	Destination of query rows, written in batches through a buffer. The time
+	spent formatting and writing rows is accumulated apart from the time spent
+	fetching them, so that output overhead can be measured on its own.
+	'''
+
+	def __init__(self, buffer_size: int = 1 << 16):
+		'''
+		Args:
+			buffer_size: size of the output buffer, in bytes.
+		'''
+
+		self.buffer_size = buffer_size
+		self.rows = 0
+		self.elapsed = 0
+
+	def start(self, name: str, columns: list):
+		'''
+		Starts the rows of a query.
+
+		Args:
+			name: name of the query.
+			columns: names of the columns of the rows.
+		'''
+
+		pass
+
+	def write(self, rows: list):
+		start = time.perf_counter_ns()
+		self.write_rows(rows)
+		self.rows += len(rows)
+		self.elapsed += time.perf_counter_ns() - start
+
+	def write_rows(self, rows: list):
+		pass
+
+	def end(self):
+		'''
+		Ends the rows of a query, flushing the buffer.
+		'''
+
+		pass
+
+	def output_ms(self) -> float:
+		return self.elapsed / 1e6
+
+class NullSink(Sink):
+	'''
+	Discards rows, to benchmark queries without any output cost.
+	'''
+
+class PrintSink(Sink):
+	'''
+	Prints rows as tuples on the standard output, as run_query always did,
+	with a single write per batch instead of a call to print per row.
+	'''
+
+	def write_rows(self, rows: list):
+		sys.stdout.write(''.join(f'{row}\n' for row in rows))
+
+	def end(self):
+		start = time.perf_counter_ns()
+		sys.stdout.flush()
+		self.elapsed += time.perf_counter_ns() - start
+
+class FileSink(Sink):
+	'''
+	Writes the rows of each query to a file of a directory, named after the
+	query and opened with the given buffer size.
+	'''
+
+	suffix = ''
+
+	def __init__(self, directory: str, buffer_size: int = 1 << 16):
+		super().__init__(buffer_size)
+		self.directory = directory
+		self.file = None
+		os.makedirs(directory, exist_ok = True)
+
+	def start(self, name: str, columns: list):
+		path = os.path.join(self.directory, name.replace(' ', '_') + self.suffix)
+		self.file = open(path, 'w', newline = '', buffering = self.buffer_size)
+
+	def end(self):
+		start = time.perf_counter_ns()
+		self.file.close()
+		self.elapsed += time.perf_counter_ns() - start
+
+class CsvSink(FileSink):
+	'''
+	Writes rows as csv, after a header line of column names.
+	'''
+
+	suffix = '.csv'
+
+	def start(self, name: str, columns: list):
+		super().start(name, columns)
+		self.writer = csv.writer(self.file)
+		self.writer.writerow(columns)
+
+	def write_rows(self, rows: list):
+		self.writer.writerows(rows)
+
+class JsonLinesSink(FileSink):
+	'''
+	Writes rows as JSON arrays, one per line, readable by resultdiff.py.
+	'''
+
+	suffix = '.jsonl'
+
+	def write_rows(self, rows: list):
+		self.file.write(''.join(json.dumps(row, default = str) + '\n' for row in rows))
+
+def from_option(option: str = None, buffer_size: int = 1 << 16) -> Sink:
+	'''
+	Sink for a command line option: none or 'print' for the standard output,
+	'null' to discard rows, 'csv:<directory>' or 'jsonl:<directory>' for a
+	file per query.
+	'''
+
+	kind, _, path = (option or 'print').partition(':')
+	if kind == 'print': return PrintSink(buffer_size)
+	if kind == 'null': return NullSink(buffer_size)
+	if kind == 'csv': return CsvSink(path or 'results', buffer_size)
+	if kind == 'jsonl': return JsonLinesSink(path or 'results', buffer_size)
+	raise ValueError(f'Unknown output sink: {kind}')
@@ -0,0 +1,215 @@
+import json
+import mmap
+import numpy as np
+import struct
+from sys import argv
+import dataset
+
+MAGIC = b'PKSNAP1\n'
+
+# Bump whenever the layout changes, so that older snapshots are seen as stale.
+SNAPSHOT_VERSION = 1
+
+SUFFIX = '.snap'
+
+# Columns stored as dictionary codes, and as a list of dictionary codes
+CATEGORY_COLUMNS = ['classfication', 'type1', 'type2']
+CATEGORY_LIST_COLUMNS = ['abilities']
+
+def is_snapshot(path: str) -> bool:
+	return path.endswith(SUFFIX)
+
+def write_snapshot(rows: list, path: str, source: str = None):
+	'''
+	Writes parsed rows into a columnar binary snapshot: fixed-width numeric
+	columns, dictionary-encoded categories and offset-encoded strings, each
+	block aligned on 8 bytes so that it can be memory-mapped as an array.
+
+	Args:
+		rows: parsed rows of the dataset (see dataset.read_rows).
+		path: path of the snapshot file.
+		source: fingerprint of the csv file the rows were read from, if any.
+	'''
+
+	columns = {}
+	blocks = []
+	offset = 0
+
+	def add_block(array: np.ndarray) -> dict:
+		nonlocal offset
+		data = array.tobytes()
+		block = {'dtype': array.dtype.str, 'offset': offset, 'count': len(array)}
+		padding = -len(data) % 8
+		blocks.append(data + b'\0' * padding)
+		offset += len(data) + padding
+		return block
+
+	for name in rows[0].keys() if rows else []:
+		values = [row[name] for row in rows]
+		if name in dataset.INT_COLUMNS:
+			if None in values:
+				raise ValueError(f'Integer column {name} has empty values')
+			dtype = next(
+				t for t in ['<i1', '<i2', '<i4', '<i8']
+				if np.iinfo(t).min <= min(values) and max(values) <= np.iinfo(t).max
+			)
+			columns[name] = {'kind': 'int', 'data': add_block(np.array(values, dtype))}
+		elif name in dataset.FLOAT_COLUMNS:
+			# effectiveness values (0, 0.25, 0.5, 1, 2, 4) are exact in half precision
+			dtype = '<f2' if name.startswith('against_') else '<f8'
+			values = [np.nan if v is None else v for v in values]
+			columns[name] = {'kind': 'float', 'data': add_block(np.array(values, dtype))}
+		elif name in CATEGORY_COLUMNS:
+			dictionary = sorted({v for v in values if v is not None})
+			index = {v: i for i, v in enumerate(dictionary)}
+			codes = [-1 if v is None else index[v] for v in values]
+			columns[name] = {
+				'kind': 'category',
+				'dictionary': dictionary,
+				'data': add_block(np.array(codes, '<i2'))
+			}
+		elif name in CATEGORY_LIST_COLUMNS:
+			dictionary = sorted({v for value in values for v in value})
+			index = {v: i for i, v in enumerate(dictionary)}
+			columns[name] = {
+				'kind': 'category_list',
+				'dictionary': dictionary,
+				'offsets': add_block(np.cumsum([0] + [len(v) for v in values], dtype = '<i4')),
+				'data': add_block(np.array([index[v] for value in values for v in value], '<i2'))
+			}
+		else:
+			encoded = [b'' if v is None else v.encode() for v in values]
+			columns[name] = {
+				'kind': 'string',
+				'nulls': [i for i, v in enumerate(values) if v is None],
+				'offsets': add_block(np.cumsum([0] + [len(v) for v in encoded], dtype = '<i4')),
+				'data': add_block(np.frombuffer(b''.join(encoded), 'u1'))
+			}
+
+	header = json.dumps({
+		'version': SNAPSHOT_VERSION,
+		'source': source,
+		'rows': len(rows),
+		'columns': columns
+	}).encode()
+	header += b' ' * (-(len(MAGIC) + 8 + len(header)) % 8)
+	with open(path, 'wb') as f:
+		f.write(MAGIC)
+		f.write(struct.pack('<Q', len(header)))
+		f.write(header)
+		for block in blocks:
+			f.write(block)
+
+class Snapshot:
+	'''
+	Memory-mapped snapshot written by write_snapshot. Columns are only read
+	when accessed, as arrays backed by the mapped file.
+	'''
+
+	def __init__(self, path: str):
+		self.path = path
+		with open(path, 'rb') as f:
+			self.mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+		if self.mm[:len(MAGIC)] != MAGIC:
+			raise ValueError(f'{path} is not a snapshot')
+		(length,) = struct.unpack_from('<Q', self.mm, len(MAGIC))
+		start = len(MAGIC) + 8
+		header = json.loads(self.mm[start:start + length])
+		self.base = start + length
+		self.version = header['version']
+		self.source = header['source']
+		self.rows = header['rows']
+		self.columns = header['columns']
+
+	def close(self):
+		self.mm.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def is_stale(self, datafile: str) -> bool:
+		'''
+		Whether the snapshot is outdated with regard to a csv file.
+		'''
+
+		return (self.version != SNAPSHOT_VERSION
+						or self.source != dataset.fingerprint(datafile, SNAPSHOT_VERSION))
+
+	def __array(self, block: dict) -> np.ndarray:
+		return np.frombuffer(
+			self.mm, block['dtype'], block['count'], self.base + block['offset']
+		)
+
+	def column(self, name: str) -> np.ndarray:
+		'''
+		Raw array of a column: values for numeric columns, dictionary codes
+		(-1 for empty values) for categories, utf-8 bytes for strings.
+		'''
+
+		return self.__array(self.columns[name]['data'])
+
+	def offsets(self, name: str) -> np.ndarray:
+		'''
+		Offsets of each row in the data array of a string or list column.
+		'''
+
+		return self.__array(self.columns[name]['offsets'])
+
+	def dictionary(self, name: str) -> list:
+		return self.columns[name]['dictionary']
+
+	def values(self, name: str) -> list:
+		'''
+		Decoded values of a column, as in parsed rows.
+		'''
+
+		column = self.columns[name]
+		data = self.column(name)
+		if column['kind'] == 'int':
+			return data.tolist()
+		if column['kind'] == 'float':
+			return [None if v != v else v for v in data.tolist()]
+		if column['kind'] == 'category':
+			dictionary = column['dictionary']
+			return [None if c < 0 else dictionary[c] for c in data.tolist()]
+		offsets = self.offsets(name).tolist()
+		if column['kind'] == 'category_list':
+			dictionary = column['dictionary']
+			codes = data.tolist()
+			return [
+				[dictionary[c] for c in codes[offsets[i]:offsets[i + 1]]]
+				for i in range(self.rows)
+			]
+		blob = data.tobytes()
+		res = [
+			blob[offsets[i]:offsets[i + 1]].decode() for i in range(self.rows)
+		]
+		for i in column['nulls']: res[i] = None
+		return res
+
+	def read_rows(self) -> list:
+		'''
+		All rows, the same as dataset.read_rows on the source csv file.
+		'''
+
+		columns = {name: self.values(name) for name in self.columns}
+		return [
+			{name: values[i] for name, values in columns.items()}
+			for i in range(self.rows)
+		]
+
+if __name__ == '__main__':
+	if len(argv) < 2:
+		print('Usage: python snapshot.py <datafile> [snapshot]')
+		exit(1)
+	datafile = argv[1]
+	path = argv[2] if len(argv) > 2 else datafile.rsplit('.', 1)[0] + SUFFIX
+	write_snapshot(
+		dataset.read_rows(datafile),
+		path,
+		dataset.fingerprint(datafile, SNAPSHOT_VERSION)
+	)
+	print(f'Snapshot of {datafile} written to {path}')
@@ -0,0 +1,178 @@
+import numpy as np
+import time
+from sys import argv
+import dataset
+from engine import PokemonEngine
+
+# Number of edges yielded per batch when streaming edges to a database.
+BATCH_SIZE = 10000
+
+class StrongAgainst:
+	'''
+	STRONG_AGAINST edges, where p1 is strong against p2 if p1 resists (0.25 or
+	0.5 by default) a type of p2, computed in process instead of joining type
+	effectiveness with type membership in the database.
+
+	Edges are stored factorized: Pokemon resisting the same set of types share
+	their targets, and Pokemon having the same types share their sources, so
+	the edge set is a boolean product of a small matrix between these groups.
+	This takes O(n) memory whatever the number of edges, which grows as n².
+	'''
+
+	def __init__(self, against: np.ndarray, has_type: np.ndarray,
+							 pokedex: np.ndarray, values: tuple = (0.25, 0.5)):
+		'''
+		Args:
+			against: effectiveness matrix, Pokemon x type.
+			has_type: type membership matrix, Pokemon x type.
+			pokedex: pokedex number of each Pokemon.
+			values: effectiveness values for which p1 resists a type.
+		'''
+
+		self.values = tuple(values)
+		bits = 1 << np.arange(against.shape[1], dtype = np.int64)
+		resisted = np.isin(against, values).astype(np.int64) @ bits
+		types = has_type.astype(np.int64) @ bits
+		resisted_masks, self.source_group = np.unique(resisted, return_inverse = True)
+		type_masks, self.target_group = np.unique(types, return_inverse = True)
+		self.source_group = self.source_group.ravel()
+		self.target_group = self.target_group.ravel()
+		# source group x target group: whether a resisted type is one of the types
+		self.groups = (resisted_masks[:, None] & type_masks[None, :]) != 0
+		self.pokedex = np.asarray(pokedex)
+		# Pokemon sorted by target group, with the offsets of each group
+		self.by_target = np.argsort(self.target_group, kind = 'stable')
+		self.target_offsets = np.searchsorted(
+			self.target_group[self.by_target], np.arange(len(type_masks) + 1)
+		)
+		# Pokemon resisting one of their own types, which are not their own target
+		self.self_target = self.groups[self.source_group, self.target_group]
+
+	@classmethod
+	def from_engine(cls, engine: PokemonEngine, values: tuple = (0.25, 0.5)):
+		return cls(engine.against, engine.has_type, engine.pokedex, values)
+
+	@classmethod
+	def from_csv(cls, datafile: str, values: tuple = (0.25, 0.5)):
+		return cls.from_engine(PokemonEngine.from_csv(datafile), values)
+
+	def __len__(self) -> int:
+		return len(self.source_group)
+
+	def group_targets(self, group: int) -> np.ndarray:
+		'''
+		Sorted indices of the Pokemon targeted by a source group.
+		'''
+
+		return np.sort(np.concatenate([
+			self.by_target[self.target_offsets[g]:self.target_offsets[g + 1]]
+			for g in np.nonzero(self.groups[group])[0]
+		] + [np.empty(0, dtype = np.int64)]))
+
+	def targets(self, p: int) -> np.ndarray:
+		'''
+		Sorted indices of the Pokemon p is strong against.
+		'''
+
+		targets = self.group_targets(self.source_group[p])
+		return targets[targets != p]
+
+	def sources(self, p: int) -> np.ndarray:
+		'''
+		Sorted indices of the Pokemon strong against p.
+		'''
+
+		sources = np.nonzero(self.groups[self.source_group, self.target_group[p]])[0]
+		return sources[sources != p]
+
+	def out_degrees(self) -> np.ndarray:
+		sizes = np.diff(self.target_offsets)
+		return self.groups[self.source_group] @ sizes - self.self_target
+
+	def edge_count(self) -> int:
+		return int(self.out_degrees().sum())
+
+	def batches(self, size: int = BATCH_SIZE):
+		'''
+		Generates all edges as (sources, targets) index arrays of about size
+		edges, without materializing the whole edge set.
+		'''
+
+		for group in range(self.groups.shape[0]):
+			targets = self.group_targets(group)
+			if not len(targets): continue
+			members = np.nonzero(self.source_group == group)[0]
+			step = max(1, size // len(targets))
+			for i in range(0, len(members), step):
+				sources = np.repeat(members[i:i + step], len(targets))
+				ends = np.tile(targets, len(members[i:i + step]))
+				keep = sources != ends
+				yield sources[keep], ends[keep]
+
+	def pokedex_batches(self, size: int = BATCH_SIZE):
+		'''
+		Same as batches, as lists of (pokedex number, pokedex number) pairs.
+		'''
+
+		for sources, targets in self.batches(size):
+			yield list(zip(
+				self.pokedex[sources].tolist(), self.pokedex[targets].tolist()
+			))
+
+	def csr(self) -> tuple:
+		'''
+		Materialized adjacency, as (indptr, indices) arrays with sorted targets.
+		'''
+
+		indptr = np.concatenate([[0], np.cumsum(self.out_degrees())])
+		indices = np.empty(indptr[-1], dtype = np.int32)
+		for group in range(self.groups.shape[0]):
+			targets = self.group_targets(group)
+			for p in np.nonzero(self.source_group == group)[0]:
+				indices[indptr[p]:indptr[p + 1]] = targets[targets != p]
+		return indptr, indices
+
+	def bitset(self) -> np.ndarray:
+		'''
+		Materialized adjacency, as one packed row of bits per Pokemon. Rows are
+		packed once per source group and copied, without an unpacked Pokemon x
+		Pokemon matrix, so memory is that of the bitset itself.
+		'''
+
+		rows = np.stack([
+			np.packbits(self.groups[group][self.target_group])
+			for group in range(self.groups.shape[0])
+		])
+		bits = rows[self.source_group]
+		# a Pokemon is not its own target (bits are packed big-endian)
+		p = np.arange(len(self))
+		bits[p, p >> 3] &= ~(0x80 >> (p & 7)).astype(np.uint8)
+		return bits
+
+	def nbytes(self) -> int:
+		'''
+		Memory used by the factorized edges.
+		'''
+
+		return sum(a.nbytes for a in [
+			self.source_group, self.target_group, self.groups, self.by_target,
+			self.target_offsets, self.self_target
+		])
+
+if __name__ == '__main__':
+	datafile = argv[1] if len(argv) > 1 else 'pokemon.csv'
+	scale = int(argv[2]) if len(argv) > 2 else 1
+	rows = dataset.scale_rows(dataset.read_rows(datafile), scale)
+	engine = PokemonEngine(rows)
+	start = time.perf_counter()
+	strong = StrongAgainst.from_engine(engine)
+	elapsed = (time.perf_counter() - start) * 1000
+	print(f'{len(strong)} Pokemon, {strong.edge_count()} edges computed in'
+				+ f' {elapsed:.2f} ms')
+	print(f'Groups: {strong.groups.shape[0]} sources x {strong.groups.shape[1]}'
+				+ f' targets, {strong.nbytes() / 1024:.1f} KiB'
+				+ f' (CSR would take {strong.edge_count() * 4 / 1024:.1f} KiB)')
+	start = time.perf_counter()
+	count = sum(len(batch[0]) for batch in strong.batches())
+	elapsed = (time.perf_counter() - start) * 1000
+	print(f'{count} edges streamed in {elapsed:.2f} ms')
@@ -0,0 +1,268 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+class Span:
+	'''
+	Timed phase or query: wall and client CPU time, number of rows and server
+	counters, nested in the span that was open when it started.
+	'''
+
+	def __init__(self, name: str, parent = None, attributes: dict = None,
+							 memory: bool = False):
+		self.name = name
+		self.parent = parent
+		self.depth = parent.depth + 1 if parent is not None else 0
+		self.attributes = attributes or {}
+		self.id = os.urandom(8).hex()
+		self.rows = None
+		self.counters = {}
+		self.start_time = time.time_ns()
+		self.start = time.perf_counter_ns()
+		self.cpu_start = time.process_time_ns()
+		self.wall = None
+		self.cpu = None
+		self.memory = memory
+		self.peak = None
+		self.allocated = None
+		if memory:
+			# the peak is reset for this span, after being accounted to its parent
+			current, peak = tracemalloc.get_traced_memory()
+			if parent is not None: parent.max_memory = max(parent.max_memory, peak)
+			tracemalloc.reset_peak()
+			self.memory_start = current
+			self.max_memory = current
+
+	def end(self):
+		self.wall = time.perf_counter_ns() - self.start
+		self.cpu = time.process_time_ns() - self.cpu_start
+		if self.memory:
+			current, peak = tracemalloc.get_traced_memory()
+			self.max_memory = max(self.max_memory, peak)
+			if self.parent is not None:
+				self.parent.max_memory = max(self.parent.max_memory, self.max_memory)
+			self.peak = self.max_memory - self.memory_start
+			self.allocated = current - self.memory_start
+
+	def set_rows(self, rows: int):
+		self.rows = rows
+
+	def add_counters(self, counters: dict):
+		'''
+		Adds server counters, e.g. the update counters of a Neo4j summary, or
+		the row count of a Postgres cursor. Zero counters are skipped.
+		'''
+
+		for key, value in counters.items():
+			if value: self.counters[key] = self.counters.get(key, 0) + value
+
+	def to_dict(self) -> dict:
+		return {
+			'name': self.name,
+			'id': self.id,
+			'parent': self.parent.id if self.parent is not None else None,
+			'start': self.start_time,
+			'wall_ms': self.wall / 1e6,
+			'cpu_ms': self.cpu / 1e6,
+			'rows': self.rows,
+			'counters': self.counters,
+			'attributes': self.attributes,
+			'peak_kib': None if self.peak is None else self.peak / 1024,
+			'allocated_kib': None if self.allocated is None else self.allocated / 1024
+		}
+
+class NullSpan:
+	'''
+	Span of a disabled tracer, ignoring everything.
+	'''
+
+	def set_rows(self, rows: int):
+		pass
+
+	def add_counters(self, counters: dict):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		pass
+
+NULL_SPAN = NullSpan()
+
+class NullTracer:
+	'''
+	Disabled tracer: spans are a shared object doing nothing, so that hooks
+	cost a single call when tracing is off.
+	'''
+
+	enabled = False
+
+	def span(self, name: str, **attributes) -> NullSpan:
+		return NULL_SPAN
+
+	def add_counters(self, counters: dict):
+		pass
+
+	def finish(self):
+		pass
+
+class Tracer:
+	'''
+	Records spans opened with span(), and hands them to an exporter on finish().
+	In memory mode, spans also record the peak of client memory allocated by
+	Python while they are open (tracemalloc), above the memory in use when they
+	start, and the memory still allocated when they end.
+	'''
+
+	enabled = True
+
+	def __init__(self, exporter, memory: bool = False):
+		'''
+		Args:
+			exporter: object with an export(spans) method (see the exporters below).
+			memory: whether to trace memory allocations, which slows down the run.
+		'''
+
+		self.exporter = exporter
+		self.memory = memory
+		self.spans = []
+		self.stack = []
+		if memory and not tracemalloc.is_tracing(): tracemalloc.start()
+
+	@contextmanager
+	def span(self, name: str, **attributes):
+		span = Span(
+			name, self.stack[-1] if self.stack else None, attributes, self.memory
+		)
+		self.spans.append(span)
+		self.stack.append(span)
+		try:
+			yield span
+		finally:
+			span.end()
+			self.stack.pop()
+
+	def add_counters(self, counters: dict):
+		if self.stack: self.stack[-1].add_counters(counters)
+
+	def finish(self):
+		self.exporter.export(self.spans)
+		self.spans = []
+
+class ConsoleExporter:
+	'''
+	Prints spans as an indented table.
+	'''
+
+	def export(self, spans: list):
+		memory = any(span.memory for span in spans)
+		print('Trace:')
+		print(f'{"Span":<48}{"Wall (ms)":<14}{"CPU (ms)":<14}{"Rows":<10}'
+					+ (f'{"Peak (KiB)":<14}{"Kept (KiB)":<14}' if memory else '')
+					+ 'Counters')
+		for span in spans:
+			name = '  ' * span.depth + span.name
+			rows = '' if span.rows is None else span.rows
+			counters = ', '.join(f'{k}={v}' for k, v in span.counters.items())
+			print(f'{name:<48}{span.wall / 1e6:<14.2f}{span.cpu / 1e6:<14.2f}'
+						+ f'{rows:<10}'
+						+ (f'{span.peak / 1024:<14.1f}{span.allocated / 1024:<14.1f}'
+							 if memory else '')
+						+ counters)
+
+class JsonLinesExporter:
+	'''
+	Appends spans to a file, one JSON object per line.
+	'''
+
+	def __init__(self, path: str):
+		self.path = path
+
+	def export(self, spans: list):
+		with open(self.path, 'a') as f:
+			for span in spans:
+				f.write(json.dumps(span.to_dict(), default = str) + '\n')
+
+class OtlpJsonExporter:
+	'''
+	Writes spans in the OpenTelemetry protocol JSON encoding (a single trace),
+	which OpenTelemetry collectors can ingest with their file receiver.
+	'''
+
+	def __init__(self, path: str, service: str = 'bdspe'):
+		self.path = path
+		self.service = service
+
+	@staticmethod
+	def attribute(key: str, value) -> dict:
+		if isinstance(value, bool): value = {'boolValue': value}
+		elif isinstance(value, int): value = {'intValue': str(value)}
+		elif isinstance(value, float): value = {'doubleValue': value}
+		else: value = {'stringValue': str(value)}
+		return {'key': key, 'value': value}
+
+	def export(self, spans: list):
+		trace_id = os.urandom(16).hex()
+		otlp_spans = []
+		for span in spans:
+			attributes = dict(span.attributes)
+			attributes['cpu_ms'] = span.cpu / 1e6
+			if span.rows is not None: attributes['rows'] = span.rows
+			if span.memory:
+				attributes['peak_kib'] = span.peak / 1024
+				attributes['allocated_kib'] = span.allocated / 1024
+			attributes.update({f'counters.{k}': v for k, v in span.counters.items()})
+			otlp_span = {
+				'traceId': trace_id,
+				'spanId': span.id,
+				'name': span.name,
+				'kind': 1,
+				'startTimeUnixNano': str(span.start_time),
+				'endTimeUnixNano': str(span.start_time + span.wall),
+				'attributes': [self.attribute(k, v) for k, v in attributes.items()]
+			}
+			if span.parent is not None: otlp_span['parentSpanId'] = span.parent.id
+			otlp_spans.append(otlp_span)
+		data = {'resourceSpans': [{
+			'resource': {'attributes': [self.attribute('service.name', self.service)]},
+			'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': otlp_spans}]
+		}]}
+		with open(self.path, 'a') as f:
+			f.write(json.dumps(data) + '\n')
+
+# Tracer used by the hooks, disabled unless set_tracer is called
+tracer = NullTracer()
+
+def set_tracer(new_tracer):
+	global tracer
+	tracer = new_tracer
+
+def span(name: str, **attributes):
+	'''
+	Context manager timing a phase or a query with the current tracer.
+	'''
+
+	return tracer.span(name, **attributes)
+
+def add_counters(counters: dict):
+	'''
+	Adds server counters to the innermost open span, if any.
+	'''
+
+	tracer.add_counters(counters)
+
+def from_option(option: str = None, memory: bool = False):
+	'''
+	Tracer for a command line option: none or 'console' for a table printed at
+	the end, 'jsonl:<file>' for JSON lines, 'otlp:<file>' for OTLP JSON.
+	'''
+
+	kind, _, path = (option or 'console').partition(':')
+	if kind == 'console': exporter = ConsoleExporter()
+	elif kind == 'jsonl': exporter = JsonLinesExporter(path or 'trace.jsonl')
+	elif kind == 'otlp': exporter = OtlpJsonExporter(path or 'trace.json')
+	else: raise ValueError(f'Unknown trace exporter: {kind}')
+	return Tracer(exporter, memory)
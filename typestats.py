@@ -0,0 +1,103 @@
+from collections import Counter
+import dataset
+
+# Effectiveness values of each class of sensibility to a type
+CLASSES = {'weak': (2, 4), 'resistant': (0.25, 0.5), 'immune': (0,)}
+
+class TypeStats:
+	'''
+	Per-type aggregates of the dataset: numbers of Pokemon weak, resistant or
+	immune to each type, and numbers of Pokemon weak to each type having each
+	ability. As sums over Pokemon, they are maintained incrementally: the
+	contributions of the stored versions of changed Pokemon are removed, and
+	those of their new versions added.
+	'''
+
+	def __init__(self):
+		self.counts = {t: dict.fromkeys(CLASSES, 0) for t in dataset.TYPES}
+		self.abilities = {t: Counter() for t in dataset.TYPES}
+
+	@classmethod
+	def from_rows(cls, rows: list):
+		'''
+		Aggregates of parsed rows of the dataset.
+		'''
+
+		stats = cls()
+		for row in rows: stats.add_row(row)
+		return stats
+
+	@classmethod
+	def from_tables(cls, type_rows: list, ability_rows: list):
+		'''
+		Aggregates stored as (type, weak, resistant, immune) and (type, ability,
+		weak) rows.
+		'''
+
+		stats = cls()
+		for t, *counts in type_rows:
+			stats.counts[t] = dict(zip(CLASSES, counts))
+		for t, ability, count in ability_rows:
+			stats.abilities[t][ability] = count
+		return stats
+
+	def add(self, sensibilities: dict, abilities: list, sign: int = 1):
+		'''
+		Adds (or removes, with sign -1) the contribution of a Pokemon.
+
+		Args:
+			sensibilities: its sensibility to each type; missing types are
+				neutral.
+			abilities: names of its abilities.
+		'''
+
+		for t, value in sensibilities.items():
+			for name, values in CLASSES.items():
+				if value in values: self.counts[t][name] += sign
+			if value in CLASSES['weak']:
+				for ability in set(abilities):
+					self.abilities[t][ability] += sign
+					if not self.abilities[t][ability]: del self.abilities[t][ability]
+
+	def add_row(self, row: dict, sign: int = 1):
+		self.add(
+			{t: row[f'against_{"fight" if t == "fighting" else t}'] for t in dataset.TYPES},
+			row['abilities'] or [],
+			sign
+		)
+
+	def copy(self):
+		stats = TypeStats()
+		stats.counts = {t: dict(counts) for t, counts in self.counts.items()}
+		stats.abilities = {t: Counter(c) for t, c in self.abilities.items()}
+		return stats
+
+	def changed(self, other) -> list:
+		'''
+		Types whose aggregates differ from those of other.
+		'''
+
+		return [
+			t for t in dataset.TYPES
+			if self.counts[t] != other.counts[t] or self.abilities[t] != other.abilities[t]
+		]
+
+	def ability_counts(self, t: str) -> list:
+		'''
+		(ability, number of Pokemon weak to t having it) pairs, by ability.
+		'''
+
+		return sorted(self.abilities[t].items())
+
+	def type_rows(self, types: list = None) -> list:
+		return [
+			(t, *self.counts[t].values())
+			for t in (dataset.TYPES if types is None else types)
+		]
+
+	def ability_rows(self, types: list = None) -> list:
+		return [
+			(t, ability, count)
+			for t in (dataset.TYPES if types is None else types)
+			for ability, count in self.ability_counts(t)
+		]